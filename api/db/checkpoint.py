@@ -0,0 +1,212 @@
+# api/db/checkpoint.py
+from collections.abc import AsyncIterator, Sequence
+from typing import Any, Optional
+from langchain_core.runnables import RunnableConfig
+from langgraph.checkpoint.base import (
+    WRITES_IDX_MAP,
+    BaseCheckpointSaver,
+    ChannelVersions,
+    Checkpoint,
+    CheckpointMetadata,
+    CheckpointTuple,
+    get_checkpoint_id,
+    get_checkpoint_metadata,
+)
+from langgraph.checkpoint.memory import InMemorySaver
+from sqlalchemy import delete, select
+from sqlalchemy.dialects.postgresql import insert
+from api.db.models import GraphCheckpoint, GraphCheckpointWrite
+
+class PostgresCheckpointSaver(BaseCheckpointSaver[str]):
+    """LangGraph checkpoint saver backed by the graph_checkpoints tables.
+
+    Only the async interface is implemented; graph runs use ainvoke/astream.
+    Each checkpoint is stored as one serialized row (channel values
+    included) and pending writes as one row per (task, index).
+    """
+
+    def __init__(self, session_factory, *, serde=None):
+        super().__init__(serde=serde)
+        self.session_factory = session_factory
+
+    # Reuse the in-memory saver's string versions so both stores are interchangeable
+    get_next_version = InMemorySaver.get_next_version
+
+    def _to_tuple(self, row: GraphCheckpoint, writes: Sequence[GraphCheckpointWrite]) -> CheckpointTuple:
+        return CheckpointTuple(
+            config={
+                "configurable": {
+                    "thread_id": row.thread_id,
+                    "checkpoint_ns": row.checkpoint_ns,
+                    "checkpoint_id": row.checkpoint_id,
+                }
+            },
+            checkpoint=self.serde.loads_typed((row.checkpoint_type, row.checkpoint)),
+            metadata=self.serde.loads_typed((row.metadata_type, row.checkpoint_metadata)),
+            parent_config=(
+                {
+                    "configurable": {
+                        "thread_id": row.thread_id,
+                        "checkpoint_ns": row.checkpoint_ns,
+                        "checkpoint_id": row.parent_checkpoint_id,
+                    }
+                }
+                if row.parent_checkpoint_id
+                else None
+            ),
+            pending_writes=[
+                (write.task_id, write.channel, self.serde.loads_typed((write.value_type, write.value)))
+                for write in writes
+            ],
+        )
+
+    async def _load_writes(self, session, row: GraphCheckpoint) -> Sequence[GraphCheckpointWrite]:
+        statement = select(GraphCheckpointWrite).where(
+            GraphCheckpointWrite.thread_id == row.thread_id,
+            GraphCheckpointWrite.checkpoint_ns == row.checkpoint_ns,
+            GraphCheckpointWrite.checkpoint_id == row.checkpoint_id,
+        ).order_by(GraphCheckpointWrite.task_id, GraphCheckpointWrite.idx)
+        result = await session.execute(statement)
+        return result.scalars().all()
+
+    async def aget_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        configurable = config["configurable"]
+        statement = select(GraphCheckpoint).where(
+            GraphCheckpoint.thread_id == configurable["thread_id"],
+            GraphCheckpoint.checkpoint_ns == configurable.get("checkpoint_ns", ""),
+        )
+        if checkpoint_id := get_checkpoint_id(config):
+            statement = statement.where(GraphCheckpoint.checkpoint_id == checkpoint_id)
+        else:
+            statement = statement.order_by(GraphCheckpoint.checkpoint_id.desc()).limit(1)
+
+        async with self.session_factory() as session:
+            row = (await session.execute(statement)).scalars().first()
+            if row is None:
+                return None
+            return self._to_tuple(row, await self._load_writes(session, row))
+
+    async def alist(
+        self,
+        config: Optional[RunnableConfig],
+        *,
+        filter: Optional[dict[str, Any]] = None,
+        before: Optional[RunnableConfig] = None,
+        limit: Optional[int] = None,
+    ) -> AsyncIterator[CheckpointTuple]:
+        statement = select(GraphCheckpoint).order_by(GraphCheckpoint.checkpoint_id.desc())
+        if config:
+            configurable = config["configurable"]
+            statement = statement.where(GraphCheckpoint.thread_id == configurable["thread_id"])
+            if (checkpoint_ns := configurable.get("checkpoint_ns")) is not None:
+                statement = statement.where(GraphCheckpoint.checkpoint_ns == checkpoint_ns)
+            if checkpoint_id := get_checkpoint_id(config):
+                statement = statement.where(GraphCheckpoint.checkpoint_id == checkpoint_id)
+        if before and (before_checkpoint_id := get_checkpoint_id(before)):
+            statement = statement.where(GraphCheckpoint.checkpoint_id < before_checkpoint_id)
+        # Metadata is stored serialized, so a filter is applied after decoding and the
+        # limit can only go into the query without one
+        if limit is not None and not filter:
+            statement = statement.limit(limit)
+
+        async with self.session_factory() as session:
+            rows = (await session.execute(statement)).scalars().all()
+            for row in rows:
+                if limit is not None and limit <= 0:
+                    break
+                if filter:
+                    metadata = self.serde.loads_typed((row.metadata_type, row.checkpoint_metadata))
+                    if not all(metadata.get(key) == value for key, value in filter.items()):
+                        continue
+                # Writes are loaded only for the checkpoints actually returned
+                if limit is not None:
+                    limit -= 1
+                yield self._to_tuple(row, await self._load_writes(session, row))
+
+    async def aput(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        configurable = config["configurable"]
+        thread_id = configurable["thread_id"]
+        checkpoint_ns = configurable.get("checkpoint_ns", "")
+        checkpoint_type, checkpoint_data = self.serde.dumps_typed(checkpoint)
+        metadata_type, metadata_data = self.serde.dumps_typed(get_checkpoint_metadata(config, metadata))
+        values = {
+            "thread_id": thread_id,
+            "checkpoint_ns": checkpoint_ns,
+            "checkpoint_id": checkpoint["id"],
+            "parent_checkpoint_id": configurable.get("checkpoint_id"),
+            "checkpoint_type": checkpoint_type,
+            "checkpoint": checkpoint_data,
+            "metadata_type": metadata_type,
+            "metadata": metadata_data,
+        }
+        statement = insert(GraphCheckpoint.__table__).values(**values)
+        statement = statement.on_conflict_do_update(
+            index_elements=["thread_id", "checkpoint_ns", "checkpoint_id"],
+            set_={key: statement.excluded[key] for key in ("checkpoint_type", "checkpoint", "metadata_type", "metadata")},
+        )
+        async with self.session_factory() as session:
+            await session.execute(statement)
+            await session.commit()
+
+        return {
+            "configurable": {
+                "thread_id": thread_id,
+                "checkpoint_ns": checkpoint_ns,
+                "checkpoint_id": checkpoint["id"],
+            }
+        }
+
+    async def aput_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[tuple[str, Any]],
+        task_id: str,
+        task_path: str = "",
+    ) -> None:
+        configurable = config["configurable"]
+        rows = []
+        for idx, (channel, value) in enumerate(writes):
+            value_type, value_data = self.serde.dumps_typed(value)
+            rows.append({
+                "thread_id": configurable["thread_id"],
+                "checkpoint_ns": configurable.get("checkpoint_ns", ""),
+                "checkpoint_id": configurable["checkpoint_id"],
+                "task_id": task_id,
+                "idx": WRITES_IDX_MAP.get(channel, idx),
+                "channel": channel,
+                "value_type": value_type,
+                "value": value_data,
+                "task_path": task_path,
+            })
+        if not rows:
+            return
+
+        # Regular writes are kept on first insert; special channels (negative idx) are overwritten
+        statement = insert(GraphCheckpointWrite.__table__)
+        keys = ["thread_id", "checkpoint_ns", "checkpoint_id", "task_id", "idx"]
+        async with self.session_factory() as session:
+            regular = [row for row in rows if row["idx"] >= 0]
+            special = [row for row in rows if row["idx"] < 0]
+            if regular:
+                await session.execute(statement.on_conflict_do_nothing(index_elements=keys), regular)
+            if special:
+                await session.execute(
+                    statement.on_conflict_do_update(
+                        index_elements=keys,
+                        set_={key: statement.excluded[key] for key in ("channel", "value_type", "value", "task_path")},
+                    ),
+                    special,
+                )
+            await session.commit()
+
+    async def adelete_thread(self, thread_id: str) -> None:
+        async with self.session_factory() as session:
+            await session.execute(delete(GraphCheckpointWrite).where(GraphCheckpointWrite.thread_id == thread_id))
+            await session.execute(delete(GraphCheckpoint).where(GraphCheckpoint.thread_id == thread_id))
+            await session.commit()
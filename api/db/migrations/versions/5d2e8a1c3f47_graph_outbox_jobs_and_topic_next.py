@@ -0,0 +1,69 @@
+"""graph outbox, graph jobs and topic next tables
+
+Revision ID: 5d2e8a1c3f47
+Revises: 9b1f4c2d7a10
+Create Date: 2026-10-17 15:40:12.318604
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5d2e8a1c3f47'
+down_revision: Union[str, Sequence[str], None] = '9b1f4c2d7a10'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('topic_next',
+    sa.Column('topic_id', sa.UUID(), nullable=False),
+    sa.Column('next_topic_id', sa.UUID(), nullable=False),
+    sa.Column('condition', sa.Text(), nullable=True),
+    sa.ForeignKeyConstraint(['topic_id'], ['topics.id'], name=op.f('fk_topic_next_topic_id_topics'), ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['next_topic_id'], ['topics.id'], name=op.f('fk_topic_next_next_topic_id_topics'), ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('topic_id', 'next_topic_id', name=op.f('pk_topic_next'))
+    )
+    op.create_table('graph_jobs',
+    sa.Column('id', sa.String(), nullable=False),
+    sa.Column('agent_id', sa.String(), nullable=False),
+    sa.Column('status', sa.String(), nullable=False),
+    sa.Column('result', postgresql.JSONB(astext_type=sa.Text()), nullable=True),
+    sa.Column('error', sa.Text(), nullable=True),
+    sa.Column('created_at', sa.Float(), nullable=False),
+    sa.Column('started_at', sa.Float(), nullable=True),
+    sa.Column('finished_at', sa.Float(), nullable=True),
+    sa.PrimaryKeyConstraint('id', name=op.f('pk_graph_jobs'))
+    )
+    op.create_index(op.f('ix_graph_jobs_finished_at'), 'graph_jobs', ['finished_at'], unique=False)
+    op.create_table('graph_sync_outbox',
+    sa.Column('id', sa.BigInteger(), autoincrement=True, nullable=False),
+    sa.Column('entity_type', sa.String(), nullable=False),
+    sa.Column('entity_id', sa.String(), nullable=False),
+    sa.Column('operation', sa.String(), server_default='upsert', nullable=False),
+    sa.Column('agent_id', sa.String(), nullable=True),
+    sa.Column('payload', postgresql.JSONB(astext_type=sa.Text()), server_default=sa.text("'{}'::jsonb"), nullable=False),
+    sa.Column('attempts', sa.Integer(), server_default=sa.text('0'), nullable=False),
+    sa.Column('last_error', sa.Text(), nullable=True),
+    sa.Column('created_at', sa.TIMESTAMP(timezone=True), server_default=sa.text('now()'), nullable=False),
+    sa.Column('available_at', sa.TIMESTAMP(timezone=True), server_default=sa.text('now()'), nullable=False),
+    sa.Column('processed_at', sa.TIMESTAMP(timezone=True), nullable=True),
+    sa.PrimaryKeyConstraint('id', name=op.f('pk_graph_sync_outbox'))
+    )
+    op.create_index(op.f('ix_graph_sync_outbox_available_at'), 'graph_sync_outbox', ['available_at'], unique=False)
+    op.create_index(op.f('ix_graph_sync_outbox_processed_at'), 'graph_sync_outbox', ['processed_at'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_graph_sync_outbox_processed_at'), table_name='graph_sync_outbox')
+    op.drop_index(op.f('ix_graph_sync_outbox_available_at'), table_name='graph_sync_outbox')
+    op.drop_table('graph_sync_outbox')
+    op.drop_index(op.f('ix_graph_jobs_finished_at'), table_name='graph_jobs')
+    op.drop_table('graph_jobs')
+    op.drop_table('topic_next')
@@ -0,0 +1,52 @@
+"""graph checkpoint tables
+
+Revision ID: 9b1f4c2d7a10
+Revises: 3e99c69673d6
+Create Date: 2026-10-17 10:12:41.204518
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9b1f4c2d7a10'
+down_revision: Union[str, Sequence[str], None] = '3e99c69673d6'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('graph_checkpoints',
+    sa.Column('thread_id', sa.String(), nullable=False),
+    sa.Column('checkpoint_ns', sa.String(), nullable=False),
+    sa.Column('checkpoint_id', sa.String(), nullable=False),
+    sa.Column('parent_checkpoint_id', sa.String(), nullable=True),
+    sa.Column('checkpoint_type', sa.String(), nullable=False),
+    sa.Column('checkpoint', sa.LargeBinary(), nullable=False),
+    sa.Column('metadata_type', sa.String(), nullable=False),
+    sa.Column('metadata', sa.LargeBinary(), nullable=False),
+    sa.Column('created_at', sa.TIMESTAMP(timezone=True), server_default=sa.text('now()'), nullable=False),
+    sa.PrimaryKeyConstraint('thread_id', 'checkpoint_ns', 'checkpoint_id', name=op.f('pk_graph_checkpoints'))
+    )
+    op.create_table('graph_checkpoint_writes',
+    sa.Column('thread_id', sa.String(), nullable=False),
+    sa.Column('checkpoint_ns', sa.String(), nullable=False),
+    sa.Column('checkpoint_id', sa.String(), nullable=False),
+    sa.Column('task_id', sa.String(), nullable=False),
+    sa.Column('idx', sa.Integer(), nullable=False),
+    sa.Column('channel', sa.String(), nullable=False),
+    sa.Column('value_type', sa.String(), nullable=False),
+    sa.Column('value', sa.LargeBinary(), nullable=False),
+    sa.Column('task_path', sa.String(), nullable=False),
+    sa.PrimaryKeyConstraint('thread_id', 'checkpoint_ns', 'checkpoint_id', 'task_id', 'idx', name=op.f('pk_graph_checkpoint_writes'))
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('graph_checkpoint_writes')
+    op.drop_table('graph_checkpoints')
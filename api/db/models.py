@@ -1,6 +1,6 @@
 from typing import List
 import uuid
-from sqlalchemy import Column, String, Text, ForeignKey, TIMESTAMP, text
+from sqlalchemy import Column, Integer, LargeBinary, String, Text, ForeignKey, TIMESTAMP, text
 from sqlalchemy.orm import relationship, Mapped
 from sqlalchemy.types import UUID
 from api.db.base import Base
@@ -82,3 +82,31 @@ class TopicInstruction(Base):
         back_populates="instructions",
         foreign_keys=[topic_id]
     )
+
+class GraphCheckpoint(Base):
+    """SQLAlchemy model for a LangGraph checkpoint of a graph run thread"""
+
+    __tablename__ = "graph_checkpoints"
+    thread_id = Column(String, primary_key=True)
+    checkpoint_ns = Column(String, primary_key=True, default="")
+    checkpoint_id = Column(String, primary_key=True)
+    parent_checkpoint_id = Column(String, nullable=True)
+    checkpoint_type = Column(String, nullable=False)
+    checkpoint = Column(LargeBinary, nullable=False)
+    metadata_type = Column(String, nullable=False)
+    checkpoint_metadata = Column("metadata", LargeBinary, nullable=False)
+    created_at = Column(TIMESTAMP(timezone=True), nullable=False, server_default=text('now()'))
+
+class GraphCheckpointWrite(Base):
+    """SQLAlchemy model for a pending node write attached to a checkpoint"""
+
+    __tablename__ = "graph_checkpoint_writes"
+    thread_id = Column(String, primary_key=True)
+    checkpoint_ns = Column(String, primary_key=True, default="")
+    checkpoint_id = Column(String, primary_key=True)
+    task_id = Column(String, primary_key=True)
+    idx = Column(Integer, primary_key=True)
+    channel = Column(String, nullable=False)
+    value_type = Column(String, nullable=False)
+    value = Column(LargeBinary, nullable=False)
+    task_path = Column(String, nullable=False, default="")
@@ -0,0 +1,13 @@
+# api/db/neo4j.py
+from neo4j import AsyncDriver, AsyncGraphDatabase
+from api.settings import Settings
+
+def create_neo4j_driver(settings: Settings) -> AsyncDriver:
+    """Create the async Neo4j driver; the app lifespan owns and closes it."""
+    return AsyncGraphDatabase.driver(
+        str(settings.neo4j_uri),
+        auth=(settings.neo4j_username, settings.neo4j_password),
+        max_connection_pool_size=settings.neo4j_max_connection_pool_size,
+        connection_acquisition_timeout=settings.neo4j_connection_acquisition_timeout,
+        fetch_size=settings.neo4j_fetch_size,
+    )
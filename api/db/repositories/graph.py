@@ -0,0 +1,25 @@
+from neo4j import AsyncDriver
+from graph_builder import aget_graph_structure, aget_topic_instructions, get_topic_instructions
+from graph_sources import GraphSource
+
+class GraphRepository(GraphSource):
+    """Read access to the agent graph stored in Neo4j, on the async driver.
+
+    Writes reach Neo4j only through the outbox (graph_outbox), so the
+    repository has no write operations of its own.
+    """
+
+    def __init__(self, driver: AsyncDriver):
+        self.driver = driver
+
+    async def get_graph_structure(self, agent_id: str) -> dict:
+        """Load the nodes/edges structure used to compile an agent's graph."""
+        return await aget_graph_structure(agent_id, self.driver)
+
+    async def get_topic_instructions(self, topic_id: str) -> list[dict]:
+        """Load one topic's instructions for graphs built from topic skeletons."""
+        return await aget_topic_instructions(topic_id, self.driver)
+
+    def load_topic_instructions(self, topic_id: str) -> list[dict]:
+        """Sync variant for graphs run outside the event loop, on the module's sync driver."""
+        return get_topic_instructions(topic_id)
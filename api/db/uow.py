@@ -13,9 +13,21 @@ class UnitOfWork:
         self.agent = AgentRepository(session)
         self.topic = TopicRepository(session)
         # self.action = ActionRepository(session) ...
+        self._after_commit = []
 
-    async def commit(self): await self.session.commit()
-    async def rollback(self): await self.session.rollback()
+    def after_commit(self, callback):
+        """Run callback() once the current transaction has committed; dropped on rollback."""
+        self._after_commit.append(callback)
+
+    async def commit(self):
+        await self.session.commit()
+        callbacks, self._after_commit = self._after_commit, []
+        for callback in callbacks:
+            callback()
+
+    async def rollback(self):
+        self._after_commit = []
+        await self.session.rollback()
 
 @asynccontextmanager
 async def uow_context():
@@ -0,0 +1,13 @@
+from typing import Annotated
+from fastapi import Depends
+from api.dependencies.neo4j import GraphRepo
+from config import settings
+from graph_sources import GraphSource, get_graph_source as get_configured_source
+
+# Neo4j reads go through the app's driver; other stores use the shared source
+def get_graph_source(graph_repo: GraphRepo) -> GraphSource:
+    if settings.graph_source == "neo4j":
+        return graph_repo
+    return get_configured_source()
+
+GraphSrc = Annotated[GraphSource, Depends(get_graph_source)]
@@ -0,0 +1,15 @@
+from typing import Annotated
+from fastapi import Depends, Request
+from neo4j import AsyncDriver
+from api.db.repositories.graph import GraphRepository
+
+# The driver is created and closed by the app lifespan
+def get_neo4j_driver(request: Request) -> AsyncDriver:
+    return request.app.state.neo4j_driver
+
+Neo4jDriver = Annotated[AsyncDriver, Depends(get_neo4j_driver)]
+
+def get_graph_repository(driver: Neo4jDriver) -> GraphRepository:
+    return GraphRepository(driver)
+
+GraphRepo = Annotated[GraphRepository, Depends(get_graph_repository)]
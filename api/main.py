@@ -4,9 +4,22 @@ from fastapi import FastAPI, Request
 from fastapi.responses import JSONResponse
 from fastapi.middleware.cors import CORSMiddleware
 from api.settings import Settings
-from api.db.session import async_engine as engine
+from api.db.checkpoint import PostgresCheckpointSaver
+from api.db.session import async_engine as engine, async_session
+from api.db.neo4j import create_neo4j_driver
+from api.db.repositories.graph import GraphRepository
+from api.dependencies.graph_source import get_graph_source
 from api.db import models
-from api.routers import agents, auth
+from db_neo4j import aclose_drivers, use_async_driver
+from api.routers import agents, auth, graph_router
+from config import settings as graph_settings
+from graph_cache import run_counts
+from graph_executor import node_processes, use_checkpointer
+from graph_invalidation import invalidation_listener
+from graph_jobs import graph_jobs
+from graph_warmup import awarm_up, warmup_agent_ids
+from neo4j_schema import aapply_schema
+from node_registry import node_registry
 from contextlib import asynccontextmanager
 
 # Configure logging
@@ -20,16 +33,70 @@ logger = logging.getLogger(__name__)
 async def lifespan(app: FastAPI):
     # startup: log starting message
     logger.info("*** Starting %s (env=%s)", settings.app_name, settings.env_name)
+
+    # startup: create the async Neo4j driver shared by all requests
+    app.state.neo4j_driver = create_neo4j_driver(settings)
+    # graph_builder's async reads (graph runs, lazy instructions) share it
+    use_async_driver(app.state.neo4j_driver)
+
+    # startup: keep threaded runs' checkpoints in the tables created by the migrations
+    if settings.graph_checkpointer == "postgres":
+        use_checkpointer(PostgresCheckpointSaver(async_session))
+
+    # startup: bring the Neo4j constraints and indexes up to the latest schema version
+    if graph_settings.neo4j_apply_schema_on_startup:
+        try:
+            await aapply_schema(app.state.neo4j_driver)
+        except Exception as e:
+            logger.error("Neo4j schema bootstrap failed: %s", e)
+
+    # startup: import and validate graph node functions before serving runs
+    node_registry.preload(graph_settings.graph_node_modules)
+    if graph_settings.graph_process_nodes:
+        node_processes.warm_up()
+
+    # startup: compile the configured and most-run agents' graphs before reporting ready
+    graph_source = get_graph_source(GraphRepository(app.state.neo4j_driver))
+    await awarm_up(
+        warmup_agent_ids(),
+        concurrency=graph_settings.graph_warmup_concurrency,
+        timeout=graph_settings.graph_warmup_timeout_seconds,
+        load_structure=graph_source.get_graph_structure,
+        load_instructions=graph_source.get_topic_instructions,
+    )
+
+    # startup: drop graphs changed through other workers and nodes as soon as they commit
+    if graph_settings.graph_invalidation_listen:
+        invalidation_listener.start()
     
     # yield control to the application
     yield
 
+    # shutdown: stop background graph job workers and the invalidation listener
+    await graph_jobs.stop()
+    await invalidation_listener.stop()
+    node_processes.shutdown()
+
+    # shutdown: persist this worker's run counts for the next warm-up
+    try:
+        run_counts.flush()
+    except Exception as e:
+        logger.error("Error saving graph run counts: %s", e)
+
     # shutdown: dispose of the async engine
     try:
         await engine.dispose()
     except Exception as e:
         logger.error("Error during engine disposal: %s", e)
 
+    # shutdown: close the Neo4j driver and its connection pool, and any sync
+    # driver opened by the shared graph modules
+    try:
+        await aclose_drivers()
+        await app.state.neo4j_driver.close()
+    except Exception as e:
+        logger.error("Error during Neo4j driver close: %s", e)
+
     logger.info("*** Shut down %s", settings.app_name)
 
 
@@ -54,6 +121,7 @@ app.add_middleware(
 # Include the auth router with a prefix and tags for better API documentation
 app.include_router(auth.router, tags=["auth"])
 app.include_router(agents.router, tags=["agents"])
+app.include_router(graph_router.router, tags=["graph"])
 
 # Root endpoint to verify the application is running.
 @app.get("/")
@@ -1,17 +1,34 @@
-from fastapi import APIRouter, Body, HTTPException
+from typing import Literal, Optional
+from fastapi import APIRouter, Body, HTTPException, Query, Request
+from fastapi.responses import StreamingResponse
 import logging
-from graph_executor import build_and_compile_graph
-from graph_builder import get_graph_structure
+import orjson
+from api.dependencies.graph_source import GraphSrc
+from graph_sources import GraphSource
+from config import settings
+from graph_executor import aget_compiled_graph, aprepare_run, arun_batch, arun_graph_with_deadline
+from graph_jobs import JobQueueFull, graph_jobs
+from graph_state import from_state, to_state
+from node_registry import node_registry
+from topic_routing import ROUTER_NODE
 from schemas.graph_schemas import GraphStructureSchema, GraphNodeSchema, GraphEdgeSchema
 
 router = APIRouter()
 logger = logging.getLogger("graph_router")
 
-@router.post("/graph/run/{agent_id}")
-def run_agent_graph(agent_id: str, input_state: dict = Body(...)):
+STREAM_MEDIA_TYPES = {
+    "sse": "text/event-stream",
+    "ndjson": "application/x-ndjson",
+}
+
+async def load_graph(agent_id: str, graph_source: GraphSource):
     try:
         # Attempt to build and compile the graph
-        graph = build_and_compile_graph(agent_id)
+        graph = await aget_compiled_graph(
+            agent_id,
+            load_structure=graph_source.get_graph_structure,
+            load_instructions=graph_source.get_topic_instructions,
+        )
     except ValueError as e:
         logger.warning(f"[Graph Build Failed] agent_id={agent_id} → {str(e)}")
         raise HTTPException(status_code=400, detail=str(e))
@@ -21,17 +38,167 @@ def run_agent_graph(agent_id: str, input_state: dict = Body(...)):
         logger.error(f"[Graph Not Built] agent_id={agent_id}")
         raise HTTPException(status_code=404, detail="Graph not found or could not be built.")
 
-    # Execute graph and return results
     logger.info(f"[Graph Build Success] agent_id={agent_id}")
-    result = graph.invoke(input_state)
-    return {"result": result}
+    return graph
+
+def encode_event(event: str, data: dict, stream_format: str) -> bytes:
+    if stream_format == "sse":
+        return b"event: " + event.encode() + b"\ndata: " + orjson.dumps(data) + b"\n\n"
+    return orjson.dumps({"event": event, **data}) + b"\n"
+
+async def stream_node_updates(agent_id: str, graph, input_state: dict, stream_format: str, thread_id: str = None):
+    try:
+        graph, run_input, config = await aprepare_run(graph, input_state, thread_id)
+        async for update in graph.astream(run_input, config, stream_mode="updates"):
+            for node_name, node_state in update.items():
+                node_state = node_state or {}
+                if node_name == ROUTER_NODE:
+                    yield encode_event("route", {"node": node_state.get("route") or None}, stream_format)
+                    continue
+                node_spec = graph.builder.nodes.get(node_name)
+                node_metadata = (node_spec.metadata if node_spec else None) or {}
+                yield encode_event("node", {
+                    "node": node_name,
+                    "current_node": node_state.get("current_node"),
+                    "topic_label": node_metadata.get("topic_label"),
+                    "message": node_state.get("message"),
+                }, stream_format)
+    except Exception as e:
+        # Headers are already sent, so report the failure in-band
+        logger.exception(f"[Graph Stream Failed] agent_id={agent_id}")
+        yield encode_event("error", {"detail": str(e)}, stream_format)
+        return
+    yield encode_event("end", {}, stream_format)
+
+async def read_batch_inputs(request: Request) -> list:
+    """Parse a batch body as either a JSON list or NDJSON lines of input states."""
+    body = await request.body()
+    try:
+        if request.headers.get("content-type", "").startswith("application/x-ndjson"):
+            inputs = [orjson.loads(line) for line in body.splitlines() if line.strip()]
+        else:
+            inputs = orjson.loads(body)
+    except orjson.JSONDecodeError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid JSON body: {str(e)}")
+
+    if not isinstance(inputs, list) or not all(isinstance(item, dict) for item in inputs):
+        raise HTTPException(status_code=400, detail="Batch body must be a list of input state objects.")
+    return inputs
+
+async def stream_batch_results(agent_id: str, graph, inputs, concurrency: int, ordered: bool):
+    async for index, result, error in arun_batch(graph, map(to_state, inputs), concurrency, ordered):
+        if error is not None:
+            logger.warning(f"[Graph Batch Item Failed] agent_id={agent_id} index={index} → {str(error)}")
+            yield orjson.dumps({"index": index, "error": str(error)}) + b"\n"
+        else:
+            yield orjson.dumps({"index": index, "result": from_state(result)}, default=str) + b"\n"
+
+@router.post("/graph/run/{agent_id}")
+async def run_agent_graph(
+    agent_id: str,
+    request: Request,
+    graph_source: GraphSrc,
+    input_state: dict = Body(...),
+    thread_id: Optional[str] = Query(None),
+):
+    graph = await load_graph(agent_id, graph_source)
+
+    # Execute graph and return results, resuming the thread's checkpoint if one is given.
+    # A run that hits its deadline or loses its client stops early and reports
+    # the state after the last completed step plus the node(s) it stopped at.
+    outcome = await arun_graph_with_deadline(
+        graph,
+        input_state,
+        thread_id,
+        run_timeout=settings.graph_run_timeout_seconds,
+        node_timeout=settings.graph_node_timeout_seconds,
+        is_disconnected=request.is_disconnected,
+        poll_interval=settings.graph_disconnect_poll_seconds,
+    )
+    if outcome["status"] != "completed":
+        logger.warning(
+            f"[Graph Run Stopped] agent_id={agent_id} status={outcome['status']} "
+            f"reason={outcome['reason']} stopped_at={outcome['stopped_at']}"
+        )
+    return outcome
+
+@router.post("/graph/stream/{agent_id}")
+async def stream_agent_graph(
+    agent_id: str,
+    graph_source: GraphSrc,
+    input_state: dict = Body(...),
+    stream_format: Literal["sse", "ndjson"] = Query("sse", alias="format"),
+    thread_id: Optional[str] = Query(None),
+):
+    graph = await load_graph(agent_id, graph_source)
+
+    # Emit each node's update as soon as the node completes
+    return StreamingResponse(
+        stream_node_updates(agent_id, graph, input_state, stream_format, thread_id),
+        media_type=STREAM_MEDIA_TYPES[stream_format],
+    )
+
+@router.post("/graph/batch/{agent_id}")
+async def run_agent_graph_batch(
+    agent_id: str,
+    request: Request,
+    graph_source: GraphSrc,
+    concurrency: int = Query(settings.graph_batch_max_concurrency, ge=1),
+    ordered: bool = Query(True),
+):
+    inputs = await read_batch_inputs(request)
+    graph = await load_graph(agent_id, graph_source)
+
+    # Results are streamed back as NDJSON lines tagged with the input index
+    return StreamingResponse(
+        stream_batch_results(
+            agent_id,
+            graph,
+            inputs,
+            min(concurrency, settings.graph_batch_max_concurrency),
+            ordered,
+        ),
+        media_type=STREAM_MEDIA_TYPES["ndjson"],
+    )
+
+@router.post("/graph/jobs/{agent_id}", status_code=202)
+async def submit_agent_graph_job(
+    agent_id: str,
+    graph_source: GraphSrc,
+    input_state: dict = Body(...),
+    thread_id: Optional[str] = Query(None),
+):
+    try:
+        job = await graph_jobs.asubmit(
+            agent_id,
+            input_state,
+            thread_id,
+            load_structure=graph_source.get_graph_structure,
+            load_instructions=graph_source.get_topic_instructions,
+        )
+    except JobQueueFull as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    return {"job_id": job.id, "status": job.status}
+
+@router.get("/graph/jobs/{job_id}")
+async def get_agent_graph_job(job_id: str):
+    job = await graph_jobs.aget(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail=f"Job {job_id} not found")
+    return job.to_dict()
+
+@router.get("/graph/registry")
+def get_node_registry():
+    # Registered node functions and the function each compiled node is bound to
+    return node_registry.describe()
 
 @router.get("/graph/structure/{agent_id}", response_model=GraphStructureSchema)
-def get_graph(agent_id: str):
+async def get_graph(agent_id: str, graph_source: GraphSrc):
     try:
-        structure = get_graph_structure(agent_id)
+        structure = await graph_source.get_graph_structure(agent_id)
         return {
             "entry_node": structure["entry_node"],
+            "entry_nodes": structure.get("entry_nodes", [structure["entry_node"]]),
             "nodes": [GraphNodeSchema(**node) for node in structure["nodes"]],
             "edges": [
                 GraphEdgeSchema(
@@ -1,6 +1,8 @@
 from api.dependencies.db import Db
 from api.schemas.agent import AgentCreateRequest, AgentResponse
 from api.db.models import Agent
+from graph_cache import compiled_graphs
+from graph_invalidation import apublish
 
 class AgentCreator:
     """Handles the creation of an agent based on a request."""
@@ -37,7 +39,13 @@ class AgentCreator:
         )
     
     async def create(self, agent: Agent) -> Agent:
-        return await self.db.agent.add(agent)
+        agent = await self.db.agent.add(agent)
+        # Both take effect once the unit of work commits: a rebuild started
+        # earlier would otherwise cache the graph without the new rows
+        await apublish(self.db.session, agent.id)
+        agent_id = agent.id
+        self.db.after_commit(lambda: compiled_graphs.invalidate(agent_id))
+        return agent
         
 
 class AgentService:
@@ -2,6 +2,8 @@ from api.dependencies.db import Db
 from api.schemas.topic import TopicCreateRequest, TopicResponse
 from api.db.models import Topic, TopicInstruction
 from typing import List
+from graph_cache import compiled_graphs
+from graph_invalidation import apublish
 
 class TopicCreator:
     """Handles the creation of a topic based on a request."""
@@ -27,7 +29,13 @@ class TopicCreator:
         )
     
     async def create(self, topic: Topic, instructions: List[str] = []) -> Topic:
-        return await self.db.topic.add(topic, instructions=instructions)
+        topic = await self.db.topic.add(topic, instructions=instructions)
+        # Both take effect once the unit of work commits: a rebuild started
+        # earlier would otherwise cache the graph without the new rows
+        await apublish(self.db.session, topic.agent_id)
+        agent_id = topic.agent_id
+        self.db.after_commit(lambda: compiled_graphs.invalidate(agent_id))
+        return topic
     
 class TopicService:
     """Service for managing topics."""
@@ -15,6 +15,11 @@ class Settings(BaseSettings):
     neo4j_uri: AnyUrl
     neo4j_username: str
     neo4j_password: str
+    neo4j_max_connection_pool_size: int = 100
+    neo4j_connection_acquisition_timeout: float = 60.0
+    neo4j_fetch_size: int = 1000
+    # Checkpoint store for graph runs with a thread_id: "postgres" or "memory"
+    graph_checkpointer: str = "postgres"
 
     model_config = SettingsConfigDict(
         env_file=".env",
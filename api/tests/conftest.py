@@ -0,0 +1,45 @@
+import os
+import pytest
+
+# Modules at the project root build their Settings at import time, so give
+# them a minimal environment before any test module imports them.
+os.environ.setdefault("DATABASE_USERNAME", "test_user")
+os.environ.setdefault("DATABASE_PASSWORD", "test_password")
+os.environ.setdefault("DATABASE_HOSTNAME", "localhost")
+os.environ.setdefault("DATABASE_PORT", "5432")
+os.environ.setdefault("DATABASE_NAME", "test_db")
+os.environ.setdefault("NEO4J_URI", "bolt://localhost:7687")
+os.environ.setdefault("NEO4J_USERNAME", "neo4j_user")
+os.environ.setdefault("NEO4J_PASSWORD", "neo4j_password")
+# api.settings.Settings, built by api.db.session on import, also needs the app identity
+os.environ.setdefault("SECRET_KEY", "test_secret_key")
+os.environ.setdefault("APP_VERSION", "0.0.0")
+os.environ.setdefault("ENV_NAME", "test")
+os.environ.setdefault("APP_NAME", "Test App")
+# Tests build graphs for the same agent ids from different data; keep them off disk
+os.environ.setdefault("GRAPH_SNAPSHOT_DIR", "")
+os.environ.setdefault("GRAPH_RUN_COUNTS_FILE", "")
+
+@pytest.fixture
+def graph_data():
+    """A two-topic graph structure as returned by get_graph_structure."""
+    return {
+        "entry_node": "topic_1",
+        "nodes": [
+            {
+                "name": f"topic_{i}",
+                "module": "my_agent_modules",
+                "function": "handle_topic",
+                "metadata": {
+                    "agent_id": "agent-1",
+                    "agent_name": "Test Agent",
+                    "topic_id": str(i),
+                    "topic_label": f"Topic {i}",
+                    "topic_scope": str(i),
+                    "instructions": [{"id": f"i{i}", "text": f"Instruction {i}"}],
+                },
+            }
+            for i in (1, 2)
+        ],
+        "edges": [{"from": "topic_1", "to": "topic_2"}],
+    }
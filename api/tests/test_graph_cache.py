@@ -0,0 +1,112 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+import pytest
+from unittest.mock import AsyncMock, MagicMock
+from graph_cache import AsyncSingleFlight, GraphCache, SingleFlight
+import graph_executor
+
+
+def test_get_returns_cached_value():
+    """Test that a stored graph is returned for the same agent."""
+    cache = GraphCache(max_size=2, ttl_seconds=60)
+    cache.set("agent-1", "graph-1")
+    assert cache.get("agent-1") == "graph-1"
+    assert cache.get("agent-2") is None
+
+def test_least_recently_used_entry_is_evicted():
+    """Test that the cache drops the least recently used entry when full."""
+    cache = GraphCache(max_size=2, ttl_seconds=60)
+    cache.set("agent-1", "graph-1")
+    cache.set("agent-2", "graph-2")
+    cache.get("agent-1")
+    cache.set("agent-3", "graph-3")
+    assert cache.get("agent-1") == "graph-1"
+    assert cache.get("agent-2") is None
+    assert cache.get("agent-3") == "graph-3"
+
+def test_evict_hooks_run_when_an_agent_leaves_the_cache(monkeypatch):
+    """Test that on_evict hears about size, TTL and invalidation evictions, once the agent has no entry left."""
+    now = [100.0]
+    monkeypatch.setattr("graph_cache.time.monotonic", lambda: now[0])
+    evicted = []
+    cache = GraphCache(max_size=2, ttl_seconds=10, on_evict=[evicted.append])
+    cache.set("agent-1", "graph-1")
+    cache.set("agent-2", "graph-2")
+    cache.set("agent-3", "graph-3")
+    cache.invalidate("agent-2")
+    now[0] += 11
+    cache.get("agent-3")
+    assert evicted == ["agent-1", "agent-2", "agent-3"]
+
+def test_expired_entry_is_not_returned(monkeypatch):
+    """Test that entries older than the TTL are treated as misses."""
+    now = [100.0]
+    monkeypatch.setattr("graph_cache.time.monotonic", lambda: now[0])
+    cache = GraphCache(max_size=2, ttl_seconds=10)
+    cache.set("agent-1", "graph-1")
+    now[0] += 11
+    assert cache.get("agent-1") is None
+    assert len(cache) == 0
+
+def test_invalidate_bumps_version_and_drops_entries():
+    """Test that invalidation removes entries and rejects stale builds."""
+    cache = GraphCache(max_size=2, ttl_seconds=60)
+    cache.set("agent-1", "graph-1")
+    version = cache.version("agent-1")
+    cache.invalidate("agent-1")
+    assert cache.get("agent-1") is None
+    # A build that started before the invalidation must not be cached
+    cache.set("agent-1", "stale-graph", version=version)
+    assert cache.get("agent-1") is None
+
+def test_get_compiled_graph_builds_once(monkeypatch):
+    """Test that repeated runs for an agent reuse the compiled graph."""
+    build_mock = MagicMock(return_value="compiled")
+    monkeypatch.setattr("graph_executor.build_and_compile_graph", build_mock)
+    monkeypatch.setattr("graph_executor.compiled_graphs", GraphCache(max_size=2, ttl_seconds=60))
+
+    assert graph_executor.get_compiled_graph("agent-1") == "compiled"
+    assert graph_executor.get_compiled_graph("agent-1") == "compiled"
+    build_mock.assert_called_once_with("agent-1")
+
+def test_single_flight_shares_one_call():
+    """Test that concurrent callers for one key wait on a single call."""
+    flight = SingleFlight()
+    started = threading.Event()
+    release = threading.Event()
+    calls = []
+
+    def build():
+        calls.append(1)
+        started.set()
+        release.wait(timeout=5)
+        return "graph"
+
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        leader = pool.submit(flight.do, "agent-1", build)
+        started.wait(timeout=5)
+        followers = [pool.submit(flight.do, "agent-1", build) for _ in range(3)]
+        time.sleep(0.05)
+        release.set()
+        results = [leader.result()] + [f.result() for f in followers]
+
+    assert results == ["graph"] * 4
+    assert len(calls) == 1
+
+@pytest.mark.asyncio
+async def test_async_single_flight_shares_one_build(monkeypatch, graph_data):
+    """Test that concurrent async runs for a cold agent trigger one structure load."""
+    async def slow_structure(agent_id):
+        await asyncio.sleep(0.01)
+        return graph_data
+
+    structure_mock = AsyncMock(side_effect=slow_structure)
+    monkeypatch.setattr("graph_builder.aget_graph_structure", structure_mock)
+    monkeypatch.setattr("graph_executor.compiled_graphs", GraphCache(max_size=2, ttl_seconds=60))
+    monkeypatch.setattr("graph_executor.async_graph_builds", AsyncSingleFlight())
+
+    graphs = await asyncio.gather(*[graph_executor.aget_compiled_graph("agent-1") for _ in range(10)])
+    assert all(graph is graphs[0] for graph in graphs)
+    structure_mock.assert_awaited_once()
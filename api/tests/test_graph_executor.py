@@ -0,0 +1,399 @@
+import asyncio
+import pytest
+from unittest.mock import AsyncMock, MagicMock
+from langgraph.checkpoint.memory import InMemorySaver
+from graph_cache import GraphCache
+from graph_structure import Instruction
+from node_process_pool import NodeProcessPool
+from node_registry import NodeRegistry
+import graph_executor
+
+def test_compile_graph_runs_topic_chain(graph_data):
+    """Test that a compiled graph runs every topic in the chain."""
+    graph = graph_executor.compile_graph(graph_data)
+    result = graph.invoke({"message": "hello"})
+    assert result["current_node"] == "topic_2"
+    assert result["message"] == "Processed topic: Topic 2"
+
+def test_run_result_carries_no_topic_metadata(graph_data):
+    """Test that topic metadata is passed to nodes by context, not copied into state."""
+    graph = graph_executor.compile_graph(graph_data)
+    result = graph.invoke({"message": "hello"})
+    assert result["visited"] == ["topic_1", "topic_2"]
+    assert result["outputs"] == {
+        "topic_1": "Processed topic: Topic 1",
+        "topic_2": "Processed topic: Topic 2",
+    }
+    assert not {"instructions", "topic_label", "agent_name"} & result.keys()
+
+@pytest.mark.asyncio
+async def test_run_keeps_undeclared_input_keys(monkeypatch, graph_data):
+    """Test that caller keys outside AgentState reach nodes and come back in the result."""
+    seen = []
+
+    def read_user(state, context):
+        seen.append(state["extra"]["user_id"])
+        return {"visited": [context.node_name]}
+
+    registry = NodeRegistry()
+    registry.register("my_agent_modules", "handle_topic", read_user)
+    monkeypatch.setattr("graph_executor.node_registry", registry)
+    graph = graph_executor.compile_graph(graph_data)
+
+    result = await graph_executor.arun_graph(graph, {"message": "hi", "user_id": "u1", "history": ["earlier"]})
+
+    assert seen == ["u1", "u1"]
+    assert result["user_id"] == "u1"
+    assert result["history"] == ["earlier"]
+    assert result["visited"] == ["topic_1", "topic_2"]
+    assert "extra" not in result
+
+def test_compile_graph_rejects_dangling_edge(graph_data):
+    """Test that edges with a missing endpoint are rejected."""
+    graph_data = {**graph_data, "edges": [{"from": "topic_1", "to": None}]}
+    with pytest.raises(ValueError):
+        graph_executor.compile_graph(graph_data)
+
+@pytest.mark.asyncio
+async def test_aget_compiled_graph_runs_async(monkeypatch, graph_data):
+    """Test that the async path loads the structure once and runs with ainvoke."""
+    structure_mock = AsyncMock(return_value=graph_data)
+    monkeypatch.setattr("graph_builder.aget_graph_structure", structure_mock)
+    monkeypatch.setattr("graph_executor.compiled_graphs", GraphCache(max_size=2, ttl_seconds=60))
+
+    graph = await graph_executor.aget_compiled_graph("agent-1")
+    assert await graph_executor.aget_compiled_graph("agent-1") is graph
+    result = await graph.ainvoke({"message": "hello"})
+    assert result["current_node"] == "topic_2"
+    structure_mock.assert_awaited_once_with("agent-1")
+
+@pytest.mark.asyncio
+async def test_arun_batch_limits_concurrency():
+    """Test that a batch never runs more inputs at once than allowed."""
+    running = 0
+    peak = 0
+
+    class SlowGraph:
+        async def ainvoke(self, input_state):
+            nonlocal running, peak
+            running += 1
+            peak = max(peak, running)
+            await asyncio.sleep(0.01)
+            running -= 1
+            if input_state.get("fail"):
+                raise ValueError("boom")
+            return input_state
+
+    inputs = [{"i": i, "fail": i == 3} for i in range(10)]
+    results = [item async for item in graph_executor.arun_batch(SlowGraph(), inputs, concurrency=3)]
+    assert peak == 3
+    assert [index for index, _, _ in results] == list(range(10))
+    assert isinstance(results[3][2], ValueError)
+    assert results[4][1] == {"i": 4, "fail": False}
+
+@pytest.mark.asyncio
+async def test_thread_run_resumes_from_last_checkpoint(monkeypatch, graph_data):
+    """Test that a follow-up run on a thread resumes instead of replaying finished nodes."""
+    calls = []
+    fail = {"topic_2": True}
+
+    def flaky_topic(state, context):
+        calls.append(context.node_name)
+        if fail.get(context.node_name):
+            raise RuntimeError("node failed")
+        return {"current_node": context.node_name, "visited": [context.node_name]}
+
+    registry = NodeRegistry()
+    registry.register("my_agent_modules", "handle_topic", flaky_topic)
+    monkeypatch.setattr("graph_executor.node_registry", registry)
+    saver = InMemorySaver()
+    monkeypatch.setattr("graph_executor.get_checkpointer", lambda: saver)
+    graph = graph_executor.compile_graph(graph_data)
+
+    with pytest.raises(RuntimeError):
+        await graph_executor.arun_graph(graph, {"message": "hello"}, thread_id="thread-1")
+    fail["topic_2"] = False
+    result = await graph_executor.arun_graph(graph, {}, thread_id="thread-1")
+
+    assert calls == ["topic_1", "topic_2", "topic_2"]
+    assert result["visited"] == ["topic_1", "topic_2"]
+
+@pytest.mark.asyncio
+async def test_follow_up_on_finished_thread_continues_at_last_step(monkeypatch, graph_data):
+    """Test that a new turn on a completed thread runs only its last topic, with the new input."""
+    calls = []
+
+    def tracked_topic(state, context):
+        calls.append((context.node_name, state.get("message")))
+        return {"visited": [context.node_name]}
+
+    registry = NodeRegistry()
+    registry.register("my_agent_modules", "handle_topic", tracked_topic)
+    monkeypatch.setattr("graph_executor.node_registry", registry)
+    saver = InMemorySaver()
+    monkeypatch.setattr("graph_executor.get_checkpointer", lambda: saver)
+    graph = graph_executor.compile_graph(graph_data)
+
+    await graph_executor.arun_graph(graph, {"message": "first"}, thread_id="thread-1")
+    result = await graph_executor.arun_graph(graph, {"message": "second"}, thread_id="thread-1")
+
+    assert calls == [("topic_1", "first"), ("topic_2", "first"), ("topic_2", "second")]
+    assert result["visited"] == ["topic_1", "topic_2", "topic_2"]
+
+def test_checkpointer_defaults_to_memory_until_an_app_plugs_one_in():
+    """Test that the legacy default needs no api tables and the api app can swap in its own store."""
+    saver = InMemorySaver()
+    graph_executor.get_checkpointer.cache_clear()
+    try:
+        assert isinstance(graph_executor.get_checkpointer(), InMemorySaver)
+        graph_executor.use_checkpointer(saver)
+        assert graph_executor.get_checkpointer() is saver
+    finally:
+        graph_executor.use_checkpointer(None)
+
+class FakeCheckpointSession:
+    def __init__(self, rows):
+        self.rows = rows
+        self.statements = []
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        return None
+
+    async def execute(self, statement):
+        self.statements.append(statement)
+        # The first statement selects checkpoints, later ones their (empty) writes
+        rows = self.rows if len(self.statements) == 1 else []
+        return MagicMock(**{"scalars.return_value.all.return_value": rows, "scalars.return_value.first.return_value": None})
+
+@pytest.mark.asyncio
+async def test_checkpoint_history_limit_runs_in_the_query():
+    """Test that a limited history reads only that many checkpoints and their writes."""
+    from sqlalchemy.dialects import postgresql
+    from api.db.checkpoint import PostgresCheckpointSaver
+    from api.db.models import GraphCheckpoint
+
+    saver = PostgresCheckpointSaver(None)
+    checkpoint_type, checkpoint = saver.serde.dumps_typed({"id": "2", "channel_values": {}})
+    metadata_type, metadata = saver.serde.dumps_typed({"step": 1})
+    row = GraphCheckpoint(
+        thread_id="agent-1:t", checkpoint_ns="", checkpoint_id="2", parent_checkpoint_id="1",
+        checkpoint_type=checkpoint_type, checkpoint=checkpoint, metadata_type=metadata_type, checkpoint_metadata=metadata,
+    )
+    session = FakeCheckpointSession([row])
+    saver.session_factory = lambda: session
+
+    history = [t async for t in saver.alist({"configurable": {"thread_id": "agent-1:t"}}, limit=2)]
+
+    assert [t.checkpoint["id"] for t in history] == ["2"]
+    sql = str(session.statements[0].compile(dialect=postgresql.dialect()))
+    assert "LIMIT" in sql
+    # One query for the checkpoints and one for the writes of the single row returned
+    assert len(session.statements) == 2
+
+@pytest.mark.asyncio
+async def test_threads_are_scoped_to_their_agent(monkeypatch, graph_data):
+    """Test that two agents using the same thread_id do not share checkpoints."""
+    saver = InMemorySaver()
+    monkeypatch.setattr("graph_executor.get_checkpointer", lambda: saver)
+    other_data = {
+        **graph_data,
+        "nodes": [{**node, "metadata": {**node["metadata"], "agent_id": "agent-2"}} for node in graph_data["nodes"]],
+    }
+
+    await graph_executor.arun_graph(graph_executor.compile_graph(graph_data), {"message": "hi"}, thread_id="shared")
+    result = await graph_executor.arun_graph(graph_executor.compile_graph(other_data), {"message": "hi"}, thread_id="shared")
+
+    assert result["visited"] == ["topic_1", "topic_2"]
+    assert {checkpoint.config["configurable"]["thread_id"] for checkpoint in saver.list(None)} == {
+        "agent-1:shared", "agent-2:shared",
+    }
+
+@pytest.mark.asyncio
+async def test_process_nodes_run_in_worker_processes(monkeypatch, graph_data):
+    """Test that nodes configured for the process pool produce the same result."""
+    pool = NodeProcessPool(workers=1, preload_modules=["my_agent_modules"])
+    monkeypatch.setattr("graph_executor.node_processes", pool)
+    monkeypatch.setattr("graph_executor.settings.graph_process_nodes", ["my_agent_modules.handle_topic"])
+    try:
+        graph = graph_executor.compile_graph(graph_data)
+        async_result = await graph.ainvoke({"message": "hello"})
+        sync_result = graph.invoke({"message": "hello"})
+    finally:
+        pool.shutdown()
+
+    assert async_result["outputs"] == {
+        "topic_1": "Processed topic: Topic 1",
+        "topic_2": "Processed topic: Topic 2",
+    }
+    assert sync_result == async_result
+
+def test_async_process_nodes_are_awaited_in_the_worker(monkeypatch):
+    """Test that a coroutine node function listed for the process pool returns its result, not a coroutine."""
+    import orjson
+    from node_process_pool import _run_node
+
+    async def async_topic(state, context):
+        await asyncio.sleep(0)
+        return {"visited": [context.node_name]}
+
+    registry = NodeRegistry()
+    registry.register("my_agent_modules", "handle_topic", async_topic)
+    monkeypatch.setattr("node_process_pool.node_registry", registry)
+
+    result = _run_node("my_agent_modules", "handle_topic", orjson.dumps({}), orjson.dumps({"node_name": "topic_1"}))
+
+    assert orjson.loads(result) == {"visited": ["topic_1"]}
+
+def slow_topic_registry(delay: float) -> NodeRegistry:
+    async def slow_topic(state, context):
+        if context.node_name == "topic_2":
+            await asyncio.sleep(delay)
+        return {"current_node": context.node_name, "visited": [context.node_name]}
+
+    registry = NodeRegistry()
+    registry.register("my_agent_modules", "handle_topic", slow_topic)
+    return registry
+
+@pytest.mark.asyncio
+async def test_run_with_deadline_completes_within_budget(graph_data):
+    """Test that a run inside its budgets returns the final state."""
+    graph = graph_executor.compile_graph(graph_data)
+    outcome = await graph_executor.arun_graph_with_deadline(
+        graph, {"message": "hello"}, run_timeout=5, node_timeout=5
+    )
+    assert outcome["status"] == "completed"
+    assert outcome["stopped_at"] is None
+    assert outcome["result"]["visited"] == ["topic_1", "topic_2"]
+
+@pytest.mark.asyncio
+async def test_run_with_deadline_stops_slow_node(monkeypatch, graph_data):
+    """Test that a node over its budget is cancelled and reported with the partial state."""
+    monkeypatch.setattr("graph_executor.node_registry", slow_topic_registry(delay=5))
+    graph = graph_executor.compile_graph(graph_data)
+
+    started = asyncio.get_running_loop().time()
+    outcome = await graph_executor.arun_graph_with_deadline(
+        graph, {"message": "hello"}, run_timeout=10, node_timeout=0.1
+    )
+
+    assert asyncio.get_running_loop().time() - started < 2
+    assert outcome["status"] == "timeout"
+    assert outcome["reason"] == "node_budget"
+    assert outcome["stopped_at"] == ["topic_2"]
+    assert outcome["result"]["visited"] == ["topic_1"]
+
+@pytest.mark.asyncio
+async def test_run_with_deadline_cancels_on_disconnect(monkeypatch, graph_data):
+    """Test that a client disconnect cancels the in-flight run."""
+    monkeypatch.setattr("graph_executor.node_registry", slow_topic_registry(delay=5))
+    graph = graph_executor.compile_graph(graph_data)
+
+    outcome = await graph_executor.arun_graph_with_deadline(
+        graph, {"message": "hello"}, is_disconnected=AsyncMock(return_value=True), poll_interval=0.05
+    )
+
+    assert outcome["status"] == "cancelled"
+    assert outcome["reason"] == "client_disconnected"
+    assert outcome["stopped_at"] == ["topic_2"]
+
+@pytest.fixture
+def branching_graph_data(graph_data):
+    topic_3 = {**graph_data["nodes"][1], "name": "topic_3", "metadata": {**graph_data["nodes"][1]["metadata"], "topic_id": "3"}}
+    graph_data["nodes"].append(topic_3)
+    graph_data["edges"] = [
+        {"from": "topic_1", "to": "topic_2", "condition": "billing"},
+        {"from": "topic_1", "to": "topic_3", "condition": None},
+    ]
+    return graph_data
+
+def intent_from_message(state, context):
+    return {"visited": [context.node_name], "intent": state.get("message")}
+
+@pytest.mark.parametrize("message,visited", [
+    ("billing", ["topic_1", "topic_2"]),
+    ("anything else", ["topic_1", "topic_3"]),
+])
+def test_conditional_edges_run_only_the_matching_branch(monkeypatch, branching_graph_data, message, visited):
+    """Test that a run follows the branch selected by the intent, or the default branch."""
+    registry = NodeRegistry()
+    registry.register("my_agent_modules", "handle_topic", intent_from_message)
+    monkeypatch.setattr("graph_executor.node_registry", registry)
+    graph = graph_executor.compile_graph(branching_graph_data)
+    assert graph.invoke({"message": message})["visited"] == visited
+
+@pytest.mark.asyncio
+async def test_parallel_stage_runs_in_one_superstep(monkeypatch, graph_data):
+    """Test that entry topics of one stage run concurrently and the next stage runs once."""
+    in_flight = {"now": 0, "max": 0}
+
+    async def tracked_topic(state, context):
+        in_flight["now"] += 1
+        in_flight["max"] = max(in_flight["max"], in_flight["now"])
+        await asyncio.sleep(0.05)
+        in_flight["now"] -= 1
+        return {"visited": [context.node_name], "outputs": {context.node_name: "done"}}
+
+    registry = NodeRegistry()
+    registry.register("my_agent_modules", "handle_topic", tracked_topic)
+    monkeypatch.setattr("graph_executor.node_registry", registry)
+    topic_3 = {**graph_data["nodes"][1], "name": "topic_3"}
+    graph_data["nodes"].append(topic_3)
+    graph_data["entry_nodes"] = ["topic_1", "topic_2"]
+    graph_data["edges"] = [{"from": "topic_1", "to": "topic_3"}, {"from": "topic_2", "to": "topic_3"}]
+
+    result = await graph_executor.compile_graph(graph_data).ainvoke({"message": "hello"})
+
+    assert in_flight["max"] == 2
+    assert sorted(result["visited"][:2]) == ["topic_1", "topic_2"]
+    assert result["visited"][2:] == ["topic_3"]
+    assert set(result["outputs"]) == {"topic_1", "topic_2", "topic_3"}
+
+@pytest.mark.asyncio
+async def test_lazy_instructions_load_once_on_first_run(monkeypatch, graph_data):
+    """Test that skeleton nodes fetch their instructions only when they first run."""
+    seen = []
+
+    def record_instructions(state, context):
+        seen.append((context.node_name, context.instructions))
+        return {"visited": [context.node_name]}
+
+    registry = NodeRegistry()
+    registry.register("my_agent_modules", "handle_topic", record_instructions)
+    monkeypatch.setattr("graph_executor.node_registry", registry)
+    for node in graph_data["nodes"]:
+        node["metadata"]["instructions"] = None
+    load_instructions = AsyncMock(side_effect=lambda topic_id: [{"id": f"i{topic_id}", "text": "Loaded"}])
+    graph = graph_executor.compile_graph(graph_data, load_instructions)
+
+    assert load_instructions.await_count == 0
+    await graph.ainvoke({"message": "hello"})
+    await graph.ainvoke({"message": "again"})
+
+    assert load_instructions.await_count == 2
+    assert seen[0] == ("topic_1", (Instruction(id="i1", text="Loaded"),))
+    assert seen[3] == ("topic_2", (Instruction(id="i2", text="Loaded"),))
+
+def test_lazy_instructions_sync_runs_read_the_injected_source(monkeypatch, graph_data):
+    """Test that sync runs load instructions from the source the async loader belongs to."""
+    class Source:
+        async def get_topic_instructions(self, topic_id):
+            raise AssertionError("sync runs use the sync loader")
+
+        def load_topic_instructions(self, topic_id):
+            return [{"id": f"i{topic_id}", "text": "From source"}]
+
+    default_source = MagicMock()
+    default_source.load_topic_instructions.side_effect = AssertionError("not the configured source")
+    monkeypatch.setattr("graph_executor.get_graph_source", lambda: default_source)
+    for node in graph_data["nodes"]:
+        node["metadata"]["instructions"] = None
+
+    result = graph_executor.compile_graph(graph_data, Source().get_topic_instructions).invoke({"message": "hello"})
+    assert result["visited"] == ["topic_1", "topic_2"]
+
+    loader = AsyncMock(side_effect=lambda topic_id: [{"id": f"i{topic_id}", "text": "Loaded"}])
+    lazy = graph_executor.LazyInstructions(graph_executor.NodeContext(node_name="topic_1", topic_id="1"), loader)
+    assert lazy.get().instructions == (Instruction(id="i1", text="Loaded"),)
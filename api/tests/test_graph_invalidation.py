@@ -0,0 +1,176 @@
+import asyncio
+import re
+from types import SimpleNamespace
+import orjson
+import pytest
+from sqlalchemy.dialects import postgresql
+from graph_cache import GraphCache
+from graph_snapshots import StructureSnapshots
+from graph_invalidation import INSTANCE_ID, InvalidationListener, notify_statement
+from graph_outbox import OutboxDispatcher, enqueue
+
+def payload(agent_id: str, origin: str = "other-worker") -> str:
+    return orjson.dumps({"agent_id": agent_id, "origin": origin}).decode()
+
+class FakeDb:
+    def __init__(self, events=()):
+        self.events = list(events)
+        self.log = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return None
+
+    def add(self, obj):
+        self.log.append(("add", obj))
+
+    def execute(self, statement):
+        sql = str(statement.compile(dialect=postgresql.dialect(), compile_kwargs={"literal_binds": True}))
+        self.log.append(("execute", sql))
+        return SimpleNamespace(scalars=lambda: SimpleNamespace(all=lambda: self.events))
+
+    def commit(self):
+        self.log.append(("commit", None))
+
+    def notified(self) -> list[str]:
+        return [re.search(r'"agent_id":"([^"]+)"', sql).group(1)
+                for kind, sql in self.log if kind == "execute" and "pg_notify" in sql]
+
+def test_notify_statement_names_the_agent():
+    """Test that the notification carries the agent id and this worker's origin."""
+    sql = str(notify_statement("agent-1").compile(dialect=postgresql.dialect(), compile_kwargs={"literal_binds": True}))
+    assert "pg_notify('graph_cache_invalidation'" in sql
+    assert '"agent_id":"agent-1"' in sql
+    assert INSTANCE_ID in sql
+
+def test_listener_evicts_only_the_named_agent():
+    """Test that a notification from another worker invalidates just that agent."""
+    cache = GraphCache(10, 60)
+    cache.set("agent-1", "graph-1")
+    cache.set("agent-2", "graph-2")
+    listener = InvalidationListener("postgresql://unused", "graph_cache_invalidation", 0, cache=cache)
+
+    listener.handle(payload("agent-1"))
+
+    assert cache.get("agent-1") is None
+    assert cache.get("agent-2") == "graph-2"
+
+def test_listener_skips_its_own_and_malformed_notifications():
+    """Test that a worker's own notifications and garbage payloads leave the cache alone."""
+    cache = GraphCache(10, 60)
+    cache.set("agent-1", "graph-1")
+    listener = InvalidationListener("postgresql://unused", "graph_cache_invalidation", 0, cache=cache)
+
+    listener.handle(payload("agent-1", origin=INSTANCE_ID))
+    listener.handle("not json")
+    listener.handle('{"origin": "other-worker"}')
+
+    assert cache.get("agent-1") == "graph-1"
+
+def test_enqueue_notifies_in_the_writers_transaction():
+    """Test that queueing an outbox event also queues the NOTIFY before the caller commits."""
+    db = FakeDb()
+    enqueue(db, "topic", "t1", {"topic": {}}, agent_id="agent-1")
+    assert db.notified() == ["agent-1"]
+    assert ("commit", None) not in db.log
+
+def test_dispatcher_notifies_after_syncing_neo4j(monkeypatch):
+    """Test that a drained batch tells the other workers to rebuild from the synced graph."""
+    monkeypatch.setattr("graph_outbox.sync_graph", lambda **rows: None)
+    events = [
+        SimpleNamespace(id=1, entity_type="topic", entity_id="t1", operation="delete", agent_id="agent-1", payload={}),
+        SimpleNamespace(id=2, entity_type="topic", entity_id="t2", operation="delete", agent_id="agent-1", payload={}),
+    ]
+    db = FakeDb(events)
+    dispatcher = OutboxDispatcher(lambda: db, 10, 0, 3, 1, 10)
+
+    assert dispatcher.drain_once() == 2
+    assert db.notified() == ["agent-1"]
+    assert db.log[-1] == ("commit", None)
+
+@pytest.mark.asyncio
+async def test_reconnect_clears_the_cache(monkeypatch, tmp_path):
+    """Test that notifications possibly missed while disconnected clear the cache, snapshots and generations."""
+    snapshots = StructureSnapshots(str(tmp_path))
+    cache = GraphCache(10, 60, shared_generations=snapshots.generations)
+    connections = []
+
+    class FakeConnection:
+        def __init__(self):
+            self.on_lost = None
+
+        def add_termination_listener(self, callback):
+            self.on_lost = callback
+
+        async def add_listener(self, channel, callback):
+            connections.append(self)
+
+        def is_closed(self):
+            return False
+
+        async def close(self):
+            pass
+
+    async def connect(dsn):
+        return FakeConnection()
+
+    monkeypatch.setattr("graph_invalidation.asyncpg.connect", connect)
+    listener = InvalidationListener("postgresql://unused", "graph_cache_invalidation", 0, cache=cache, snapshots=snapshots)
+    listener.start()
+    try:
+        while not connections:
+            await asyncio.sleep(0)
+        cache.set("agent-1", "graph-1")
+        assert cache.get("agent-1") == "graph-1"
+        generation = snapshots.generation("agent-1")
+        snapshots.save("agent-1", {"nodes": []}, generation)
+        # A build that read the structure before the connection dropped
+        version = cache.version("agent-1")
+
+        connections[0].on_lost(connections[0])
+        while len(connections) < 2:
+            await asyncio.sleep(0)
+        assert cache.get("agent-1") is None
+        assert snapshots.load("agent-1") is None
+        assert snapshots.generation("agent-1") == generation + 1
+        cache.set("agent-1", "stale-graph", version)
+        assert cache.get("agent-1") is None
+    finally:
+        await listener.stop()
+
+@pytest.mark.asyncio
+async def test_service_invalidates_only_after_commit():
+    """Test that a created topic evicts the cached graph once the unit of work commits, never on rollback."""
+    from api.db.uow import UnitOfWork
+    from api.services.topic import TopicCreator
+
+    class FakeSession:
+        def __init__(self):
+            self.log = []
+
+        async def execute(self, statement):
+            self.log.append("notify")
+
+        async def commit(self):
+            self.log.append("commit")
+
+        async def rollback(self):
+            self.log.append("rollback")
+
+    async def add(topic, instructions):
+        return topic
+
+    cache = GraphCache(10, 60)
+    for outcome in ("commit", "rollback"):
+        uow = UnitOfWork(FakeSession())
+        uow.topic.add = add
+        cache.set("agent-1", "graph-1")
+        with pytest.MonkeyPatch.context() as mp:
+            mp.setattr("api.services.topic.compiled_graphs", cache)
+            await TopicCreator(uow, "agent-1").create(SimpleNamespace(agent_id="agent-1"))
+            assert cache.get("agent-1") == "graph-1"
+            await getattr(uow, outcome)()
+        assert uow.session.log == ["notify", outcome]
+        assert (cache.get("agent-1") is None) == (outcome == "commit")
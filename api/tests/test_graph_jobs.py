@@ -0,0 +1,128 @@
+import asyncio
+import dataclasses
+import pytest
+from unittest.mock import AsyncMock
+from graph_jobs import FAILED, SUCCEEDED, GraphJobManager, JobQueueFull
+
+def completed(result: dict) -> dict:
+    return {"status": "completed", "result": result, "stopped_at": None, "reason": None}
+
+async def wait_for_status(manager: GraphJobManager, job_id: str, status: str):
+    for _ in range(100):
+        job = manager.get(job_id)
+        if job and job.status == status:
+            return job
+        await asyncio.sleep(0.01)
+    raise AssertionError(f"job {job_id} never reached {status}")
+
+@pytest.mark.asyncio
+async def test_submitted_job_runs_in_background(monkeypatch):
+    """Test that a job runs on a worker and exposes its result."""
+    monkeypatch.setattr("graph_jobs.aget_compiled_graph", AsyncMock(return_value="graph"))
+    monkeypatch.setattr("graph_jobs.arun_graph_with_deadline", AsyncMock(return_value=completed({"message": "done"})))
+    manager = GraphJobManager(workers=2, max_queue=10, max_finished_jobs=10, max_result_bytes=1024)
+    try:
+        job = manager.submit("agent-1", {"message": "hello"})
+        finished = await wait_for_status(manager, job.id, SUCCEEDED)
+        assert finished.to_dict()["result"] == {"message": "done"}
+        assert finished.input_state is None
+    finally:
+        await manager.stop()
+
+@pytest.mark.asyncio
+async def test_failed_job_reports_error(monkeypatch):
+    """Test that a job whose graph cannot be built is marked failed."""
+    monkeypatch.setattr("graph_jobs.aget_compiled_graph", AsyncMock(side_effect=ValueError("No topics found")))
+    manager = GraphJobManager(workers=1, max_queue=10, max_finished_jobs=10, max_result_bytes=1024)
+    try:
+        job = manager.submit("agent-1", {})
+        finished = await wait_for_status(manager, job.id, FAILED)
+        assert finished.error == "No topics found"
+    finally:
+        await manager.stop()
+
+@pytest.mark.asyncio
+async def test_timed_out_job_keeps_partial_result(monkeypatch):
+    """Test that a job stopped by its deadline is failed but keeps the partial state."""
+    outcome = {"status": "timeout", "result": {"visited": ["topic_1"]}, "stopped_at": ["topic_2"], "reason": "node_budget"}
+    monkeypatch.setattr("graph_jobs.aget_compiled_graph", AsyncMock(return_value="graph"))
+    monkeypatch.setattr("graph_jobs.arun_graph_with_deadline", AsyncMock(return_value=outcome))
+    manager = GraphJobManager(workers=1, max_queue=10, max_finished_jobs=10, max_result_bytes=1024)
+    try:
+        job = manager.submit("agent-1", {})
+        finished = await wait_for_status(manager, job.id, FAILED)
+        assert finished.result == {"visited": ["topic_1"]}
+        assert finished.error == "Run stopped (node_budget) at topic_2"
+    finally:
+        await manager.stop()
+
+@pytest.mark.asyncio
+async def test_finished_jobs_are_evicted_under_memory_cap(monkeypatch):
+    """Test that the oldest finished results are dropped once the byte cap is exceeded."""
+    monkeypatch.setattr("graph_jobs.aget_compiled_graph", AsyncMock(return_value="graph"))
+    monkeypatch.setattr("graph_jobs.arun_graph_with_deadline", AsyncMock(return_value=completed({"message": "x" * 100})))
+    manager = GraphJobManager(workers=1, max_queue=10, max_finished_jobs=10, max_result_bytes=250)
+    try:
+        jobs = [manager.submit("agent-1", {}) for _ in range(3)]
+        await wait_for_status(manager, jobs[-1].id, SUCCEEDED)
+        assert manager.get(jobs[0].id) is None
+        assert manager.get(jobs[1].id) is not None
+    finally:
+        await manager.stop()
+
+@pytest.mark.asyncio
+async def test_oversized_result_is_replaced_by_an_error(monkeypatch):
+    """Test that a result over the byte cap fails the job with an explanation instead of evicting it."""
+    monkeypatch.setattr("graph_jobs.aget_compiled_graph", AsyncMock(return_value="graph"))
+    monkeypatch.setattr("graph_jobs.arun_graph_with_deadline", AsyncMock(return_value=completed({"message": "x" * 100})))
+    manager = GraphJobManager(workers=1, max_queue=10, max_finished_jobs=10, max_result_bytes=50)
+    try:
+        job = manager.submit("agent-1", {})
+        finished = await wait_for_status(manager, job.id, FAILED)
+        assert finished.result is None
+        assert "exceeds the 50 byte limit" in finished.error
+    finally:
+        await manager.stop()
+
+class FakeJobStore:
+    def __init__(self):
+        self.rows = {}
+
+    def save(self, job):
+        self.rows[job.id] = dataclasses.replace(job)
+
+    def load(self, job_id):
+        return self.rows.get(job_id)
+
+@pytest.mark.asyncio
+async def test_jobs_can_be_polled_from_another_worker(monkeypatch):
+    """Test that a job run by one worker is visible through the shared store to the others."""
+    monkeypatch.setattr("graph_jobs.aget_compiled_graph", AsyncMock(return_value="graph"))
+    monkeypatch.setattr("graph_jobs.arun_graph_with_deadline", AsyncMock(return_value=completed({"message": "done"})))
+    store = FakeJobStore()
+    running = GraphJobManager(workers=1, max_queue=10, max_finished_jobs=10, max_result_bytes=1024, store=store)
+    polling = GraphJobManager(workers=1, max_queue=10, max_finished_jobs=10, max_result_bytes=1024, store=store)
+    try:
+        job = await running.asubmit("agent-1", {"message": "hello"})
+        assert (await polling.aget(job.id)) is not None
+        await wait_for_status(running, job.id, SUCCEEDED)
+        for _ in range(100):
+            polled = await polling.aget(job.id)
+            if polled.status == SUCCEEDED:
+                break
+            await asyncio.sleep(0.01)
+        assert polled.to_dict()["result"] == {"message": "done"}
+        assert await polling.aget("missing") is None
+    finally:
+        await running.stop()
+
+@pytest.mark.asyncio
+async def test_submit_rejects_when_queue_is_full():
+    """Test that submissions beyond the queue bound are refused."""
+    manager = GraphJobManager(workers=1, max_queue=1, max_finished_jobs=10, max_result_bytes=1024)
+    try:
+        manager.submit("agent-1", {})
+        with pytest.raises(JobQueueFull):
+            manager.submit("agent-1", {})
+    finally:
+        await manager.stop()
@@ -0,0 +1,135 @@
+import logging
+from types import SimpleNamespace
+from unittest.mock import MagicMock
+from sqlalchemy.dialects import postgresql
+from db_neo4j import UNWIND_DELETE_AGENT_NEXT, UNWIND_TOPIC_NEXT, sync_statements
+from graph_outbox import DELETE, UPSERT, OutboxDispatcher, backoff_delay, coalesce_events
+
+def event(id: int, entity_type: str, entity_id: str, payload: dict = None, operation: str = UPSERT, agent_id: str = None):
+    return SimpleNamespace(
+        id=id, entity_type=entity_type, entity_id=entity_id, payload=payload, operation=operation, agent_id=agent_id,
+    )
+
+def topic_payload(label: str) -> dict:
+    return {
+        "topic": {"id": "t1", "agent_id": "a1", "label": label},
+        "instructions": [{"id": "i1", "topic_id": "t1", "instruction_text": label}],
+    }
+
+def test_repeated_updates_coalesce_to_the_latest_snapshot():
+    """Test that several updates to one topic become one write of its newest state."""
+    rows = coalesce_events([
+        event(1, "topic", "t1", topic_payload("first")),
+        event(3, "topic", "t1", topic_payload("third")),
+        event(2, "topic", "t1", topic_payload("second")),
+    ])
+    assert rows == {
+        "topics": [{"id": "t1", "agent_id": "a1", "label": "third"}],
+        "replace_instructions_for": ["t1"],
+        "instructions": [{"id": "i1", "topic_id": "t1", "instruction_text": "third"}],
+    }
+
+def test_delete_after_upsert_wins():
+    """Test that an entity deleted later in the batch is only deleted."""
+    rows = coalesce_events([
+        event(1, "agent", "a1", {"agent": {"id": "a1"}, "user_id": "u1"}),
+        event(2, "topic", "t1", topic_payload("first")),
+        event(3, "topic", "t1", operation=DELETE),
+    ])
+    assert rows == {
+        "agents": [{"id": "a1"}],
+        "user_agents": [{"user_id": "u1", "agent_id": "a1"}],
+        "deleted_topics": ["t1"],
+    }
+
+def test_instruction_older_than_its_topic_snapshot_is_dropped():
+    """Test that an instruction replaced by a later topic update is not merged back."""
+    old_instruction = {"instruction": {"id": "i_old", "topic_id": "t1", "instruction_text": "old"}}
+    new_instruction = {"instruction": {"id": "i_new", "topic_id": "t1", "instruction_text": "new"}}
+    rows = coalesce_events([
+        event(1, "instruction", "i_old", old_instruction),
+        event(2, "topic", "t1", topic_payload("updated")),
+        event(3, "instruction", "i_new", new_instruction),
+    ])
+    assert rows["instructions"] == [
+        {"id": "i1", "topic_id": "t1", "instruction_text": "updated"},
+        new_instruction["instruction"],
+    ]
+
+def test_next_link_changes_coalesce_per_link():
+    """Test that NEXT links are synced through the outbox, the newest change per link winning."""
+    link = {"from": "t1", "to": "t2", "condition": "yes"}
+    rows = coalesce_events([
+        event(1, "next", "t1:t2", {"next": {**link, "condition": None}}),
+        event(2, "next", "t1:t2", {"next": link}),
+        event(3, "next", "t1:t3", {"next": {"from": "t1", "to": "t3", "condition": None}}),
+        event(4, "next", "t1:t3", {"next": {"from": "t1", "to": "t3", "condition": None}}, operation=DELETE),
+    ])
+    assert rows == {
+        "next_links": [link],
+        "deleted_next_links": [{"from": "t1", "to": "t3", "condition": None}],
+    }
+
+def test_next_link_snapshot_replaces_the_agents_links():
+    """Test that a resync replaces an agent's NEXT links, keeping changes made after it."""
+    snapshot = {"next": [
+        {"from": "t1", "to": "t2", "condition": None},
+        {"from": "t2", "to": "t3", "condition": None},
+    ]}
+    rows = coalesce_events([
+        event(1, "next", "t3:t1", {"next": {"from": "t3", "to": "t1", "condition": None}}, agent_id="a1"),
+        event(2, "next_links", "a1", snapshot, agent_id="a1"),
+        event(3, "next", "t2:t3", {"next": {"from": "t2", "to": "t3", "condition": None}}, operation=DELETE, agent_id="a1"),
+    ])
+    assert rows == {
+        "replace_next_for": ["a1"],
+        "next_links": [{"from": "t1", "to": "t2", "condition": None}],
+        "deleted_next_links": [{"from": "t2", "to": "t3", "condition": None}],
+    }
+    statements = [query for query, _ in sync_statements(**rows)]
+    assert statements.index(UNWIND_DELETE_AGENT_NEXT) < statements.index(UNWIND_TOPIC_NEXT)
+
+def test_backoff_grows_exponentially_up_to_the_cap():
+    """Test the retry delay doubles per attempt and stops at the maximum."""
+    assert [backoff_delay(n, 1.0, 10.0) for n in (1, 2, 3, 4, 5)] == [1.0, 2.0, 4.0, 8.0, 10.0]
+
+def test_claim_keeps_each_agent_in_order():
+    """Test that a pass locks the agents it drains and waits behind an agent's pending retries."""
+    dispatcher = OutboxDispatcher(None, batch_size=10, poll_interval=0, max_attempts=3, backoff_seconds=1, max_backoff_seconds=10)
+    sql = str(dispatcher.claim_statement().compile(dialect=postgresql.dialect()))
+    assert "pg_try_advisory_xact_lock" in sql
+    assert "NOT (EXISTS" in sql
+    assert "graph_sync_outbox_1.available_at > now()" in sql
+    assert "FOR UPDATE SKIP LOCKED" in sql
+
+def test_failing_event_only_holds_back_its_own_agent(monkeypatch, caplog):
+    """Test that a bad event is retried alone while other agents' events in the batch are synced."""
+    def queued(id, agent_id, attempts=0):
+        return SimpleNamespace(
+            id=id, entity_type="topic", entity_id=f"t{id}", payload=topic_payload(f"topic {id}"),
+            operation=UPSERT, agent_id=agent_id, attempts=attempts, processed_at=None,
+        )
+
+    events = [queued(1, "a1"), queued(2, "bad", attempts=2), queued(3, "a2")]
+    db = MagicMock()
+    db.execute.return_value.scalars.return_value.all.return_value = events
+    db.__enter__.return_value = db
+    synced = []
+
+    def sync_graph(**rows):
+        if any(topic["label"] == "topic 2" for topic in rows.get("topics", [])):
+            raise RuntimeError("constraint violated")
+        synced.append(rows)
+
+    monkeypatch.setattr("graph_outbox.sync_graph", sync_graph)
+    dispatcher = OutboxDispatcher(lambda: db, batch_size=10, poll_interval=0, max_attempts=3, backoff_seconds=1, max_backoff_seconds=10)
+
+    with caplog.at_level(logging.ERROR, logger="graph_outbox"):
+        assert dispatcher.drain_once() == 3
+
+    assert len(synced) == 2
+    assert events[0].processed_at is not None and events[2].processed_at is not None
+    assert events[1].processed_at is None
+    assert (events[1].attempts, events[1].last_error) == (3, "constraint violated")
+    assert [events[0].attempts, events[2].attempts] == [0, 0]
+    assert "event=2" in caplog.text
@@ -0,0 +1,214 @@
+import pytest
+from unittest.mock import AsyncMock, MagicMock
+from api.db.neo4j import create_neo4j_driver
+from api.db.repositories.graph import GraphRepository
+
+class FakeResult:
+    def __init__(self, records):
+        self.records = records
+
+    def __aiter__(self):
+        return self._iterate()
+
+    async def _iterate(self):
+        for record in self.records:
+            yield record
+
+class FakeSession:
+    def __init__(self, records):
+        self.records = records
+        self.queries = []
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        return None
+
+    async def run(self, query, **params):
+        self.queries.append((query, params))
+        return FakeResult(self.records)
+
+def make_record(topic_id: str, scope: str) -> dict:
+    return {
+        "agent_id": "agent-1",
+        "agent_name": "Test Agent",
+        "topic_id": topic_id,
+        "topic_label": f"Topic {topic_id}",
+        "topic_scope": scope,
+        "instructions": [{"id": f"i{topic_id}", "text": "Do it"}],
+    }
+
+@pytest.mark.asyncio
+async def test_get_graph_structure_reads_through_async_session():
+    """Test that the repository builds the chain from async query records."""
+    session = FakeSession([make_record("1", "a"), make_record("2", "b")])
+    driver = MagicMock()
+    driver.session = MagicMock(return_value=session)
+
+    structure = await GraphRepository(driver).get_graph_structure("agent-1")
+
+    assert structure["entry_node"] == "topic_1"
+    assert [node["name"] for node in structure["nodes"]] == ["topic_1", "topic_2"]
+    assert structure["edges"] == [{"from": "topic_1", "to": "topic_2"}]
+    assert session.queries[0][1] == {"agent_id": "agent-1"}
+
+@pytest.mark.asyncio
+async def test_get_graph_structure_uses_next_relationships():
+    """Test that NEXT relationships replace the scope chain and keep their conditions."""
+    records = [make_record("1", "a"), make_record("2", "b"), make_record("3", "c")]
+    records[0]["next_topics"] = [{"to": "2", "condition": "billing"}, {"to": "3", "condition": None}]
+    session = FakeSession(records)
+    driver = MagicMock()
+    driver.session = MagicMock(return_value=session)
+
+    structure = await GraphRepository(driver).get_graph_structure("agent-1")
+
+    assert structure["entry_node"] == "topic_1"
+    assert structure["edges"] == [
+        {"from": "topic_1", "to": "topic_2", "condition": "billing"},
+        {"from": "topic_1", "to": "topic_3", "condition": None},
+    ]
+
+@pytest.mark.asyncio
+async def test_unlinked_topics_stay_on_the_chain():
+    """Test that topics without NEXT relationships are still reached around the linked ones."""
+    records = [make_record("1", "a"), make_record("2", "b"), make_record("3", "c"), make_record("4", "d")]
+    records[1]["next_topics"] = [{"to": "3", "condition": "billing"}]
+    driver = MagicMock()
+    driver.session = MagicMock(return_value=FakeSession(records))
+
+    structure = await GraphRepository(driver).get_graph_structure("agent-1")
+
+    assert structure["entry_nodes"] == ["topic_1"]
+    assert structure["edges"] == [
+        {"from": "topic_2", "to": "topic_3", "condition": "billing"},
+        {"from": "topic_1", "to": "topic_2"},
+        {"from": "topic_3", "to": "topic_4"},
+    ]
+
+@pytest.mark.asyncio
+async def test_topics_sharing_a_scope_form_one_parallel_stage(monkeypatch):
+    """Test that same-scope topics fan out from the previous stage and join into the next."""
+    monkeypatch.setattr("graph_builder.settings.graph_parallel_scopes", True)
+    records = [make_record("1", "a"), make_record("2", "b"), make_record("3", "b"), make_record("4", "c")]
+    driver = MagicMock()
+    driver.session = MagicMock(return_value=FakeSession(records))
+
+    structure = await GraphRepository(driver).get_graph_structure("agent-1")
+
+    assert structure["entry_nodes"] == ["topic_1"]
+    assert structure["edges"] == [
+        {"from": "topic_1", "to": "topic_2"},
+        {"from": "topic_1", "to": "topic_3"},
+        {"from": "topic_2", "to": "topic_4"},
+        {"from": "topic_3", "to": "topic_4"},
+    ]
+
+@pytest.mark.asyncio
+async def test_topics_sharing_a_scope_run_in_sequence_by_default():
+    """Test that parallel stages are opt-in and same-scope topics keep chaining."""
+    records = [make_record("1", "a"), make_record("2", "b"), make_record("3", "b")]
+    driver = MagicMock()
+    driver.session = MagicMock(return_value=FakeSession(records))
+
+    structure = await GraphRepository(driver).get_graph_structure("agent-1")
+
+    assert structure["edges"] == [{"from": "topic_1", "to": "topic_2"}, {"from": "topic_2", "to": "topic_3"}]
+
+def test_create_neo4j_driver_applies_pool_settings(monkeypatch):
+    """Test that pool and fetch size settings are passed to the driver."""
+    driver_mock = MagicMock()
+    monkeypatch.setattr("api.db.neo4j.AsyncGraphDatabase.driver", driver_mock)
+    settings = MagicMock()
+    settings.neo4j_uri = "bolt://localhost:7687"
+    settings.neo4j_username = "neo4j_user"
+    settings.neo4j_password = "neo4j_password"
+    settings.neo4j_max_connection_pool_size = 7
+    settings.neo4j_connection_acquisition_timeout = 5.0
+    settings.neo4j_fetch_size = 250
+
+    create_neo4j_driver(settings)
+
+    driver_mock.assert_called_once_with(
+        "bolt://localhost:7687",
+        auth=("neo4j_user", "neo4j_password"),
+        max_connection_pool_size=7,
+        connection_acquisition_timeout=5.0,
+        fetch_size=250,
+    )
+
+@pytest.mark.asyncio
+async def test_lazy_mode_loads_topic_skeletons(monkeypatch):
+    """Test that lazy mode uses the skeleton query and leaves instructions unloaded."""
+    monkeypatch.setattr("graph_builder.settings.graph_lazy_instructions", True)
+    record = make_record("1", "a")
+    del record["instructions"]
+    session = FakeSession([record])
+    driver = MagicMock()
+    driver.session = MagicMock(return_value=session)
+
+    structure = await GraphRepository(driver).get_graph_structure("agent-1")
+
+    assert "HAS_INSTRUCTION" not in session.queries[0][0]
+    assert structure["nodes"][0]["metadata"]["instructions"] is None
+
+class FakeTransaction:
+    def __init__(self):
+        self.runs = []
+
+    def run(self, query, **params):
+        self.runs.append((query, params))
+        return MagicMock()
+
+class FakeWriteSession:
+    def __init__(self):
+        self.tx = FakeTransaction()
+        self.transactions = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return None
+
+    def execute_write(self, work, *args):
+        self.transactions += 1
+        return work(self.tx, *args)
+
+def test_sync_graph_writes_rows_in_batched_unwinds(monkeypatch):
+    """Test that a bulk sync is one transaction with one UNWIND per batch of rows."""
+    from db_neo4j import sync_graph
+    monkeypatch.setattr("db_neo4j.settings.neo4j_batch_size", 1000)
+    session = FakeWriteSession()
+    driver = MagicMock()
+    driver.session = MagicMock(return_value=session)
+    monkeypatch.setattr("db_neo4j.get_driver", lambda: driver)
+    topics = [{"id": str(t), "agent_id": "agent-1", "label": f"Topic {t}"} for t in range(200)]
+    instructions = [{"id": f"i{i}", "topic_id": str(i % 200), "instruction_text": "Do it"} for i in range(2500)]
+
+    sync_graph(topics=topics, instructions=instructions)
+
+    assert session.transactions == 1
+    assert [len(params["rows"]) for _, params in session.tx.runs] == [200, 1000, 1000, 500]
+    assert all("UNWIND $rows" in query for query, _ in session.tx.runs)
+
+@pytest.mark.asyncio
+async def test_graph_builder_reads_through_the_installed_driver(monkeypatch):
+    """Test that module-level reads use the app's driver and closing leaves it to the app."""
+    import db_neo4j
+    from graph_builder import aget_graph_structure
+    session = FakeSession([make_record("1", "a")])
+    driver = MagicMock()
+    driver.session = MagicMock(return_value=session)
+    driver.close = AsyncMock()
+    monkeypatch.setattr("db_neo4j.AsyncGraphDatabase.driver", MagicMock(side_effect=AssertionError("no own driver")))
+
+    db_neo4j.use_async_driver(driver)
+    try:
+        structure = await aget_graph_structure("agent-1")
+    finally:
+        await db_neo4j.aclose_drivers()
+
+    assert structure["entry_node"] == "topic_1"
+    driver.close.assert_not_awaited()
@@ -0,0 +1,71 @@
+import orjson
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from unittest.mock import AsyncMock
+import graph_executor
+from routers.graph_router import router
+
+def make_client(monkeypatch, graph_data) -> TestClient:
+    graph = graph_executor.compile_graph(graph_data)
+    monkeypatch.setattr("routers.graph_router.aget_compiled_graph", AsyncMock(return_value=graph))
+    app = FastAPI()
+    app.include_router(router)
+    return TestClient(app)
+
+def test_run_reports_completed_status(monkeypatch, graph_data):
+    """Test that a run within its deadline returns the final state and status."""
+    client = make_client(monkeypatch, graph_data)
+    response = client.post("/graph/run/agent-1", json={"message": "hello"})
+    assert response.status_code == 200
+    body = response.json()
+    assert body["status"] == "completed"
+    assert body["stopped_at"] is None
+    assert body["result"]["visited"] == ["topic_1", "topic_2"]
+
+def test_stream_emits_one_ndjson_line_per_node(monkeypatch, graph_data):
+    """Test that the NDJSON stream reports each node as it completes."""
+    client = make_client(monkeypatch, graph_data)
+    response = client.post("/graph/stream/agent-1?format=ndjson", json={"message": "hello"})
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    events = [orjson.loads(line) for line in response.text.splitlines()]
+    assert [e["event"] for e in events] == ["node", "node", "end"]
+    assert [e["node"] for e in events[:2]] == ["topic_1", "topic_2"]
+    assert events[0]["topic_label"] == "Topic 1"
+    assert events[1]["message"] == "Processed topic: Topic 2"
+
+def test_stream_defaults_to_server_sent_events(monkeypatch, graph_data):
+    """Test that the stream uses SSE framing by default."""
+    client = make_client(monkeypatch, graph_data)
+    response = client.post("/graph/stream/agent-1", json={"message": "hello"})
+    assert response.headers["content-type"].startswith("text/event-stream")
+    assert response.text.count("event: node\n") == 2
+    assert response.text.endswith("event: end\ndata: {}\n\n")
+
+def test_batch_returns_results_tagged_by_index(monkeypatch, graph_data):
+    """Test that a JSON list batch returns one result line per input, in order."""
+    client = make_client(monkeypatch, graph_data)
+    inputs = [{"message": f"hello {i}"} for i in range(5)]
+    response = client.post("/graph/batch/agent-1?concurrency=2", json=inputs)
+    assert response.status_code == 200
+    lines = [orjson.loads(line) for line in response.text.splitlines()]
+    assert [line["index"] for line in lines] == [0, 1, 2, 3, 4]
+    assert all(line["result"]["current_node"] == "topic_2" for line in lines)
+
+def test_batch_accepts_ndjson_body(monkeypatch, graph_data):
+    """Test that input states can be streamed in as NDJSON."""
+    client = make_client(monkeypatch, graph_data)
+    body = b"\n".join(orjson.dumps({"message": f"hello {i}"}) for i in range(3)) + b"\n"
+    response = client.post(
+        "/graph/batch/agent-1?ordered=false",
+        content=body,
+        headers={"content-type": "application/x-ndjson"},
+    )
+    lines = [orjson.loads(line) for line in response.text.splitlines()]
+    assert sorted(line["index"] for line in lines) == [0, 1, 2]
+
+def test_batch_rejects_non_list_body(monkeypatch, graph_data):
+    """Test that a JSON body that is not a list of objects is rejected."""
+    client = make_client(monkeypatch, graph_data)
+    response = client.post("/graph/batch/agent-1", json={"message": "hello"})
+    assert response.status_code == 400
@@ -0,0 +1,93 @@
+import pytest
+from unittest.mock import AsyncMock
+from graph_cache import GraphCache
+from graph_snapshots import StructureSnapshots
+
+@pytest.fixture
+def snapshots(tmp_path):
+    return StructureSnapshots(str(tmp_path), max_age_seconds=60)
+
+def test_round_trip(snapshots, graph_data):
+    """Test that a saved structure is read back unchanged."""
+    snapshots.save("agent-1", graph_data, snapshots.generation("agent-1"))
+    assert snapshots.load("agent-1") == graph_data
+
+def test_disabled_without_a_directory(graph_data):
+    """Test that an empty directory setting turns snapshots off."""
+    snapshots = StructureSnapshots("")
+    snapshots.save("agent-1", graph_data, snapshots.generation("agent-1"))
+    assert snapshots.load("agent-1") is None
+
+def test_other_settings_or_old_snapshots_are_not_reused(snapshots, graph_data, monkeypatch):
+    """Test that a changed structure version or an expired snapshot is discarded."""
+    snapshots.save("agent-1", graph_data, snapshots.generation("agent-1"))
+    monkeypatch.setattr("graph_snapshots.settings.graph_parallel_scopes", True)
+    assert snapshots.load("agent-1") is None
+    assert not snapshots.path("agent-1").exists()
+
+    monkeypatch.setattr("graph_snapshots.settings.graph_parallel_scopes", False)
+    snapshots.save("agent-1", graph_data, snapshots.generation("agent-1"))
+    snapshots.max_age_seconds = -1
+    assert snapshots.load("agent-1") is None
+
+def test_corrupt_snapshot_is_dropped(snapshots, graph_data):
+    """Test that an unreadable file is treated as a miss and removed."""
+    snapshots.save("agent-1", graph_data, snapshots.generation("agent-1"))
+    snapshots.path("agent-1").write_bytes(b"not a snapshot")
+    assert snapshots.load("agent-1") is None
+    assert not snapshots.path("agent-1").exists()
+
+def test_reads_before_an_invalidation_are_not_stored(snapshots, graph_data):
+    """Test that a build which loaded its structure before an invalidation cannot persist it."""
+    generation = snapshots.generation("agent-1")
+    snapshots.save("agent-1", graph_data, generation)
+    snapshots.invalidate("agent-1")
+    assert snapshots.load("agent-1") is None
+
+    # A slow build that started before the invalidation finishes afterwards
+    snapshots.save("agent-1", graph_data, generation)
+    assert snapshots.load("agent-1") is None
+
+    snapshots.save("agent-1", graph_data, snapshots.generation("agent-1"))
+    assert snapshots.load("agent-1") == graph_data
+
+def test_cache_invalidation_drops_the_snapshot(snapshots, graph_data):
+    """Test that invalidating the in-memory cache also removes the agent's snapshot."""
+    cache = GraphCache(max_size=10, ttl_seconds=60, on_invalidate=[snapshots.invalidate])
+    snapshots.save("agent-1", graph_data, snapshots.generation("agent-1"))
+    cache.invalidate("agent-1")
+    assert snapshots.load("agent-1") is None
+
+@pytest.mark.asyncio
+async def test_warm_start_skips_the_source(snapshots, graph_data, monkeypatch):
+    """Test that a second cold cache compiles from the snapshot without loading the structure."""
+    from graph_executor import abuild_and_compile_graph
+
+    monkeypatch.setattr("graph_executor.structure_snapshots", snapshots)
+    load_structure = AsyncMock(return_value=graph_data)
+
+    await abuild_and_compile_graph("agent-1", load_structure)
+    graph = await abuild_and_compile_graph("agent-1", load_structure)
+
+    assert load_structure.await_count == 1
+    assert "topic_1" in graph.get_graph().nodes
+
+def test_invalidation_in_one_worker_evicts_the_others(tmp_path, graph_data):
+    """Test that caches sharing a snapshot directory drop an agent invalidated by any of them."""
+    worker_a = StructureSnapshots(str(tmp_path))
+    worker_b = StructureSnapshots(str(tmp_path))
+    cache_a = GraphCache(10, 60, on_invalidate=[worker_a.invalidate], shared_generations=worker_a.generations)
+    cache_b = GraphCache(10, 60, on_invalidate=[worker_b.invalidate], shared_generations=worker_b.generations)
+
+    cache_a.set("agent-1", "graph-a")
+    cache_b.set("agent-1", "graph-b")
+    cache_b.set("agent-2", "other-graph")
+    # Worker B can compile from the structure worker A loaded
+    worker_a.save("agent-1", graph_data, worker_a.generation("agent-1"))
+    assert worker_b.load("agent-1") == graph_data
+
+    cache_a.invalidate("agent-1")
+
+    assert cache_b.get("agent-1") is None
+    assert cache_b.get("agent-2") == "other-graph"
+    assert worker_b.load("agent-1") is None
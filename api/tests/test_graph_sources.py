@@ -0,0 +1,114 @@
+import uuid
+import pytest
+from sqlalchemy.dialects import postgresql
+from graph_builder import build_graph_structure
+from graph_sources import Neo4jGraphSource, PostgresGraphSource, get_graph_source
+
+AGENT_ID = uuid.UUID("00000000-0000-0000-0000-00000000000a")
+TOPIC_IDS = [uuid.UUID(f"00000000-0000-0000-0000-00000000000{i}") for i in (1, 2)]
+
+class FakeResult:
+    def __init__(self, rows):
+        self.rows = rows
+
+    def mappings(self):
+        return self
+
+    def all(self):
+        return self.rows
+
+class FakeSession:
+    def __init__(self, rows):
+        self.rows = rows
+        self.statements = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return None
+
+    def execute(self, statement):
+        self.statements.append(statement)
+        return FakeResult(self.rows)
+
+def postgres_rows() -> list[dict]:
+    return [
+        {
+            "agent_id": AGENT_ID,
+            "agent_name": "Test Agent",
+            "topic_id": topic_id,
+            "topic_label": f"Topic {i}",
+            "topic_scope": str(i),
+            "topic_description": None,
+            "instructions": [{"id": f"i{i}", "text": "Do it"}],
+        }
+        for i, topic_id in enumerate(TOPIC_IDS, start=1)
+    ]
+
+def test_structure_is_fetched_in_one_aggregated_statement():
+    """Test that topics, their instructions and NEXT links come back in a single json_agg query."""
+    statement = PostgresGraphSource.structure_statement(str(AGENT_ID))
+    sql = str(statement.compile(dialect=postgresql.dialect()))
+
+    # The outer query plus the correlated NEXT-link subquery
+    assert sql.count("SELECT") == 2
+    assert "FROM topic_next" in sql
+    assert "json_agg(json_build_object(" in sql
+    assert "LEFT OUTER JOIN topic_instructions" in sql
+    assert "ORDER BY topics.scope" in sql
+
+def test_skeleton_statement_skips_instructions():
+    """Test that lazy mode leaves the instruction join out of the query."""
+    statement = PostgresGraphSource.structure_statement(str(AGENT_ID), with_instructions=False)
+    sql = str(statement.compile(dialect=postgresql.dialect()))
+
+    assert "topic_instructions" not in sql
+    assert "AS instructions" not in sql
+
+@pytest.mark.asyncio
+async def test_postgres_structure_matches_neo4j_structure():
+    """Test that Postgres rows build the same structure as the equivalent Neo4j records."""
+    session = FakeSession(postgres_rows())
+    source = PostgresGraphSource(lambda: session)
+
+    structure = await source.get_graph_structure(str(AGENT_ID))
+
+    neo4j_records = [
+        {**row, "agent_id": str(AGENT_ID), "topic_id": str(row["topic_id"]), "next_topics": []}
+        for row in postgres_rows()
+    ]
+    assert structure == build_graph_structure(str(AGENT_ID), neo4j_records)
+    assert structure["nodes"][0]["name"] == f"topic_{TOPIC_IDS[0]}"
+    assert len(session.statements) == 1
+
+@pytest.mark.asyncio
+async def test_postgres_source_keeps_next_links():
+    """Test that NEXT links stored in topic_next become conditional edges."""
+    rows = postgres_rows()
+    rows[0]["next_topics"] = [{"to": str(TOPIC_IDS[1]), "condition": "billing"}]
+    rows[1]["next_topics"] = None
+    source = PostgresGraphSource(lambda: FakeSession(rows))
+
+    structure = await source.get_graph_structure(str(AGENT_ID))
+
+    assert structure["edges"] == [
+        {"from": f"topic_{TOPIC_IDS[0]}", "to": f"topic_{TOPIC_IDS[1]}", "condition": "billing"},
+    ]
+
+@pytest.mark.asyncio
+async def test_postgres_source_rejects_malformed_agent_ids():
+    """Test that a non-UUID agent id is a ValueError, which the routers turn into a 400."""
+    with pytest.raises(ValueError):
+        await PostgresGraphSource(lambda: FakeSession([])).get_graph_structure("not-a-uuid")
+
+def test_configured_source(monkeypatch):
+    """Test that settings.graph_source picks the implementation."""
+    get_graph_source.cache_clear()
+    monkeypatch.setattr("graph_sources.settings.graph_source", "postgres")
+    assert isinstance(get_graph_source(), PostgresGraphSource)
+
+    get_graph_source.cache_clear()
+    monkeypatch.setattr("graph_sources.settings.graph_source", "neo4j")
+    assert isinstance(get_graph_source(), Neo4jGraphSource)
+    get_graph_source.cache_clear()
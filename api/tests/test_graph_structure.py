@@ -0,0 +1,55 @@
+import tracemalloc
+from graph_builder import build_graph_structure
+from graph_structure import GraphStructure, Instruction
+
+def make_records(topics: int, instructions: int) -> list[dict]:
+    return [
+        {
+            "agent_id": "agent-1",
+            "agent_name": "Test Agent",
+            "topic_id": str(t),
+            "topic_label": f"Topic {t}",
+            "topic_scope": f"{t:04d}",
+            "topic_description": None,
+            "instructions": [{"id": f"i{t}-{i}", "text": f"Instruction {i} for topic {t}"} for i in range(instructions)],
+        }
+        for t in range(topics)
+    ]
+
+def traced(factory):
+    """Return factory() and the bytes it allocated that are still alive."""
+    tracemalloc.start()
+    try:
+        value = factory()
+        size, _ = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return value, size
+
+def test_structure_round_trips_through_dict(graph_data):
+    """Test that the compact form converts back to the served dict shape."""
+    structure = GraphStructure.from_dict(graph_data)
+    assert structure.nodes[0].instructions == (Instruction(id="i1", text="Instruction 1"),)
+    assert structure.nodes[1].instructions[0]["text"] == "Instruction 2"
+    assert structure.edges[0].source == "topic_1"
+    assert GraphStructure.from_dict(structure.to_dict()) == structure
+
+def test_compact_structure_uses_less_memory_per_agent(monkeypatch, capsys):
+    """Test that the slotted structure is smaller than the dict-of-dicts it replaces."""
+    # Keep build_graph_structure's debug output out of the measurement
+    monkeypatch.setattr("builtins.print", lambda *args, **kwargs: None)
+
+    def load_dicts():
+        return build_graph_structure("agent-1", make_records(topics=200, instructions=10))
+
+    def load_compact():
+        return GraphStructure.from_dict(load_dicts())
+
+    load_compact()  # warm up one-time allocations before measuring
+    _, dict_bytes = traced(load_dicts)
+    _, compact_bytes = traced(load_compact)
+    monkeypatch.undo()
+
+    with capsys.disabled():
+        print(f"\nper-agent footprint: dicts={dict_bytes}B compact={compact_bytes}B")
+    assert compact_bytes < dict_bytes * 0.75
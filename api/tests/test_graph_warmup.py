@@ -0,0 +1,81 @@
+import asyncio
+import time
+import orjson
+import pytest
+from graph_cache import RunCounts, compiled_graphs
+from graph_warmup import awarm_up, warmup_agent_ids
+
+def test_run_counts_merge_across_flushes(tmp_path):
+    """Test that counts from several workers add up in one file, most-run first."""
+    path = str(tmp_path / "run_counts.json")
+    first, second = RunCounts(path), RunCounts(path)
+    for _ in range(3):
+        first.record("agent-a")
+    first.record("agent-b")
+    second.record("agent-b")
+    second.record("agent-b")
+    second.record("agent-b")
+    second.record("agent-c")
+
+    first.flush()
+    second.flush()
+
+    assert first.top(2) == ["agent-b", "agent-a"]
+    assert second.top(10) == ["agent-b", "agent-a", "agent-c"]
+
+def test_run_counts_decay(tmp_path):
+    """Test that older runs count less than recent ones."""
+    path = tmp_path / "run_counts.json"
+    path.write_bytes(orjson.dumps({"updated_at": time.time() - 30, "counts": {"old-agent": 4}}))
+    counts = RunCounts(str(path), half_life_seconds=10)
+    counts.record("new-agent")
+    counts.flush()
+
+    # 4 runs three half-lives ago weigh 0.5, less than one run now
+    assert counts.top(2) == ["new-agent", "old-agent"]
+
+def test_warmup_ids_combine_static_list_and_top_agents(monkeypatch):
+    """Test that configured agents come first and duplicates are dropped."""
+    monkeypatch.setattr("graph_warmup.settings.graph_warmup_agents", ["agent-a", "agent-b"])
+    monkeypatch.setattr("graph_warmup.settings.graph_warmup_top_n", 2)
+    monkeypatch.setattr("graph_warmup.run_counts.top", lambda n: ["agent-b", "agent-c"][:n])
+    assert warmup_agent_ids() == ["agent-a", "agent-b", "agent-c"]
+
+@pytest.mark.asyncio
+async def test_warmup_compiles_with_bounded_concurrency(graph_data):
+    """Test that warm-up fills the cache, never loads more than `concurrency` at once and skips failures."""
+    compiled_graphs.clear()
+    in_flight = 0
+    peak = 0
+
+    async def load_structure(agent_id):
+        nonlocal in_flight, peak
+        in_flight += 1
+        peak = max(peak, in_flight)
+        await asyncio.sleep(0.01)
+        in_flight -= 1
+        if agent_id == "broken":
+            raise ValueError("No topics found")
+        return graph_data
+
+    agent_ids = [f"warm-{i}" for i in range(6)] + ["broken"]
+    counts = await awarm_up(agent_ids, concurrency=2, timeout=5, load_structure=load_structure)
+
+    assert counts == {"warmed": 6, "failed": 1, "cancelled": 0}
+    assert peak == 2
+    assert all(compiled_graphs.get(f"warm-{i}") is not None for i in range(6))
+    compiled_graphs.clear()
+
+@pytest.mark.asyncio
+async def test_warmup_gives_up_after_timeout(graph_data):
+    """Test that a slow source cannot hold up startup past the timeout."""
+    compiled_graphs.clear()
+
+    async def load_structure(agent_id):
+        await asyncio.sleep(10)
+        return graph_data
+
+    counts = await awarm_up(["slow-1", "slow-2"], concurrency=2, timeout=0.05, load_structure=load_structure)
+
+    assert counts == {"warmed": 0, "failed": 0, "cancelled": 2}
+    assert compiled_graphs.get("slow-1") is None
@@ -0,0 +1,45 @@
+from unittest.mock import MagicMock
+import neo4j_schema
+
+class FakeSession:
+    def __init__(self, version):
+        self.version = version
+        self.statements = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return None
+
+    def run(self, query, **params):
+        self.statements.append(query)
+        if "SET s.version" in query:
+            self.version = params["version"]
+        result = MagicMock()
+        result.single.return_value = {"version": self.version} if self.version else None
+        return result
+
+def make_driver(version=None):
+    session = FakeSession(version)
+    driver = MagicMock()
+    driver.session = MagicMock(return_value=session)
+    return driver, session
+
+def test_apply_schema_creates_constraints_and_records_version():
+    """Test that a fresh database gets every constraint/index and the latest version."""
+    driver, session = make_driver()
+
+    assert neo4j_schema.apply_schema(driver) == neo4j_schema.LATEST_VERSION
+    assert session.version == neo4j_schema.LATEST_VERSION
+    for label in ("User", "Agent", "Topic", "TopicInstruction"):
+        assert any(f"FOR (n:{label}) REQUIRE n.id IS UNIQUE" in statement for statement in session.statements)
+
+def test_apply_schema_only_runs_pending_versions():
+    """Test that versions already recorded are not applied again."""
+    driver, session = make_driver(version=1)
+
+    neo4j_schema.apply_schema(driver)
+
+    assert not any("CREATE CONSTRAINT" in statement for statement in session.statements)
+    assert any("CREATE INDEX topic_scope" in statement for statement in session.statements)
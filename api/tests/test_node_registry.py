@@ -0,0 +1,48 @@
+import pytest
+from unittest.mock import patch
+import my_agent_modules
+from node_registry import NodeRegistry
+
+def test_resolve_imports_once():
+    """Test that a node function is imported on first use and then served from the registry."""
+    registry = NodeRegistry()
+    with patch("node_registry.import_module", return_value=my_agent_modules) as import_mock:
+        first = registry.resolve("my_agent_modules", "handle_topic")
+        second = registry.resolve("my_agent_modules", "handle_topic")
+    assert first is second is my_agent_modules.handle_topic
+    import_mock.assert_called_once_with("my_agent_modules")
+
+def test_preload_registers_public_functions():
+    """Test that preloading a module registers the functions it defines."""
+    registry = NodeRegistry()
+    registry.preload(["my_agent_modules"])
+    assert {"module": "my_agent_modules", "function": "handle_topic"} in registry.describe()["functions"]
+
+def test_unknown_function_is_rejected():
+    """Test that a missing node function raises a ValueError."""
+    registry = NodeRegistry()
+    with pytest.raises(ValueError):
+        registry.resolve("my_agent_modules", "does_not_exist")
+    with pytest.raises(ValueError):
+        registry.resolve("no_such_module", "handle_topic")
+
+def test_bind_records_node_binding():
+    """Test that binding a node exposes its module and function."""
+    registry = NodeRegistry()
+    registry.bind("topic_1", "my_agent_modules", "handle_topic")
+    assert registry.binding("topic_1") == ("my_agent_modules", "handle_topic")
+    assert registry.describe()["nodes"]["topic_1"] == {"module": "my_agent_modules", "function": "handle_topic"}
+
+def test_bindings_are_kept_per_agent_and_dropped_with_it():
+    """Test that agents sharing a node name keep separate bindings until their graph is dropped."""
+    registry = NodeRegistry()
+    registry.bind("topic_1", "my_agent_modules", "handle_topic", agent_id="agent-1")
+    registry.bind("topic_1", "my_agent_modules", "handle_topic", agent_id="agent-2")
+
+    registry.unbind_agent("agent-1")
+
+    assert registry.binding("topic_1", agent_id="agent-1") is None
+    assert registry.binding("topic_1", agent_id="agent-2") == ("my_agent_modules", "handle_topic")
+    assert registry.describe()["agents"] == {
+        "agent-2": {"topic_1": {"module": "my_agent_modules", "function": "handle_topic"}},
+    }
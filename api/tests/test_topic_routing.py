@@ -0,0 +1,72 @@
+import pytest
+import graph_executor
+from topic_routing import ROUTER_NODE, TopicRoutingIndex
+
+DESCRIPTIONS = {
+    "topic_1": "Billing questions about invoices, refunds and payment methods",
+    "topic_2": "Technical support for login problems, passwords and error messages",
+}
+
+@pytest.fixture
+def routed_graph_data(monkeypatch, graph_data):
+    monkeypatch.setattr("graph_executor.settings.graph_topic_routing", True)
+    for node in graph_data["nodes"]:
+        node["metadata"]["classification_description"] = DESCRIPTIONS[node["name"]]
+    return graph_data
+
+def test_index_scores_message_against_every_topic(routed_graph_data):
+    """Test that the index returns one score per topic and picks the closest."""
+    index = TopicRoutingIndex.from_graph_data(routed_graph_data)
+    scores = index.scores("I forgot my password and cannot login")
+    assert scores.shape == (2,)
+    assert scores[1] > scores[0]
+    assert index.best_match("I want a refund for my last invoice") == "topic_1"
+
+def test_index_returns_no_match_below_min_score(routed_graph_data):
+    """Test that unrelated or empty messages are not routed."""
+    index = TopicRoutingIndex.from_graph_data(routed_graph_data)
+    assert index.best_match("zzzz qqqq", min_score=0.1) is None
+    assert index.best_match("") is None
+
+def test_index_needs_two_described_topics(graph_data):
+    """Test that no index is built when topics have no classification descriptions."""
+    assert TopicRoutingIndex.from_graph_data(graph_data) is None
+
+def test_routed_run_visits_only_best_topic(routed_graph_data):
+    """Test that the graph jumps straight to the best-matching topic."""
+    graph = graph_executor.compile_graph(routed_graph_data)
+    result = graph.invoke({"message": "login error after password reset"})
+    assert result["route"] == "topic_2"
+    assert result["visited"] == ["topic_2"]
+
+def test_routed_run_follows_next_relationships(routed_graph_data):
+    """Test that a routed topic continues along its NEXT links, not the scope chain."""
+    topic_3 = {**routed_graph_data["nodes"][1], "name": "topic_3"}
+    routed_graph_data["nodes"].append(topic_3)
+    routed_graph_data["edges"] = [
+        {"from": "topic_2", "to": "topic_3", "condition": None},
+        {"from": "topic_1", "to": "topic_2"},
+    ]
+    graph = graph_executor.compile_graph(routed_graph_data)
+    assert graph.invoke({"message": "login error after password reset"})["visited"] == ["topic_2", "topic_3"]
+    assert graph.invoke({"message": "refund for my invoice"})["visited"] == ["topic_1"]
+
+def test_routing_is_off_by_default(graph_data):
+    """Test that graphs walk the chain unless routing is switched on."""
+    for node in graph_data["nodes"]:
+        node["metadata"]["classification_description"] = DESCRIPTIONS[node["name"]]
+    graph = graph_executor.compile_graph(graph_data)
+    assert ROUTER_NODE not in graph.builder.nodes
+    assert graph.invoke({"message": "login error after password reset"})["visited"] == ["topic_1", "topic_2"]
+
+def test_unmatched_message_walks_the_chain(routed_graph_data):
+    """Test that a message matching no topic falls back to the full chain."""
+    graph = graph_executor.compile_graph(routed_graph_data)
+    result = graph.invoke({"message": "zzzz"})
+    assert result["visited"] == ["topic_1", "topic_2"]
+
+def test_routing_can_be_disabled(monkeypatch, routed_graph_data):
+    """Test that the router node is left out when routing is switched off."""
+    monkeypatch.setattr("graph_executor.settings.graph_topic_routing", False)
+    graph = graph_executor.compile_graph(routed_graph_data)
+    assert ROUTER_NODE not in graph.builder.nodes
@@ -13,6 +13,89 @@ class Settings(BaseSettings):
     neo4j_uri: str
     neo4j_username: str
     neo4j_password: str
+
+    # Compiled graph cache
+    graph_cache_max_size: int = 256
+    graph_cache_ttl_seconds: float = 3600.0
+
+    # On-disk structure snapshots shared by the workers ("" disables)
+    graph_snapshot_dir: str = ".graph_snapshots"
+    graph_snapshot_max_age_seconds: float = 86400.0
+    graph_snapshot_compression_level: int = 3
+
+    # Postgres LISTEN/NOTIFY channel carrying graph invalidations between workers and nodes
+    graph_invalidation_listen: bool = True
+    graph_invalidation_channel: str = "graph_cache_invalidation"
+    graph_invalidation_reconnect_seconds: float = 1.0
+
+    # Graphs compiled on startup: these agents plus the top-N by recent runs
+    graph_warmup_agents: list[str] = []
+    graph_warmup_top_n: int = 0
+    graph_warmup_concurrency: int = 4
+    graph_warmup_timeout_seconds: float = 30.0
+
+    # Decayed per-agent run counts that rank agents for warm-up ("" disables)
+    graph_run_counts_file: str = ".graph_run_counts.json"
+    graph_run_counts_half_life_seconds: float = 86400.0
+
+    # Modules whose node functions are registered at startup
+    graph_node_modules: list[str] = ["my_agent_modules"]
+
+    # Checkpoint store for runs with a thread_id: "memory" (per process, so only for a
+    # single worker) or "postgres" (the graph_checkpoints tables from the api migrations;
+    # the api app picks it through its own settings)
+    graph_checkpointer: str = "memory"
+
+    # Node functions run in worker processes, as "module" or "module.function"
+    graph_process_nodes: list[str] = []
+    graph_process_pool_workers: int = 2
+
+    # Jump straight to the topic whose classification description best matches the message
+    # (skipping the topics before it in the chain), then follow its NEXT relationships
+    graph_topic_routing: bool = False
+    graph_routing_min_score: float = 0.1
+
+    # Run topics that share a scope in parallel instead of one after another. Opt-in:
+    # topics of one stage don't see each other's writes, and message/current_node
+    # keep whichever topic of the stage wrote last
+    graph_parallel_scopes: bool = False
+
+    # Store compiled graphs load their structure from: "neo4j" or "postgres"
+    graph_source: str = "neo4j"
+
+    # Load topic skeletons only and fetch each topic's instructions on its first run
+    graph_lazy_instructions: bool = False
+
+    # Run deadlines: overall budget per run and per node, in seconds (0 disables)
+    graph_run_timeout_seconds: float = 60.0
+    graph_node_timeout_seconds: float = 30.0
+    graph_disconnect_poll_seconds: float = 0.5
+
+    # Batch graph runs
+    graph_batch_max_concurrency: int = 16
+
+    # Background graph jobs
+    graph_job_workers: int = 8
+    graph_job_max_queue: int = 1000
+    graph_job_max_finished: int = 1000
+    graph_job_max_result_bytes: int = 64 * 1024 * 1024
+    # "postgres" lets any worker answer a poll; "memory" only suits a single worker
+    graph_job_store: str = "postgres"
+    graph_job_retention_seconds: float = 86400.0
+
+    # Create Neo4j constraints/indexes (neo4j_schema.py) when the app starts
+    neo4j_apply_schema_on_startup: bool = True
+
+    # Rows per UNWIND statement in the bulk Neo4j sync helpers
+    neo4j_batch_size: int = 1000
+
+    # Outbox dispatcher draining Postgres changes to Neo4j
+    graph_outbox_batch_size: int = 500
+    graph_outbox_poll_seconds: float = 0.5
+    graph_outbox_max_attempts: int = 10
+    graph_outbox_backoff_seconds: float = 1.0
+    graph_outbox_max_backoff_seconds: float = 300.0
+
     class Config:
         env_file = ".env"
 
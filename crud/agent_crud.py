@@ -2,32 +2,20 @@ from sqlalchemy.orm import Session, joinedload
 import models
 from uuid import UUID
 from schemas import agent_schemas
-from db_neo4j import add_agent, add_user_agent_relationship
+from graph_outbox import DELETE, enqueue_agent, enqueue_next_links, enqueue_topic
+from graph_cache import compiled_graphs
 
 # Agent CRUD Operations
 def create_agent(db: Session, agent: agent_schemas.AgentCreateRequest, user_id: UUID):
     db_agent = models.Agent(**agent.model_dump(), user_id=user_id)
     db.add(db_agent)
+    db.flush()
+
+    # ✅ Queue the Neo4j sync (agent and its user link) in the same Postgres transaction
+    enqueue_agent(db, db_agent)
     db.commit()
     db.refresh(db_agent)
 
-    # ✅ Sync to Neo4j after successful insert into Postgres
-    add_agent(
-        agent_id=str(db_agent.id),
-        name=db_agent.name,
-        api_name=db_agent.api_name,
-        description=db_agent.description,
-        role=db_agent.role,
-        organization=db_agent.organization,
-        user_type=db_agent.user_type
-    )
-
-    # 🟢 NEW: link this agent to its user in Neo4j
-    add_user_agent_relationship(
-        user_id=str(user_id),
-        agent_id=str(db_agent.id)
-        )
-    
     return db_agent
 
 def get_agents(db: Session):
@@ -46,15 +34,38 @@ def update_agent(db: Session, agent_id: UUID, agent: agent_schemas.AgentUpdateRe
         for key, value in agent.model_dump(exclude_unset=True).items():
             setattr(db_agent, key, value)
         db_agent.modified_by = current_user_id
+        enqueue_agent(db, db_agent)
         db.commit()
         db.refresh(db_agent)
+        compiled_graphs.invalidate(agent_id)
         return db_agent
 
 def delete_agent(db: Session, agent_id: str):
     db_agent = db.query(models.Agent).filter(models.Agent.id == agent_id).first()
     if db_agent:
         db.delete(db_agent)
+        enqueue_agent(db, db_agent, operation=DELETE)
         db.commit()
+        compiled_graphs.invalidate(agent_id)
     else:
         raise ValueError("Agent not found")
         
+
+def sync_agent_graph(db: Session, agent_id: UUID):
+    """Queue a full resync of an agent with all its topics, instructions and NEXT links.
+
+    The outbox dispatcher writes the whole batch to Neo4j in one transaction;
+    the agent's NEXT links there are replaced by the ones in Postgres.
+    """
+    db_agent = get_agent(db, agent_id)
+    if not db_agent:
+        return None
+    enqueue_agent(db, db_agent)
+    for topic in db_agent.topics:
+        enqueue_topic(db, topic)
+    links = db.query(models.TopicNext).join(models.Topic, models.TopicNext.topic_id == models.Topic.id).filter(
+        models.Topic.agent_id == agent_id
+    ).all()
+    enqueue_next_links(db, db_agent.id, links)
+    db.commit()
+    return db_agent
@@ -4,7 +4,8 @@ import models
 from uuid import UUID
 from schemas import topic_schemas
 from schemas import agent_schemas
-from db_neo4j import add_topic, add_agent_topic_relationship
+from graph_outbox import DELETE, enqueue_topic
+from graph_cache import compiled_graphs
 
 # Topic CRUD Operations
 def create_topic(db: Session, topic: topic_schemas.TopicCreateRequest):
@@ -15,21 +16,13 @@ def create_topic(db: Session, topic: topic_schemas.TopicCreateRequest):
         topic_data = topic.model_dump(exclude={"topic_instructions"})
         db_topic = models.Topic(**topic_data, topic_instructions=topic_instructions)
         db.add(db_topic)
+        db.flush()
+
+        # ✅ Queue the Neo4j sync (topic, agent link and instructions) in the same Postgres transaction
+        enqueue_topic(db, db_topic)
         db.commit()
         db.refresh(db_topic)
-
-        # ✅ Sync to Neo4j after successful insert into Postgres
-        add_topic(
-            topic_id=str(db_topic.id),
-            label=db_topic.label,
-            classification_description=db_topic.classification_description,
-            scope=db_topic.scope
-        )
-        # 🟢 NEW: link this topic to its agent in Neo4j
-        add_agent_topic_relationship(
-            agent_id=str(db_topic.agent.id),
-            topic_id=str(db_topic.id)
-        )
+        compiled_graphs.invalidate(db_topic.agent_id)
         
         return db_topic
     except Exception as e:
@@ -71,8 +64,13 @@ def update_topic(db: Session, topic_id: UUID, topic: topic_schemas.TopicCreateRe
     for instruction in topic.topic_instructions or []:
         db_topic.topic_instructions.append(models.TopicInstruction(instruction=instruction))
 
+    db.flush()
+
+    # The queued snapshot replaces the topic's instructions in Neo4j
+    enqueue_topic(db, db_topic)
     db.commit()
     db.refresh(db_topic)
+    compiled_graphs.invalidate(db_topic.agent_id)
     return db_topic
 
 def delete_topic(db: Session, topic_id: UUID):
@@ -80,5 +78,7 @@ def delete_topic(db: Session, topic_id: UUID):
     if not db_topic:
         raise HTTPException(status_code=404, detail="Topic not found")
     db.delete(db_topic) 
+    enqueue_topic(db, db_topic, operation=DELETE)
     db.commit()
+    compiled_graphs.invalidate(db_topic.agent_id)
     return {"message": "Topic deleted successfully"}
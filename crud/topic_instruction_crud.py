@@ -2,27 +2,20 @@ from sqlalchemy.orm import Session
 import models
 from uuid import UUID
 from schemas import topic_instruction_schemas
-from db_neo4j import add_topic_instruction ,add_topic_topic_instruction_relationship
+from graph_outbox import enqueue_instruction
+from graph_cache import compiled_graphs
 
 # Topic Instruction CRUD Operations
 def create_instruction(db: Session, instruction: topic_instruction_schemas.TopicInstructionCreate):
     db_instruction = models.TopicInstruction(**instruction.model_dump())
     db.add(db_instruction)
+    db.flush()
+
+    # ✅ Queue the Neo4j sync (instruction and its HAS_INSTRUCTION link) in the same Postgres transaction
+    enqueue_instruction(db, db_instruction, agent_id=db_instruction.topic.agent_id)
     db.commit()
     db.refresh(db_instruction)
-
-    # ✅ Sync to Neo4j after successful insert into Postgres
-    add_topic_instruction(
-        topic_id=str(db_instruction.topic_id),
-        instruction_id=str(db_instruction.id),
-        instruction_text=db_instruction.instruction
-    )
-
-    # 🟢 NEW: link this topic to its agent in Neo4j
-    add_topic_topic_instruction_relationship(
-        topic_id=str(db_instruction.topic_id),
-        instruction_id=str(db_instruction.id)
-    )
+    compiled_graphs.invalidate(db_instruction.topic.agent_id)
     
     return db_instruction
 
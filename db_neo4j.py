@@ -1,24 +1,67 @@
-from neo4j import GraphDatabase
+from neo4j import AsyncGraphDatabase, GraphDatabase
 from config import settings
 
-# Create Neo4j driver using env credentials
-driver = GraphDatabase.driver(
-    settings.neo4j_uri,
-    auth=(settings.neo4j_username, settings.neo4j_password)
-)
+# Drivers are created on first use rather than at import, so importing this
+# module (the api app does, through graph_builder) opens no connection pools.
+# An app that owns its own async driver installs it with use_async_driver().
+_driver = None
+_async_driver = None
+_owns_async_driver = False
 
+def get_driver():
+    """The sync driver, created from the env credentials on first use."""
+    global _driver
+    if _driver is None:
+        _driver = GraphDatabase.driver(
+            settings.neo4j_uri,
+            auth=(settings.neo4j_username, settings.neo4j_password)
+        )
+    return _driver
+
+def get_async_driver():
+    """The async driver for code running on the event loop (graph runs)."""
+    global _async_driver, _owns_async_driver
+    if _async_driver is None:
+        _async_driver = AsyncGraphDatabase.driver(
+            settings.neo4j_uri,
+            auth=(settings.neo4j_username, settings.neo4j_password)
+        )
+        _owns_async_driver = True
+    return _async_driver
+
+def use_async_driver(driver):
+    """Route async reads through a driver owned (and closed) by the caller."""
+    global _async_driver, _owns_async_driver
+    _async_driver = driver
+    _owns_async_driver = False
+
+async def aclose_drivers():
+    """Close the drivers this module created; an installed driver is left to its owner."""
+    global _driver, _async_driver, _owns_async_driver
+    if _driver is not None:
+        _driver.close()
+        _driver = None
+    if _async_driver is not None and _owns_async_driver:
+        await _async_driver.close()
+    _async_driver = None
+    _owns_async_driver = False
+
+
+# Single-row write for users, which are not synced through the outbox
+
+MERGE_USER = """
+    MERGE (u:User {id: $id})
+    SET u.first_name = $first_name,
+        u.last_name = $last_name,
+        u.email = $email,
+        u.password = $password,
+        u.user_type = $user_type
+"""
 
 def add_user(user_id: str, first_name: str, last_name: str, email: str, password: str, user_type: str):
-    with driver.session() as session:
+    with get_driver().session() as session:
         session.run(
-            """
-            MERGE (u:User {id: $id})
-            SET u.first_name = $first_name,
-                u.last_name = $last_name,
-                u.email = $email,
-                u.password = $password,
-                u.user_type = $user_type
-            """,
+            MERGE_USER,
             id=user_id,
             first_name=first_name,
             last_name=last_name,
@@ -28,87 +71,169 @@ def add_user(user_id: str, first_name: str, last_name: str, email: str, password
         )
 
 
-def add_user_agent_relationship(user_id: str, agent_id: str):
-    with driver.session() as session:
-        session.run(
-            """
-            MATCH (u:User {id: $user_id}), (a:Agent {id: $agent_id})
-            MERGE (u)-[:HAS_AGENT]->(a)
-            """,
-            user_id=user_id,
-            agent_id=agent_id
-        )
+# Bulk writes: each statement UNWINDs a list of row dicts, and write_batches
+# runs every statement of a sync in one transaction, chunked by
+# settings.neo4j_batch_size rows per round trip.
 
+UNWIND_USER_AGENTS = """
+    UNWIND $rows AS row
+    MATCH (u:User {id: row.user_id}), (a:Agent {id: row.agent_id})
+    MERGE (u)-[:HAS_AGENT]->(a)
+"""
 
-def add_agent(agent_id: str, name: str, api_name: str, description: str, role: str, organization: str ,user_type: str):
-    with driver.session() as session:
-        session.run(
-            """
-            MERGE (a:Agent {id: $id})
-            SET a.name = $name,
-                a.api_name = $api_name,
-                a.description = $description,
-                a.role = $role,
-                a.organization = $organization,
-                a.user_type = $user_type
-            """,
-            id=agent_id,
-            name=name,
-            api_name=api_name,
-            description=description,
-            role=role,
-            organization=organization,
-            user_type=user_type,
-        )
+UNWIND_AGENTS = """
+    UNWIND $rows AS row
+    MERGE (a:Agent {id: row.id})
+    SET a.name = row.name,
+        a.api_name = row.api_name,
+        a.description = row.description,
+        a.role = row.role,
+        a.organization = row.organization,
+        a.user_type = row.user_type
+"""
 
-def add_agent_topic_relationship(agent_id: str, topic_id: str):
-    with driver.session() as session:
-        session.run(
-            """
-            MATCH (a:Agent {id: $agent_id}), (t:Topic {id: $topic_id})
-            MERGE (a)-[:HAS_TOPIC]->(t)
-            """,
-            agent_id=agent_id,
-            topic_id=topic_id
-        )
+UNWIND_TOPICS = """
+    UNWIND $rows AS row
+    MERGE (t:Topic {id: row.id})
+    SET t.label = row.label,
+        t.classification_description = row.classification_description,
+        t.scope = row.scope
+    WITH t, row
+    MATCH (a:Agent {id: row.agent_id})
+    MERGE (a)-[:HAS_TOPIC]->(t)
+"""
 
-def add_topic(topic_id: str, label: str, classification_description: str = None, scope: str = None):
-    with driver.session() as session:
-        session.run(
-            """
-            MERGE (t:Topic {id: $id})
-            SET t.label = $label,
-                t.classification_description = $classification_description,
-                t.scope = $scope
-            """,
-            id=topic_id,
-            label=label,
-            classification_description=classification_description,
-            scope=scope
-        )
+UNWIND_DELETE_TOPIC_INSTRUCTIONS = """
+    UNWIND $rows AS row
+    MATCH (:Topic {id: row.topic_id})-[:HAS_INSTRUCTION]->(i:TopicInstruction)
+    DETACH DELETE i
+"""
 
-def add_topic_topic_instruction_relationship(topic_id: str, instruction_id: str):
-    with driver.session() as session:
-        session.run(
-            """
-            MATCH (t:Topic {id: $topic_id}), (i:TopicInstruction {id: $instruction_id})
-            MERGE (t)-[:HAS_INSTRUCTION]->(i)
-            """,
-            topic_id=topic_id,
-            instruction_id=instruction_id
-        )
+UNWIND_TOPIC_INSTRUCTIONS = """
+    UNWIND $rows AS row
+    MATCH (t:Topic {id: row.topic_id})
+    MERGE (i:TopicInstruction {id: row.id})
+    SET i.instruction_text = row.instruction_text
+    MERGE (t)-[:HAS_INSTRUCTION]->(i)
+"""
 
-def add_topic_instruction(topic_id: str, instruction_id: str, instruction_text: str):
-    with driver.session() as session:
-        session.run(
-            """
-            MATCH (t:Topic {id: $topic_id})
-            MERGE (i:TopicInstruction {id: $instruction_id})
-            SET i.instruction_text = $instruction_text
-            MERGE (t)-[:HAS_INSTRUCTION]->(i)
-            """,
-            topic_id=topic_id,
-            instruction_id=instruction_id,
-            instruction_text=instruction_text
-        )
+UNWIND_DELETE_AGENT_NEXT = """
+    UNWIND $rows AS row
+    MATCH (:Agent {id: row.agent_id})-[:HAS_TOPIC]->(:Topic)-[r:NEXT]->()
+    DELETE r
+"""
+
+UNWIND_DELETE_TOPIC_NEXT = """
+    UNWIND $rows AS row
+    MATCH (:Topic {id: row.from})-[r:NEXT]->(:Topic {id: row.to})
+    DELETE r
+"""
+
+UNWIND_TOPIC_NEXT = """
+    UNWIND $rows AS row
+    MATCH (t:Topic {id: row.from}), (n:Topic {id: row.to})
+    MERGE (t)-[r:NEXT]->(n)
+    SET r.condition = row.condition
+"""
+
+UNWIND_DELETE_TOPICS = """
+    UNWIND $rows AS row
+    MATCH (t:Topic {id: row.id})
+    OPTIONAL MATCH (t)-[:HAS_INSTRUCTION]->(i:TopicInstruction)
+    DETACH DELETE i, t
+"""
+
+UNWIND_DELETE_AGENTS = """
+    UNWIND $rows AS row
+    MATCH (a:Agent {id: row.id})
+    OPTIONAL MATCH (a)-[:HAS_TOPIC]->(t:Topic)
+    OPTIONAL MATCH (t)-[:HAS_INSTRUCTION]->(i:TopicInstruction)
+    DETACH DELETE i, t, a
+"""
+
+def agent_row(agent) -> dict:
+    return {
+        "id": str(agent.id),
+        "name": agent.name,
+        "api_name": agent.api_name,
+        "description": agent.description,
+        "role": agent.role,
+        "organization": agent.organization,
+        "user_type": agent.user_type,
+    }
+
+def topic_row(topic) -> dict:
+    return {
+        "id": str(topic.id),
+        "agent_id": str(topic.agent_id),
+        "label": topic.label,
+        "classification_description": topic.classification_description,
+        "scope": topic.scope,
+    }
+
+def instruction_row(instruction) -> dict:
+    return {
+        "id": str(instruction.id),
+        "topic_id": str(instruction.topic_id),
+        "instruction_text": instruction.instruction,
+    }
+
+def next_row(link) -> dict:
+    return {
+        "from": str(link.topic_id),
+        "to": str(link.next_topic_id),
+        "condition": link.condition,
+    }
+
+def chunked(rows: list, size: int):
+    for start in range(0, len(rows), size):
+        yield rows[start:start + size]
+
+def sync_statements(
+    agents: list = (),
+    user_agents: list = (),
+    topics: list = (),
+    replace_instructions_for: list = (),
+    instructions: list = (),
+    replace_next_for: list = (),
+    next_links: list = (),
+    deleted_next_links: list = (),
+    deleted_topics: list = (),
+    deleted_agents: list = (),
+) -> list:
+    """Order the bulk statements so every MATCH finds the nodes merged before it."""
+    statements = [
+        (UNWIND_AGENTS, list(agents)),
+        (UNWIND_USER_AGENTS, list(user_agents)),
+        (UNWIND_TOPICS, list(topics)),
+        (UNWIND_DELETE_TOPIC_INSTRUCTIONS, [{"topic_id": topic_id} for topic_id in replace_instructions_for]),
+        (UNWIND_TOPIC_INSTRUCTIONS, list(instructions)),
+        (UNWIND_DELETE_AGENT_NEXT, [{"agent_id": agent_id} for agent_id in replace_next_for]),
+        (UNWIND_DELETE_TOPIC_NEXT, list(deleted_next_links)),
+        (UNWIND_TOPIC_NEXT, list(next_links)),
+        (UNWIND_DELETE_TOPICS, [{"id": topic_id} for topic_id in deleted_topics]),
+        (UNWIND_DELETE_AGENTS, [{"id": agent_id} for agent_id in deleted_agents]),
+    ]
+    return [(query, rows) for query, rows in statements if rows]
+
+def _run_batches(tx, statements: list):
+    for query, rows in statements:
+        for chunk in chunked(rows, settings.neo4j_batch_size):
+            tx.run(query, rows=chunk).consume()
+
+def write_batches(statements: list):
+    if not statements:
+        return
+    with get_driver().session() as session:
+        session.execute_write(_run_batches, statements)
+
+def sync_graph(**rows):
+    """Write agents, topics and instructions in one transaction.
 
+    Keyword arguments are the row lists accepted by sync_statements;
+    replace_instructions_for lists topic ids whose existing instructions
+    are removed before the new instruction rows are merged, and
+    replace_next_for agent ids whose NEXT links are removed before the
+    new next_links are merged.
+    """
+    write_batches(sync_statements(**rows))
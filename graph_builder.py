@@ -1,74 +1,169 @@
-from db_neo4j import driver
+from config import settings
+from db_neo4j import get_async_driver, get_driver
+
+GRAPH_STRUCTURE_QUERY = """
+    MATCH (a:Agent {id: $agent_id})
+    OPTIONAL MATCH (a)-[:HAS_TOPIC]->(t:Topic)
+    OPTIONAL MATCH (t)-[:HAS_INSTRUCTION]->(i:TopicInstruction)
+    RETURN a.id AS agent_id,
+           a.name AS agent_name,
+           t.id AS topic_id,
+           t.label AS topic_label,
+           t.scope AS topic_scope,
+           t.classification_description AS topic_description,
+           collect({id: i.id, text: i.instruction_text}) AS instructions,
+           [(t)-[n:NEXT]->(nt:Topic)<-[:HAS_TOPIC]-(a) | {to: nt.id, condition: n.condition}] AS next_topics
+    ORDER BY t.scope
+"""
+
+# Topic skeletons only; instructions are loaded per topic when its node first runs
+GRAPH_SKELETON_QUERY = """
+    MATCH (a:Agent {id: $agent_id})
+    OPTIONAL MATCH (a)-[:HAS_TOPIC]->(t:Topic)
+    RETURN a.id AS agent_id,
+           a.name AS agent_name,
+           t.id AS topic_id,
+           t.label AS topic_label,
+           t.scope AS topic_scope,
+           t.classification_description AS topic_description,
+           [(t)-[n:NEXT]->(nt:Topic)<-[:HAS_TOPIC]-(a) | {to: nt.id, condition: n.condition}] AS next_topics
+    ORDER BY t.scope
+"""
+
+TOPIC_INSTRUCTIONS_QUERY = """
+    MATCH (:Topic {id: $topic_id})-[:HAS_INSTRUCTION]->(i:TopicInstruction)
+    RETURN i.id AS id, i.instruction_text AS text
+"""
+
+def structure_query() -> str:
+    return GRAPH_SKELETON_QUERY if settings.graph_lazy_instructions else GRAPH_STRUCTURE_QUERY
 
 def get_graph_structure(agent_id: str):
-    with driver.session() as session:
-        result = session.run("""
-            MATCH (a:Agent {id: $agent_id})
-            OPTIONAL MATCH (a)-[:HAS_TOPIC]->(t:Topic)
-            OPTIONAL MATCH (t)-[:HAS_INSTRUCTION]->(i:TopicInstruction)
-            RETURN a.id AS agent_id,
-                   a.name AS agent_name,
-                   t.id AS topic_id,
-                   t.label AS topic_label,
-                   t.scope AS topic_scope,
-                   collect({id: i.id, text: i.instruction_text}) AS instructions
-            ORDER BY t.scope
-        """, agent_id=agent_id)
-
-        nodes = []
-        edges = []
-        entry_node = None
-        previous_node = None
-
-        for record in result:
-            topic_id = record["topic_id"]
-            topic_label = record["topic_label"]
-            topic_scope = record["topic_scope"]
-            instructions = record["instructions"]
-            agent_id = record["agent_id"]
-            agent_name = record["agent_name"]
-
-            if topic_id is None:
-                continue
-
-            node_name = f"topic_{topic_id}"
-
-            nodes.append({
-                "name": node_name,
-                "module": "my_agent_modules",
-                "function": "handle_topic",
-                "metadata": {
-                    "agent_id": agent_id,
-                    "agent_name": agent_name,
-                    "topic_id": topic_id,
-                    "topic_label": topic_label,
-                    "topic_scope": topic_scope,
-                    "instructions": instructions,
-                }
+    with get_driver().session() as session:
+        result = session.run(structure_query(), agent_id=agent_id)
+        return build_graph_structure(agent_id, result)
+
+async def aget_graph_structure(agent_id: str, driver=None):
+    """Async read on `driver`, by default the one the app installed in db_neo4j."""
+    async with (driver or get_async_driver()).session() as session:
+        result = await session.run(structure_query(), agent_id=str(agent_id))
+        records = [record async for record in result]
+        return build_graph_structure(agent_id, records)
+
+def get_topic_instructions(topic_id: str) -> list[dict]:
+    with get_driver().session() as session:
+        result = session.run(TOPIC_INSTRUCTIONS_QUERY, topic_id=topic_id)
+        return [{"id": record["id"], "text": record["text"]} for record in result]
+
+async def aget_topic_instructions(topic_id: str, driver=None) -> list[dict]:
+    async with (driver or get_async_driver()).session() as session:
+        result = await session.run(TOPIC_INSTRUCTIONS_QUERY, topic_id=str(topic_id))
+        return [{"id": record["id"], "text": record["text"]} async for record in result]
+
+def build_graph_structure(agent_id: str, records):
+    """Turn structure query records into the nodes/edges dict compile_graph expects.
+
+    Topics run as a chain in scope order. With graph_parallel_scopes set,
+    topics sharing a scope form one stage whose nodes run in the same
+    superstep, so run latency follows the number of stages rather than
+    the number of topics.
+
+    Topics linked by NEXT relationships produce one edge per relationship,
+    carrying the relationship's condition (None for the default branch).
+    The linked topics take one place in the chain, where their entry (the
+    first linked topic, in scope order, that no other topic leads to)
+    would be: the stage before leads to the entry, and linked topics
+    without a NEXT relationship of their own lead to the stage after.
+    Topics without any NEXT relationship stay on the chain.
+    """
+    nodes = []
+    edges = []
+    next_edges = []
+    stages = []
+
+    for record in records:
+        topic_id = record["topic_id"]
+        topic_label = record["topic_label"]
+        topic_scope = record["topic_scope"]
+        # None when the skeleton query was used; see LazyInstructions
+        instructions = record.get("instructions")
+        agent_id = record["agent_id"]
+        agent_name = record["agent_name"]
+
+        if topic_id is None:
+            continue
+
+        node_name = f"topic_{topic_id}"
+
+        nodes.append({
+            "name": node_name,
+            "module": "my_agent_modules",
+            "function": "handle_topic",
+            "metadata": {
+                "agent_id": agent_id,
+                "agent_name": agent_name,
+                "topic_id": topic_id,
+                "topic_label": topic_label,
+                "topic_scope": topic_scope,
+                "classification_description": record.get("topic_description"),
+                "instructions": instructions,
+            }
+        })
+
+        for next_topic in record.get("next_topics") or []:
+            next_edges.append({
+                "from": node_name,
+                "to": f"topic_{next_topic['to']}",
+                "condition": next_topic.get("condition")
             })
 
-            if not entry_node:
-                entry_node = node_name
+        # Records come ordered by scope, so topics sharing one are adjacent
+        if settings.graph_parallel_scopes and topic_scope is not None and stages and stages[-1]["scope"] == topic_scope:
+            stages[-1]["nodes"].append(node_name)
+        else:
+            stages.append({"scope": topic_scope, "nodes": [node_name]})
 
-            if previous_node and node_name:
-                edges.append({
-                    "from": previous_node,
-                    "to": node_name
-                })
-            else:
-                print(f"⚠️ Skipping edge creation: previous_node={previous_node}, node_name={node_name}")
+    if not nodes:
+        raise ValueError(f"No topics found for agent {agent_id}. Cannot build a graph.")
 
-            previous_node = node_name
+    # Each chain step is (nodes entered, nodes leaving to the next step)
+    steps = []
+    if next_edges:
+        edges = list(next_edges)
+        sources = {edge["from"] for edge in next_edges}
+        targets = {edge["to"] for edge in next_edges}
+        linked = [node["name"] for node in nodes if node["name"] in sources | targets]
+        # Enter at the first linked topic (in scope order) that no other topic leads to
+        linked_entry = next((name for name in linked if name not in targets), linked[0])
+        linked_exits = [name for name in linked if name not in sources]
+        for stage in stages:
+            if linked_entry in stage["nodes"]:
+                steps.append(([linked_entry], linked_exits))
+            unlinked = [name for name in stage["nodes"] if name not in sources | targets]
+            if unlinked:
+                steps.append((unlinked, unlinked))
+    else:
+        steps = [(stage["nodes"], stage["nodes"]) for stage in stages]
 
-        if not nodes:
-            raise ValueError(f"No topics found for agent {agent_id}. Cannot build a graph.")
+    # Every topic leaving a step leads to every topic of the next one; the
+    # next step starts once the whole previous one has finished
+    for (_, from_nodes), (to_nodes, _) in zip(steps, steps[1:]):
+        for from_node in from_nodes:
+            for to_node in to_nodes:
+                edges.append({
+                    "from": from_node,
+                    "to": to_node
+                })
+    entry_nodes = steps[0][0]
+    entry_node = entry_nodes[0]
 
-        print("DEBUG: Nodes:", nodes)
-        print("DEBUG: Edges:", edges)
-        print("DEBUG: Entry node:", entry_node)
+    print("DEBUG: Nodes:", nodes)
+    print("DEBUG: Edges:", edges)
+    print("DEBUG: Entry node:", entry_node)
 
-        return {
-            "entry_node": entry_node,
-            "nodes": nodes,
-            "edges": edges
-        }
+    return {
+        "entry_node": entry_node,
+        "entry_nodes": entry_nodes,
+        "nodes": nodes,
+        "edges": edges
+    }
@@ -0,0 +1,263 @@
+import asyncio
+import fcntl
+import logging
+import os
+import tempfile
+import threading
+import time
+from collections import Counter, OrderedDict
+from concurrent.futures import Future
+import orjson
+from config import settings
+from graph_snapshots import structure_snapshots
+from node_registry import node_registry
+
+logger = logging.getLogger("graph_cache")
+
+
+class GraphCache:
+    """In-process LRU cache of compiled graphs with size and TTL limits.
+
+    Entries are keyed by agent id plus the agent's structure version. The
+    version is a per-agent generation counter bumped by invalidate(), so a
+    write to an agent makes every entry built before it unreachable.
+
+    With shared_generations (see graph_snapshots.SharedGenerations) the
+    version also includes the agent's host-wide generation, so an
+    invalidation made by any worker on the host evicts this worker's
+    entry too. on_invalidate callbacks run after an agent is invalidated,
+    for state kept outside the cache (e.g. the shared structure snapshots).
+    on_evict callbacks run once an agent has no entry left, whether it was
+    invalidated, cleared, expired or pushed out by the size limit, for
+    per-graph state of this process (e.g. the node registry's bindings).
+    """
+
+    def __init__(self, max_size: int, ttl_seconds: float, on_invalidate=(), shared_generations=None, on_evict=()):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self.on_invalidate = list(on_invalidate)
+        self.on_evict = list(on_evict)
+        self.shared_generations = shared_generations
+        self._entries = OrderedDict()
+        self._versions = {}
+        self._epoch = 0
+        self._lock = threading.Lock()
+
+    def _version(self, agent_id: str) -> int:
+        # Both counters only grow, so their sum changes whenever either does
+        version = self._epoch + self._versions.get(agent_id, 0)
+        if self.shared_generations is not None:
+            version += self.shared_generations.get(agent_id)
+        return version
+
+    def _evicted(self, agent_ids):
+        """Agents among agent_ids without any entry left; call with the lock held."""
+        cached = {key[0] for key in self._entries}
+        return [agent_id for agent_id in dict.fromkeys(agent_ids) if agent_id not in cached]
+
+    def _run_callbacks(self, callbacks, agent_ids, hook: str):
+        for agent_id in agent_ids:
+            for callback in callbacks:
+                try:
+                    callback(agent_id)
+                except Exception:
+                    # The in-memory entry is gone either way; don't fail the write that triggered this
+                    logger.exception(f"[Graph Cache {hook} Hook Failed] agent_id={agent_id}")
+
+    def version(self, agent_id: str) -> int:
+        with self._lock:
+            return self._version(str(agent_id))
+
+    def get(self, agent_id: str):
+        agent_id = str(agent_id)
+        with self._lock:
+            key = (agent_id, self._version(agent_id))
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, expires_at = entry
+            if expires_at >= time.monotonic():
+                self._entries.move_to_end(key)
+                return value
+            del self._entries[key]
+            evicted = self._evicted([agent_id])
+        self._run_callbacks(self.on_evict, evicted, "Evict")
+        return None
+
+    def set(self, agent_id: str, value, version: int = None):
+        """Store a compiled graph for the given agent.
+
+        Pass the version read before the build started so a graph built
+        from data that was invalidated mid-build is not cached.
+        """
+        agent_id = str(agent_id)
+        with self._lock:
+            current = self._version(agent_id)
+            if version is not None and version != current:
+                return
+            self._entries[(agent_id, current)] = (value, time.monotonic() + self.ttl_seconds)
+            self._entries.move_to_end((agent_id, current))
+            dropped = []
+            while len(self._entries) > self.max_size:
+                (dropped_agent, _), _ = self._entries.popitem(last=False)
+                dropped.append(dropped_agent)
+            evicted = self._evicted(dropped)
+        self._run_callbacks(self.on_evict, evicted, "Evict")
+
+    def invalidate(self, agent_id: str):
+        agent_id = str(agent_id)
+        with self._lock:
+            self._versions[agent_id] = self._versions.get(agent_id, 0) + 1
+            for key in [key for key in self._entries if key[0] == agent_id]:
+                del self._entries[key]
+        self._run_callbacks(self.on_invalidate, [agent_id], "Invalidate")
+        self._run_callbacks(self.on_evict, [agent_id], "Evict")
+
+    def clear(self):
+        """Drop every entry, including graphs still being built from older data."""
+        with self._lock:
+            self._epoch += 1
+            evicted = list(dict.fromkeys(key[0] for key in self._entries))
+            self._entries.clear()
+        self._run_callbacks(self.on_evict, evicted, "Evict")
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class SingleFlight:
+    """Collapses concurrent calls for the same key into a single call.
+
+    The first caller for a key runs the function; callers that arrive while
+    it is in progress block on its result (or exception) instead of running
+    it again.
+    """
+
+    def __init__(self):
+        self._calls = {}
+        self._lock = threading.Lock()
+
+    def do(self, key, fn):
+        with self._lock:
+            future = self._calls.get(key)
+            leader = future is None
+            if leader:
+                future = Future()
+                self._calls[key] = future
+
+        if not leader:
+            return future.result()
+
+        try:
+            result = fn()
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            with self._lock:
+                del self._calls[key]
+
+
+class AsyncSingleFlight:
+    """Event-loop variant of SingleFlight for coroutine functions."""
+
+    def __init__(self):
+        self._calls = {}
+
+    async def do(self, key, fn):
+        task = self._calls.get(key)
+        if task is None:
+            task = asyncio.ensure_future(fn())
+            self._calls[key] = task
+            task.add_done_callback(lambda _: self._calls.pop(key, None))
+        # Shield so one cancelled caller does not cancel the build for the others
+        return await asyncio.shield(task)
+
+
+class RunCounts:
+    """Per-agent run counts with exponential decay, persisted across restarts.
+
+    Runs are counted in memory and merged into a JSON file on flush(),
+    under an exclusive lock so the workers of one host add up into the
+    same file. Stored counts halve every half_life_seconds, so the file
+    ranks agents by recent rather than all-time use. Used to pick the
+    agents whose graphs are compiled on startup.
+    """
+
+    def __init__(self, path: str, half_life_seconds: float = 86400.0, max_agents: int = 1000):
+        self.path = path
+        self.half_life_seconds = half_life_seconds
+        self.max_agents = max_agents
+        self._pending = Counter()
+        self._lock = threading.Lock()
+
+    def record(self, agent_id: str):
+        if self.path:
+            with self._lock:
+                self._pending[str(agent_id)] += 1
+
+    def _read(self, now: float) -> dict:
+        try:
+            with open(self.path, "rb") as f:
+                data = orjson.loads(f.read())
+        except FileNotFoundError:
+            return {}
+        except (OSError, orjson.JSONDecodeError) as e:
+            logger.warning(f"[Graph Run Counts Unreadable] path={self.path} → {str(e)}")
+            return {}
+        decay = 0.5 ** (max(now - data.get("updated_at", now), 0) / self.half_life_seconds)
+        return {agent_id: count * decay for agent_id, count in data.get("counts", {}).items()}
+
+    def flush(self):
+        """Merge the counts recorded since the last flush into the file."""
+        with self._lock:
+            pending, self._pending = self._pending, Counter()
+        if not self.path or not pending:
+            return
+        directory = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(directory, exist_ok=True)
+        with open(f"{self.path}.lock", "a") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            now = time.time()
+            counts = self._read(now)
+            for agent_id, count in pending.items():
+                counts[agent_id] = counts.get(agent_id, 0.0) + count
+            top = sorted(counts.items(), key=lambda item: item[1], reverse=True)[:self.max_agents]
+            fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".tmp-")
+            try:
+                with os.fdopen(fd, "wb") as f:
+                    f.write(orjson.dumps({"updated_at": now, "counts": {a: c for a, c in top if c >= 0.01}}))
+                os.replace(tmp_path, self.path)
+            except BaseException:
+                os.unlink(tmp_path)
+                raise
+
+    def top(self, n: int) -> list[str]:
+        """The n agents with the highest decayed run counts, most-run first."""
+        if not self.path or n <= 0:
+            return []
+        counts = self._read(time.time())
+        return [agent_id for agent_id, _ in sorted(counts.items(), key=lambda item: item[1], reverse=True)[:n]]
+
+
+# Shared cache of compiled graphs used by the graph routers
+compiled_graphs = GraphCache(
+    max_size=settings.graph_cache_max_size,
+    ttl_seconds=settings.graph_cache_ttl_seconds,
+    on_invalidate=[structure_snapshots.invalidate],
+    shared_generations=structure_snapshots.generations,
+    on_evict=[node_registry.unbind_agent],
+)
+
+# In-progress graph builds, keyed by agent id and structure version
+graph_builds = SingleFlight()
+async_graph_builds = AsyncSingleFlight()
+
+# Recent runs per agent, used to choose which graphs to warm on startup
+run_counts = RunCounts(
+    settings.graph_run_counts_file,
+    half_life_seconds=settings.graph_run_counts_half_life_seconds,
+)
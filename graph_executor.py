@@ -1,60 +1,461 @@
-from importlib import import_module
-from langgraph.graph import StateGraph
-from graph_builder import get_graph_structure
+import asyncio
+import dataclasses
+import inspect
+import threading
+from collections import deque
+from functools import lru_cache
+from langchain_core.runnables import RunnableLambda
+from langgraph.checkpoint.memory import InMemorySaver
+from langgraph.graph import END, StateGraph
+from langgraph.types import Command
+from config import settings
+from graph_cache import async_graph_builds, compiled_graphs, graph_builds, run_counts
+from graph_snapshots import structure_snapshots
+from graph_sources import get_graph_source
+from graph_state import AgentState, NodeContext, from_state, to_state
+from graph_structure import GraphNode, GraphStructure, Instruction
+from node_process_pool import NodeProcessPool
+from node_registry import node_registry
+from topic_routing import ROUTER_NODE, TopicRoutingIndex
+
+# Worker processes for node functions that are too CPU-heavy to run inline
+node_processes = NodeProcessPool(
+    workers=settings.graph_process_pool_workers,
+    preload_modules=settings.graph_node_modules,
+)
 
 def load_function(module_name, function_name):
-    module = import_module(module_name)
-    return getattr(module, function_name)
+    return node_registry.resolve(module_name, function_name)
+
+def runs_in_process(node: GraphNode) -> bool:
+    """A node runs in the process pool if its structure or the settings ask for it."""
+    if node.executor == "process":
+        return True
+    return (
+        node.module in settings.graph_process_nodes
+        or f"{node.module}.{node.function}" in settings.graph_process_nodes
+    )
+
+class LazyInstructions:
+    """A node's context whose instructions are fetched on the node's first run.
+
+    Used for graphs built from topic skeletons. The loaded context lives on
+    the compiled graph, so it is dropped together with it when the agent's
+    cache entry is invalidated.
+
+    aload fetches instructions on the event loop and load in sync runs.
+    Without load, sync runs use the load_topic_instructions of the source
+    aload is bound to, or else run aload on a fresh event loop, so both
+    paths read from the same source.
+    """
+
+    def __init__(self, context: NodeContext, aload=None, load=None):
+        self.context = context
+        source = get_graph_source() if aload is None else getattr(aload, "__self__", None)
+        self.aload = aload or source.get_topic_instructions
+        self.load = load or getattr(source, "load_topic_instructions", None)
+        self.loaded = False
+        self._lock = threading.Lock()
+
+    def _set(self, instructions: list[dict]) -> NodeContext:
+        instructions = tuple(Instruction(id=i.get("id"), text=i.get("text")) for i in instructions)
+        self.context = dataclasses.replace(self.context, instructions=instructions)
+        self.loaded = True
+        return self.context
+
+    def get(self) -> NodeContext:
+        if not self.loaded:
+            with self._lock:
+                if not self.loaded:
+                    topic_id = self.context.topic_id
+                    self._set(self.load(topic_id) if self.load else asyncio.run(self.aload(topic_id)))
+        return self.context
+
+    async def aget(self) -> NodeContext:
+        # Concurrent first runs may both fetch; the result is the same either way
+        if not self.loaded:
+            self._set(await self.aload(self.context.topic_id))
+        return self.context
+
+def make_lazy_runnable(node: GraphNode, fn, lazy: LazyInstructions) -> RunnableLambda:
+    if runs_in_process(node):
+        def run(state):
+            return node_processes.wrap(node.module, node.function, lazy.get())[0](state)
+
+        async def arun(state):
+            return await node_processes.wrap(node.module, node.function, await lazy.aget())[1](state)
+    else:
+        def run(state):
+            return fn(state, lazy.get())
+
+        async def arun(state):
+            context = await lazy.aget()
+            if inspect.iscoroutinefunction(fn):
+                return await fn(state, context)
+            return await asyncio.to_thread(fn, state, context)
+
+    return RunnableLambda(run, afunc=arun, name=node.name)
 
 def build_and_compile_graph(agent_id: str):
-    graph_data = get_graph_structure(agent_id)
+    graph_data = structure_snapshots.load(agent_id)
+    if graph_data is None:
+        generation = structure_snapshots.generation(agent_id)
+        graph_data = get_graph_source().load_graph_structure(agent_id)
+        structure_snapshots.save(agent_id, graph_data, generation)
+    return compile_graph(graph_data)
+
+async def abuild_and_compile_graph(agent_id: str, load_structure=None, load_instructions=None):
+    # A snapshot left by an earlier run (or another worker) skips the source entirely
+    graph_data = await asyncio.to_thread(structure_snapshots.load, agent_id)
+    if graph_data is None:
+        load_structure = load_structure or get_graph_source().get_graph_structure
+        generation = structure_snapshots.generation(agent_id)
+        graph_data = await load_structure(agent_id)
+        await asyncio.to_thread(structure_snapshots.save, agent_id, graph_data, generation)
+    return compile_graph(graph_data, load_instructions)
+
+def compile_graph(graph_data, load_instructions=None):
+    """Compile a graph structure into a runnable LangGraph graph.
+
+    graph_data is a GraphStructure or the equivalent nodes/edges dict.
+    load_instructions is an optional coroutine function used to fetch a
+    topic's instructions when the structure was loaded without them (see
+    LazyInstructions for what sync runs use).
+    """
+    structure = graph_data if isinstance(graph_data, GraphStructure) else GraphStructure.from_dict(graph_data)
 
     # Validate edges before building graph
-    for edge in graph_data["edges"]:
-        if edge.get("from") is None or edge.get("to") is None:
+    for edge in structure.edges:
+        if edge.source is None or edge.target is None:
             raise ValueError(f"Invalid edge detected with None node: {edge}")
 
-    state_schema = dict
-    graph = StateGraph(state_schema=state_schema)
-
-    node_functions = {}
-    node_metadata = {}
-
-    for node in graph_data["nodes"]:
-        func = load_function(node["module"], node["function"])
-        node_name = node["name"]
-        metadata = node.get("metadata", {})
-        node_metadata[node_name] = metadata
-
-        def make_wrapped_func(fn, node_name=node_name):
-            def wrapped(state):
-                state["agent_id"] = node_metadata[node_name].get("agent_id")
-                state["agent_name"] = node_metadata[node_name].get("agent_name")
-                state["current_node"] = node_name
-                state["instructions"] = node_metadata[node_name].get("instructions", [])
-                state["topic_label"] = node_metadata[node_name].get("topic_label")
-                state["topic_scope"] = node_metadata[node_name].get("topic_scope")
-                state["topic_id"] = node_metadata[node_name].get("topic_id")
-                return fn(state)
+    graph = StateGraph(state_schema=AgentState)
+
+    for node in structure.nodes:
+        node_name = node.name
+        func = node_registry.bind(node_name, node.module, node.function, agent_id=node.agent_id)
+        context = NodeContext.from_node(node)
+
+        # The context is captured by reference; node functions return only
+        # the state keys they change. Coroutine node functions stay async so
+        # a stopped run can cancel them.
+        def make_wrapped_func(fn, context=context):
+            if inspect.iscoroutinefunction(fn):
+                async def wrapped(state):
+                    return await fn(state, context)
+            else:
+                def wrapped(state):
+                    return fn(state, context)
             return wrapped
 
-        node_functions[node_name] = make_wrapped_func(func)
-        graph.add_node(node_name, node_functions[node_name])
+        if node.instructions is None and node.topic_id is not None:
+            node_runnable = make_lazy_runnable(node, func, LazyInstructions(context, load_instructions))
+        elif runs_in_process(node):
+            run, arun = node_processes.wrap(node.module, node.function, context)
+            node_runnable = RunnableLambda(run, afunc=arun, name=node_name)
+        else:
+            node_runnable = make_wrapped_func(func)
+
+        graph.add_node(
+            node_name,
+            node_runnable,
+            metadata={"agent_id": context.agent_id, "topic_id": context.topic_id, "topic_label": context.topic_label},
+        )
+
+    # With a routing index the run enters through the router node, which
+    # jumps straight to the best-matching topic; a routed run then follows
+    # that topic's NEXT relationships but not the rest of the scope chain.
+    routing_index = TopicRoutingIndex.from_structure(structure) if settings.graph_topic_routing else None
 
-    condition_edges = {}
-    for edge in graph_data["edges"]:
-        if edge.get("condition"):
-            condition_edges.setdefault(edge["from"], []).append((edge["condition"], edge["to"]))
+    # Group outgoing edges per node: conditional edges are keyed by the
+    # intent that selects them, unconditional ones form the default branch
+    # (linked_default holds the unconditional NEXT ones)
+    branches = {}
+    for edge in structure.edges:
+        branch = branches.setdefault(edge.source, {"conditions": {}, "default": [], "linked_default": []})
+        if edge.condition:
+            branch["conditions"][edge.condition] = edge.target
         else:
-            graph.add_edge(edge["from"], edge["to"])
+            branch["default"].append(edge.target)
+            if edge.linked:
+                branch["linked_default"].append(edge.target)
+
+    def make_intent_router(conditions, default, linked_default):
+        def intent_router(state):
+            if routing_index and state.get("route"):
+                return conditions.get(state.get("intent")) or linked_default or END
+            return conditions.get(state.get("intent")) or default or END
+        return intent_router
+
+    for from_node, branch in branches.items():
+        conditions, default = branch["conditions"], branch["default"]
+        if not conditions and not routing_index:
+            for to_node in default:
+                graph.add_edge(from_node, to_node)
+            continue
+        destinations = list(dict.fromkeys([*conditions.values(), *default, END]))
+        graph.add_conditional_edges(
+            from_node, make_intent_router(conditions, default, branch["linked_default"]), destinations
+        )
 
-    def intent_router(state):
-        return state.get("intent")
+    # Topics of the first stage all start in the first superstep
+    entry_nodes = list(structure.entry_nodes)
 
-    for from_node, branches in condition_edges.items():
-        mapping = {cond: to_node for cond, to_node in branches}
-        graph.add_conditional_edges(from_node, intent_router, mapping)
+    if routing_index:
+        min_score = settings.graph_routing_min_score
 
-    graph.set_entry_point(graph_data["entry_node"])
+        def route_topic(state):
+            return {"route": routing_index.best_match(state.get("message") or "", min_score) or ""}
+
+        def route_target(state):
+            return state.get("route") or entry_nodes
+
+        graph.add_node(ROUTER_NODE, route_topic)
+        graph.add_conditional_edges(ROUTER_NODE, route_target, [node.name for node in structure.nodes])
+        graph.set_entry_point(ROUTER_NODE)
+    else:
+        for entry_node in entry_nodes:
+            graph.set_entry_point(entry_node)
 
     return graph.compile()
+
+def get_compiled_graph(agent_id: str):
+    """Return the compiled graph for an agent, building it on a cache miss."""
+    graph = compiled_graphs.get(agent_id)
+    if graph is not None:
+        return graph
+
+    version = compiled_graphs.version(agent_id)
+
+    def build():
+        graph = build_and_compile_graph(agent_id)
+        compiled_graphs.set(agent_id, graph, version=version)
+        return graph
+
+    # Concurrent callers for the same agent share one build
+    return graph_builds.do((str(agent_id), version), build)
+
+async def aget_compiled_graph(agent_id: str, load_structure=None, load_instructions=None, record_run: bool = True):
+    """Async variant of get_compiled_graph that loads the structure without blocking the event loop.
+
+    load_structure and load_instructions are optional coroutine functions
+    used instead of the configured GraphSource (see graph_sources), e.g. a
+    GraphRepository bound to the app's driver. Each call counts as a run
+    of the agent for startup warm-up, unless record_run is False.
+    """
+    if record_run:
+        run_counts.record(agent_id)
+    graph = compiled_graphs.get(agent_id)
+    if graph is not None:
+        return graph
+
+    version = compiled_graphs.version(agent_id)
+
+    async def build():
+        graph = await abuild_and_compile_graph(agent_id, load_structure, load_instructions)
+        compiled_graphs.set(agent_id, graph, version=version)
+        return graph
+
+    # Concurrent callers for the same agent share one build
+    return await async_graph_builds.do((str(agent_id), version), build)
+
+_checkpointer = None
+
+def use_checkpointer(checkpointer) -> None:
+    """Use checkpointer for runs with a thread_id instead of the configured store.
+
+    Called by the api app's lifespan to plug in its Postgres saver, whose
+    tables only its migrations create.
+    """
+    global _checkpointer
+    _checkpointer = checkpointer
+    get_checkpointer.cache_clear()
+
+@lru_cache()
+def get_checkpointer():
+    """Checkpoint store shared by all runs that pass a thread_id.
+
+    The in-memory store only suits a single worker: with several, a
+    follow-up call lands on a worker that never saw the thread.
+    """
+    if _checkpointer is not None:
+        return _checkpointer
+    if settings.graph_checkpointer == "postgres":
+        from api.db.checkpoint import PostgresCheckpointSaver
+        from api.db.session import async_session
+        return PostgresCheckpointSaver(async_session)
+    return InMemorySaver()
+
+def checkpoint_thread_id(graph, thread_id: str) -> str:
+    """Scope a caller's thread_id to the graph's agent.
+
+    Without this, two agents given the same thread_id would resume each
+    other's checkpoints.
+    """
+    agent_id = next(
+        (spec.metadata["agent_id"] for spec in graph.builder.nodes.values() if (spec.metadata or {}).get("agent_id")),
+        None,
+    )
+    return f"{agent_id}:{thread_id}" if agent_id else thread_id
+
+async def aprepare_run(graph, input_state: dict, thread_id: str = None):
+    """Return the (graph, input, config) to run, attaching checkpointing for a thread.
+
+    Without a thread_id the cached graph runs as-is. With one, the graph is
+    bound to the checkpoint store under the agent's scoped thread id and
+    the new input is merged into the saved state. If the thread's last
+    run stopped before reaching the end, the run resumes from the pending
+    nodes; if it finished, the run continues at the topics of its last
+    step. Either way earlier topics are not replayed.
+    """
+    input_state = to_state(input_state)
+    if thread_id is None:
+        return graph, input_state, None
+
+    graph = graph.copy(update={"checkpointer": get_checkpointer()})
+    config = {"configurable": {"thread_id": checkpoint_thread_id(graph, thread_id)}}
+    snapshot = await graph.aget_state(config)
+    if snapshot.next:
+        if input_state:
+            await graph.aupdate_state(config, input_state)
+        return graph, None, config
+    if snapshot.values:
+        # The checkpoint before the final one lists the nodes of the last step
+        history = [state async for state in graph.aget_state_history(config, limit=2)]
+        if len(history) > 1 and history[1].next:
+            return graph, Command(update=input_state or {}, goto=list(history[1].next)), config
+    return graph, input_state, config
+
+async def arun_graph(graph, input_state: dict, thread_id: str = None):
+    graph, run_input, config = await aprepare_run(graph, input_state, thread_id)
+    return from_state(await graph.ainvoke(run_input, config))
+
+async def arun_graph_with_deadline(
+    graph,
+    input_state: dict,
+    thread_id: str = None,
+    *,
+    run_timeout: float = None,
+    node_timeout: float = None,
+    is_disconnected=None,
+    poll_interval: float = 0.5,
+) -> dict:
+    """Run a graph under an overall deadline and a per-node budget.
+
+    The run is streamed so progress is known at every step. It is stopped
+    when the overall deadline passes, when any node runs longer than
+    node_timeout, or when the optional is_disconnected coroutine function
+    reports that the client went away. Stopping closes the stream, which
+    cancels in-flight async nodes. Sync nodes already running in a thread
+    finish in the background, but their writes are discarded.
+
+    Returns {"status", "result", "stopped_at", "reason"}. status is
+    "completed", "timeout" or "cancelled". result is the state after the
+    last completed step, and stopped_at lists the nodes that were running
+    when the run stopped.
+    """
+    graph, run_input, config = await aprepare_run(graph, input_state, thread_id)
+    loop = asyncio.get_running_loop()
+    run_deadline = loop.time() + run_timeout if run_timeout else None
+    running = {}
+    state = None
+    status, reason = "completed", None
+
+    stream = graph.astream(run_input, config, stream_mode=["tasks", "values"]).__aiter__()
+    next_event = None
+    try:
+        while True:
+            if next_event is None:
+                next_event = asyncio.ensure_future(stream.__anext__())
+
+            deadlines = [run_deadline] if run_deadline else []
+            if node_timeout:
+                deadlines += [started_at + node_timeout for _, started_at in running.values()]
+            wait_for = poll_interval if is_disconnected else None
+            if deadlines:
+                remaining = max(min(deadlines) - loop.time(), 0)
+                wait_for = min(wait_for, remaining) if wait_for is not None else remaining
+
+            done, _ = await asyncio.wait({next_event}, timeout=wait_for)
+            if not done:
+                now = loop.time()
+                if run_deadline and now >= run_deadline:
+                    status, reason = "timeout", "run_deadline"
+                    break
+                if node_timeout and any(now >= started_at + node_timeout for _, started_at in running.values()):
+                    status, reason = "timeout", "node_budget"
+                    break
+                if is_disconnected and await is_disconnected():
+                    status, reason = "cancelled", "client_disconnected"
+                    break
+                continue
+
+            try:
+                mode, chunk = next_event.result()
+            except StopAsyncIteration:
+                break
+            finally:
+                next_event = None
+
+            if mode == "values":
+                state = chunk
+            elif "input" in chunk:
+                running[chunk["id"]] = (chunk["name"], loop.time())
+            else:
+                running.pop(chunk["id"], None)
+    finally:
+        if next_event is not None:
+            next_event.cancel()
+            await asyncio.gather(next_event, return_exceptions=True)
+        await stream.aclose()
+
+    return {
+        "status": status,
+        "result": from_state(state),
+        "stopped_at": [name for name, _ in running.values()] if status != "completed" else None,
+        "reason": reason,
+    }
+
+async def arun_batch(graph, inputs, concurrency: int, ordered: bool = True):
+    """Run many input states through one compiled graph.
+
+    inputs is an iterable of input states. At most `concurrency` runs
+    are in flight at once. Yields (index, result, error) tuples, in input
+    order when `ordered` is set and in completion order otherwise.
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def run_one(index, input_state):
+        try:
+            return index, await graph.ainvoke(input_state), None
+        except Exception as e:
+            return index, None, e
+        finally:
+            semaphore.release()
+
+    pending = deque()
+    index = 0
+    try:
+        for input_state in inputs:
+            await semaphore.acquire()
+            pending.append(asyncio.create_task(run_one(index, input_state)))
+            index += 1
+            # Hand back whatever already finished while the input is still being read
+            if ordered:
+                while pending and pending[0].done():
+                    yield pending.popleft().result()
+            else:
+                for task in [task for task in pending if task.done()]:
+                    pending.remove(task)
+                    yield task.result()
+
+        if ordered:
+            while pending:
+                yield await pending.popleft()
+        else:
+            for task in asyncio.as_completed(list(pending)):
+                yield await task
+            pending.clear()
+    finally:
+        for task in pending:
+            task.cancel()
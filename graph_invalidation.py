@@ -0,0 +1,123 @@
+import asyncio
+import logging
+import os
+import socket
+import uuid
+import asyncpg
+import orjson
+from sqlalchemy import func, select
+from config import settings
+from graph_cache import compiled_graphs
+from graph_snapshots import structure_snapshots
+
+logger = logging.getLogger("graph_invalidation")
+
+# Lets a worker ignore the notifications it published itself
+INSTANCE_ID = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+
+def notify_statement(agent_id):
+    """SELECT pg_notify(...) announcing that an agent's graph changed.
+
+    Run it in the writer's transaction: Postgres delivers the notification
+    only on commit (and drops it on rollback), and identical notifications
+    within one transaction are delivered once.
+    """
+    payload = orjson.dumps({"agent_id": str(agent_id), "origin": INSTANCE_ID}).decode()
+    return select(func.pg_notify(settings.graph_invalidation_channel, payload))
+
+def publish(db, agent_id):
+    """Queue the notification on a sync Session."""
+    db.execute(notify_statement(agent_id))
+
+async def apublish(session, agent_id):
+    """Queue the notification on an AsyncSession."""
+    await session.execute(notify_statement(agent_id))
+
+
+class InvalidationListener:
+    """Evicts graphs changed by other workers and nodes as soon as they commit.
+
+    Holds one asyncpg connection LISTENing on graph_invalidation_channel
+    and invalidates only the agent named in each notification. The
+    connection is re-established when it drops; since notifications sent
+    in between are lost, every reconnect clears the cache and the host's
+    structure snapshots and bumps all shared generations, so neither this
+    worker nor its neighbours keep serving what they built meanwhile.
+    """
+
+    def __init__(
+        self,
+        dsn: str,
+        channel: str,
+        reconnect_seconds: float,
+        cache=compiled_graphs,
+        snapshots=structure_snapshots,
+    ):
+        self.dsn = dsn
+        self.channel = channel
+        self.reconnect_seconds = reconnect_seconds
+        self.cache = cache
+        self.snapshots = snapshots
+        self._task = None
+
+    def handle(self, payload: str):
+        try:
+            message = orjson.loads(payload)
+            agent_id = message["agent_id"]
+        except (orjson.JSONDecodeError, KeyError, TypeError) as e:
+            logger.warning(f"[Graph Invalidation Malformed] payload={payload!r} → {str(e)}")
+            return
+        # The publishing worker already invalidated locally
+        if message.get("origin") != INSTANCE_ID:
+            self.cache.invalidate(agent_id)
+
+    def _on_notification(self, connection, pid, channel, payload):
+        self.handle(payload)
+
+    async def run(self):
+        reconnecting = False
+        while True:
+            try:
+                connection = await asyncpg.connect(self.dsn)
+            except Exception as e:
+                logger.warning(f"[Graph Invalidation Connect Failed] → {str(e)}")
+                await asyncio.sleep(self.reconnect_seconds)
+                continue
+
+            lost = asyncio.Event()
+            try:
+                connection.add_termination_listener(lambda _: lost.set())
+                await connection.add_listener(self.channel, self._on_notification)
+                if reconnecting:
+                    # Anything cached while disconnected may have missed its notification
+                    self.snapshots.invalidate_all()
+                    self.cache.clear()
+                reconnecting = True
+                await lost.wait()
+                logger.warning("[Graph Invalidation Listener Lost]")
+            except Exception as e:
+                logger.warning(f"[Graph Invalidation Listener Failed] → {str(e)}")
+            finally:
+                if not connection.is_closed():
+                    await connection.close()
+            await asyncio.sleep(self.reconnect_seconds)
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self.run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+
+# Listener started by the app lifespans
+invalidation_listener = InvalidationListener(
+    f"postgresql://{settings.database_username}:{settings.database_password}"
+    f"@{settings.database_hostname}:{settings.database_port}/{settings.database_name}",
+    channel=settings.graph_invalidation_channel,
+    reconnect_seconds=settings.graph_invalidation_reconnect_seconds,
+)
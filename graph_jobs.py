@@ -0,0 +1,265 @@
+import asyncio
+import logging
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Optional
+import orjson
+from sqlalchemy import delete
+from config import settings
+from graph_executor import aget_compiled_graph, arun_graph_with_deadline
+import models
+
+logger = logging.getLogger("graph_jobs")
+
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+
+
+@dataclass
+class GraphJob:
+    """A graph run submitted for background execution."""
+    id: str
+    agent_id: str
+    input_state: Optional[dict]
+    thread_id: Optional[str] = None
+    load_structure: Any = None
+    load_instructions: Any = None
+    status: str = QUEUED
+    result: Optional[dict] = None
+    error: Optional[str] = None
+    result_size: int = 0
+    created_at: float = field(default_factory=time.time)
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+
+    def to_dict(self) -> dict:
+        return {
+            "job_id": self.id,
+            "agent_id": self.agent_id,
+            "status": self.status,
+            "result": self.result,
+            "error": self.error,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+        }
+
+
+class JobQueueFull(Exception):
+    """Raised when the job queue has no room for another run."""
+
+
+class PostgresJobStore:
+    """Keeps job status and results in the graph_jobs table.
+
+    A job runs on the worker that accepted it, but the app runs several
+    workers behind one port, so polls are answered from this table by
+    whichever worker receives them. Finished rows older than
+    retention_seconds are deleted as new jobs finish.
+    """
+
+    def __init__(self, session_factory, retention_seconds: float):
+        self.session_factory = session_factory
+        self.retention_seconds = retention_seconds
+        # Each write reads the job when it takes the lock, so a slow earlier
+        # write can never land after (and overwrite) a newer status
+        self._lock = threading.Lock()
+
+    def save(self, job: GraphJob):
+        with self._lock, self.session_factory() as db:
+            db.merge(models.GraphJobRecord(
+                id=job.id,
+                agent_id=job.agent_id,
+                status=job.status,
+                # Round-trip through orjson so the JSONB column accepts any result
+                result=orjson.loads(orjson.dumps(job.result, default=str)) if job.result is not None else None,
+                error=job.error,
+                created_at=job.created_at,
+                started_at=job.started_at,
+                finished_at=job.finished_at,
+            ))
+            if job.finished_at is not None:
+                db.execute(delete(models.GraphJobRecord).where(
+                    models.GraphJobRecord.finished_at < job.finished_at - self.retention_seconds
+                ))
+            db.commit()
+
+    def load(self, job_id: str) -> Optional[GraphJob]:
+        with self.session_factory() as db:
+            row = db.get(models.GraphJobRecord, job_id)
+        if row is None:
+            return None
+        return GraphJob(
+            id=row.id,
+            agent_id=row.agent_id,
+            input_state=None,
+            status=row.status,
+            result=row.result,
+            error=row.error,
+            created_at=row.created_at,
+            started_at=row.started_at,
+            finished_at=row.finished_at,
+        )
+
+
+class GraphJobManager:
+    """Runs graph jobs on a fixed number of in-process worker tasks.
+
+    Finished jobs are kept for polling until either the finished-job count
+    or the total size of their serialized results exceeds its cap, at which
+    point the oldest finished jobs are evicted; the newest one is always
+    kept. A result larger than max_result_bytes on its own is dropped, and
+    the job is marked failed with an error that says so.
+
+    With a store (see PostgresJobStore), every status change is also
+    written there so jobs can be polled from any worker via aget().
+    """
+
+    def __init__(self, workers: int, max_queue: int, max_finished_jobs: int, max_result_bytes: int, store=None):
+        self.workers = workers
+        self.max_finished_jobs = max_finished_jobs
+        self.max_result_bytes = max_result_bytes
+        self.store = store
+        self._max_queue = max_queue
+        self._queue = None
+        self._jobs = {}
+        self._finished = OrderedDict()
+        self._finished_bytes = 0
+        self._tasks = []
+
+    def _ensure_started(self):
+        if self._tasks:
+            return
+        self._queue = asyncio.Queue(maxsize=self._max_queue)
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        self._queue = None
+
+    def submit(self, agent_id: str, input_state: dict, thread_id: str = None, load_structure=None, load_instructions=None) -> GraphJob:
+        self._ensure_started()
+        job = GraphJob(
+            id=str(uuid.uuid4()),
+            agent_id=agent_id,
+            input_state=input_state,
+            thread_id=thread_id,
+            load_structure=load_structure,
+            load_instructions=load_instructions,
+        )
+        try:
+            self._queue.put_nowait(job)
+        except asyncio.QueueFull:
+            raise JobQueueFull("Graph job queue is full, try again later.")
+        self._jobs[job.id] = job
+        return job
+
+    async def asubmit(self, agent_id: str, input_state: dict, thread_id: str = None, load_structure=None, load_instructions=None) -> GraphJob:
+        """submit(), returning once the job can be polled from any worker."""
+        job = self.submit(agent_id, input_state, thread_id, load_structure, load_instructions)
+        await self._save(job)
+        return job
+
+    def get(self, job_id: str) -> Optional[GraphJob]:
+        return self._jobs.get(job_id)
+
+    async def aget(self, job_id: str) -> Optional[GraphJob]:
+        """Look a job up here first, then in the store for jobs run by other workers."""
+        job = self._jobs.get(job_id)
+        if job is None and self.store is not None:
+            job = await asyncio.to_thread(self.store.load, job_id)
+        return job
+
+    async def _save(self, job: GraphJob):
+        if self.store is None:
+            return
+        try:
+            await asyncio.to_thread(self.store.save, job)
+        except Exception as e:
+            logger.warning(f"[Graph Job Store Failed] job_id={job.id} → {str(e)}")
+
+    async def _worker(self):
+        while True:
+            job = await self._queue.get()
+            try:
+                await self._run(job)
+            finally:
+                self._queue.task_done()
+
+    async def _run(self, job: GraphJob):
+        job.status = RUNNING
+        job.started_at = time.time()
+        await self._save(job)
+        try:
+            graph = await aget_compiled_graph(
+                job.agent_id, load_structure=job.load_structure, load_instructions=job.load_instructions
+            )
+            outcome = await arun_graph_with_deadline(
+                graph,
+                job.input_state,
+                job.thread_id,
+                run_timeout=settings.graph_run_timeout_seconds,
+                node_timeout=settings.graph_node_timeout_seconds,
+            )
+            job.result = outcome["result"]
+            job.result_size = len(orjson.dumps(job.result, default=str))
+            if outcome["status"] == "completed":
+                job.status = SUCCEEDED
+            else:
+                # Keep the partial state so the caller can see how far the run got
+                job.error = f"Run stopped ({outcome['reason']}) at {', '.join(outcome['stopped_at'])}"
+                job.status = FAILED
+            if job.result_size > self.max_result_bytes:
+                job.error = f"Result of {job.result_size} bytes exceeds the {self.max_result_bytes} byte limit and was dropped"
+                job.result = None
+                job.result_size = 0
+                job.status = FAILED
+        except Exception as e:
+            logger.warning(f"[Graph Job Failed] job_id={job.id} agent_id={job.agent_id} → {str(e)}")
+            job.error = str(e)
+            job.status = FAILED
+        finally:
+            job.finished_at = time.time()
+            # Drop references the finished job no longer needs
+            job.input_state = None
+            job.load_structure = None
+            job.load_instructions = None
+            self._record_finished(job)
+            await self._save(job)
+
+    def _record_finished(self, job: GraphJob):
+        self._finished[job.id] = job
+        self._finished_bytes += job.result_size
+        while len(self._finished) > 1 and (
+            len(self._finished) > self.max_finished_jobs
+            or self._finished_bytes > self.max_result_bytes
+        ):
+            _, evicted = self._finished.popitem(last=False)
+            self._finished_bytes -= evicted.result_size
+            self._jobs.pop(evicted.id, None)
+
+
+def get_job_store():
+    """The store selected by settings.graph_job_store ("postgres" or "memory")."""
+    if settings.graph_job_store == "postgres":
+        from db_postgres import SessionLocal
+        return PostgresJobStore(SessionLocal, settings.graph_job_retention_seconds)
+    return None
+
+
+# Background graph runs shared by the graph routers
+graph_jobs = GraphJobManager(
+    workers=settings.graph_job_workers,
+    max_queue=settings.graph_job_max_queue,
+    max_finished_jobs=settings.graph_job_max_finished,
+    max_result_bytes=settings.graph_job_max_result_bytes,
+    store=get_job_store(),
+)
@@ -0,0 +1,291 @@
+import asyncio
+import logging
+from datetime import datetime, timedelta, timezone
+from sqlalchemy import exists, func, select
+from sqlalchemy.orm import Session, aliased
+import models
+from config import settings
+from db_neo4j import agent_row, instruction_row, next_row, sync_graph, topic_row
+from db_postgres import SessionLocal
+from graph_cache import compiled_graphs
+from graph_invalidation import publish
+
+logger = logging.getLogger("graph_outbox")
+
+UPSERT = "upsert"
+DELETE = "delete"
+
+# First key of the per-agent advisory locks taken while draining
+OUTBOX_LOCK_SPACE = 0x67736f
+
+
+def enqueue(db: Session, entity_type: str, entity_id, payload: dict = None, agent_id=None, operation: str = UPSERT):
+    """Add a change event to the session; it is committed with the caller's transaction.
+
+    Other workers are told to drop the agent's graph when the transaction commits.
+    """
+    db.add(models.GraphSyncEvent(
+        entity_type=entity_type,
+        entity_id=str(entity_id),
+        operation=operation,
+        agent_id=str(agent_id) if agent_id else None,
+        payload=payload or {},
+    ))
+    if agent_id:
+        publish(db, agent_id)
+
+def enqueue_agent(db: Session, agent, operation: str = UPSERT):
+    payload = {"agent": agent_row(agent), "user_id": str(agent.user_id)} if operation == UPSERT else {}
+    enqueue(db, "agent", agent.id, payload, agent_id=agent.id, operation=operation)
+
+def enqueue_topic(db: Session, topic, operation: str = UPSERT):
+    """Record a topic snapshot (with its full instruction list) or its deletion."""
+    payload = {
+        "topic": topic_row(topic),
+        "instructions": [instruction_row(i) for i in topic.topic_instructions],
+    } if operation == UPSERT else {}
+    enqueue(db, "topic", topic.id, payload, agent_id=topic.agent_id, operation=operation)
+
+def enqueue_instruction(db: Session, instruction, agent_id):
+    enqueue(db, "instruction", instruction.id, {"instruction": instruction_row(instruction)}, agent_id=agent_id)
+
+def enqueue_next(db: Session, link, agent_id, operation: str = UPSERT):
+    """Record a NEXT link (a models.TopicNext) or its removal."""
+    enqueue(
+        db, "next", f"{link.topic_id}:{link.next_topic_id}", {"next": next_row(link)},
+        agent_id=agent_id, operation=operation,
+    )
+
+def enqueue_next_links(db: Session, agent_id, links):
+    """Record the full set of an agent's NEXT links, replacing whatever Neo4j holds."""
+    enqueue(db, "next_links", agent_id, {"next": [next_row(link) for link in links]}, agent_id=agent_id)
+
+
+def coalesce_events(events) -> dict:
+    """Collapse a batch of outbox events into sync_graph keyword arguments.
+
+    Only the newest event per entity counts, so ten updates to one topic
+    become one write, and an upsert followed by a delete becomes a delete.
+    An instruction event older than a snapshot or delete of its topic is
+    dropped as well: the topic event already carries the full instruction
+    list, and merging the older instruction after it would resurrect an
+    instruction the topic update removed. NEXT links are handled the same
+    way against a snapshot of the agent's links, and a link changed after
+    the snapshot keeps its own, newer state.
+    """
+    latest = {}
+    for event in sorted(events, key=lambda event: event.id):
+        latest[(event.entity_type, event.entity_id)] = event
+
+    topic_event_ids = {
+        entity_id: event.id for (entity_type, entity_id), event in latest.items() if entity_type == "topic"
+    }
+    next_snapshot_ids = {
+        entity_id: event.id for (entity_type, entity_id), event in latest.items() if entity_type == "next_links"
+    }
+    for key, event in list(latest.items()):
+        if key[0] == "instruction" and event.operation != DELETE:
+            topic_id = (event.payload or {}).get("instruction", {}).get("topic_id")
+            if topic_event_ids.get(topic_id, -1) > event.id:
+                del latest[key]
+        elif key[0] == "next" and next_snapshot_ids.get(event.agent_id, -1) > event.id:
+            del latest[key]
+    changed_links = {entity_id for entity_type, entity_id in latest if entity_type == "next"}
+
+    rows = {
+        "agents": [],
+        "user_agents": [],
+        "topics": [],
+        "replace_instructions_for": [],
+        "instructions": [],
+        "replace_next_for": [],
+        "next_links": [],
+        "deleted_next_links": [],
+        "deleted_topics": [],
+        "deleted_agents": [],
+    }
+    for (entity_type, entity_id), event in latest.items():
+        payload = event.payload or {}
+        if event.operation == DELETE:
+            if entity_type == "agent":
+                rows["deleted_agents"].append(entity_id)
+            elif entity_type == "topic":
+                rows["deleted_topics"].append(entity_id)
+            elif entity_type == "next":
+                rows["deleted_next_links"].append(payload["next"])
+        elif entity_type == "agent":
+            rows["agents"].append(payload["agent"])
+            rows["user_agents"].append({"user_id": payload["user_id"], "agent_id": entity_id})
+        elif entity_type == "topic":
+            rows["topics"].append(payload["topic"])
+            rows["replace_instructions_for"].append(entity_id)
+            rows["instructions"].extend(payload["instructions"])
+        elif entity_type == "instruction":
+            rows["instructions"].append(payload["instruction"])
+        elif entity_type == "next":
+            rows["next_links"].append(payload["next"])
+        elif entity_type == "next_links":
+            rows["replace_next_for"].append(entity_id)
+            rows["next_links"].extend(
+                link for link in payload["next"] if f"{link['from']}:{link['to']}" not in changed_links
+            )
+    return {key: value for key, value in rows.items() if value}
+
+def backoff_delay(attempts: int, base_seconds: float, max_seconds: float) -> float:
+    """Exponential backoff for a batch that has failed `attempts` times."""
+    return min(base_seconds * (2 ** max(attempts - 1, 0)), max_seconds)
+
+
+class OutboxDispatcher:
+    """Drains the graph_sync_outbox table to Neo4j in the background.
+
+    Each pass claims up to batch_size due events with FOR UPDATE SKIP
+    LOCKED (so several workers can run a dispatcher), coalesces them and
+    writes them in one Neo4j transaction. When that fails, each agent's
+    events are written separately and only the failing ones are retried
+    with exponential backoff; events that keep failing are logged and left
+    in the table with their last error once max_attempts is reached.
+
+    Events of one agent are applied in id order: a pass only claims an
+    agent's events while holding a transaction-level advisory lock on the
+    agent, so two dispatchers never drain the same agent at once, and no
+    event is claimed while an older event of its agent waits to be
+    retried. Otherwise a retried snapshot could overwrite newer state.
+    """
+
+    def __init__(
+        self,
+        session_factory,
+        batch_size: int,
+        poll_interval: float,
+        max_attempts: int,
+        backoff_seconds: float,
+        max_backoff_seconds: float,
+    ):
+        self.session_factory = session_factory
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self.max_attempts = max_attempts
+        self.backoff_seconds = backoff_seconds
+        self.max_backoff_seconds = max_backoff_seconds
+        self._task = None
+
+    def claim_statement(self):
+        event = models.GraphSyncEvent
+        older = aliased(models.GraphSyncEvent)
+        waiting_retry = exists().where(
+            older.agent_id.is_not_distinct_from(event.agent_id),
+            older.id < event.id,
+            older.processed_at.is_(None),
+            older.attempts < self.max_attempts,
+            older.available_at > func.now(),
+        )
+        return (
+            select(event)
+            .where(
+                event.processed_at.is_(None),
+                event.available_at <= func.now(),
+                event.attempts < self.max_attempts,
+                ~waiting_retry,
+                func.pg_try_advisory_xact_lock(OUTBOX_LOCK_SPACE, func.hashtext(func.coalesce(event.agent_id, ""))),
+            )
+            .order_by(event.id)
+            .limit(self.batch_size)
+            .with_for_update(skip_locked=True)
+        )
+
+    def sync_events(self, events) -> dict:
+        """Write events to Neo4j and return {event id: error} for those that failed.
+
+        The batch is written in one transaction. If that fails, each
+        agent's events are retried on their own, so one bad event only
+        holds back (and eventually dead-letters) its own agent.
+        """
+        try:
+            sync_graph(**coalesce_events(events))
+            return {}
+        except Exception as e:
+            by_agent = {}
+            for event in events:
+                by_agent.setdefault(event.agent_id, []).append(event)
+            if len(by_agent) == 1:
+                return {event.id: e for event in events}
+
+        failed = {}
+        for agent_events in by_agent.values():
+            try:
+                sync_graph(**coalesce_events(agent_events))
+            except Exception as e:
+                failed.update({event.id: e for event in agent_events})
+        return failed
+
+    def drain_once(self) -> int:
+        """Sync one batch of due events and return how many were claimed."""
+        now = datetime.now(timezone.utc)
+        with self.session_factory() as db:
+            events = db.execute(self.claim_statement()).scalars().all()
+            if not events:
+                return 0
+
+            failed = self.sync_events(events)
+            if failed:
+                logger.warning(f"[Graph Outbox Retry] events={len(failed)}/{len(events)} → {next(iter(failed.values()))}")
+            for event in events:
+                error = failed.get(event.id)
+                if error is None:
+                    continue
+                event.attempts += 1
+                event.last_error = str(error)
+                delay = backoff_delay(event.attempts, self.backoff_seconds, self.max_backoff_seconds)
+                event.available_at = now + timedelta(seconds=delay)
+                if event.attempts >= self.max_attempts:
+                    logger.error(
+                        f"[Graph Outbox Gave Up] event={event.id} {event.entity_type}:{event.entity_id} "
+                        f"agent={event.agent_id} after {event.attempts} attempts → {error}"
+                    )
+
+            synced = [event for event in events if event.id not in failed]
+            agent_ids = {event.agent_id for event in synced if event.agent_id}
+            for event in synced:
+                event.processed_at = now
+            # Workers may have rebuilt from Neo4j while the events were pending
+            for agent_id in agent_ids:
+                publish(db, agent_id)
+            db.commit()
+
+        # Graphs built while the events were pending may hold stale structures
+        for agent_id in agent_ids:
+            compiled_graphs.invalidate(agent_id)
+        return len(events)
+
+    async def run(self):
+        while True:
+            try:
+                claimed = await asyncio.to_thread(self.drain_once)
+            except Exception:
+                logger.exception("[Graph Outbox Failed]")
+                claimed = 0
+            # Keep draining while there is a backlog, otherwise wait for new events
+            if claimed < self.batch_size:
+                await asyncio.sleep(self.poll_interval)
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self.run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+
+# Dispatcher started by the app lifespan
+outbox_dispatcher = OutboxDispatcher(
+    SessionLocal,
+    batch_size=settings.graph_outbox_batch_size,
+    poll_interval=settings.graph_outbox_poll_seconds,
+    max_attempts=settings.graph_outbox_max_attempts,
+    backoff_seconds=settings.graph_outbox_backoff_seconds,
+    max_backoff_seconds=settings.graph_outbox_max_backoff_seconds,
+)
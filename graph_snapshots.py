@@ -0,0 +1,233 @@
+import fcntl
+import hashlib
+import logging
+import mmap
+import os
+import re
+import struct
+import tempfile
+import threading
+import time
+import zlib
+from pathlib import Path
+from typing import Optional
+import orjson
+import zstandard
+from config import settings
+
+logger = logging.getLogger("graph_snapshots")
+
+# Bump when the snapshot layout or the structure dict shape changes
+SNAPSHOT_FORMAT = 2
+
+SAFE_NAME = re.compile(r"^[A-Za-z0-9_-]{1,64}$")
+
+# Counters in the shared generation table; agents hashing to one slot share it
+GENERATION_SLOTS = 65536
+GENERATION = struct.Struct("<Q")
+GENERATION_TABLE = struct.Struct(f"<{GENERATION_SLOTS}Q")
+
+
+def structure_version() -> str:
+    """Everything a stored structure depends on besides the agent's own data.
+
+    Snapshots written under different settings (another source, scopes run
+    in parallel or not, skeleton vs full instructions) are not reused.
+    """
+    return (
+        f"{SNAPSHOT_FORMAT}:{settings.graph_source}:"
+        f"{int(settings.graph_parallel_scopes)}:{int(settings.graph_lazy_instructions)}"
+    )
+
+
+class SharedGenerations:
+    """Per-agent generation counters shared by every process on the host.
+
+    The counters live in a fixed-size file that each process maps into
+    memory, so reading an agent's generation is a memory load rather than
+    a syscall, and a bump made by one worker is seen by all others at
+    once. Bumps are serialised with an flock on a separate lock file.
+    Agents are hashed into GENERATION_SLOTS counters; two agents sharing a
+    slot only cost each other an extra rebuild.
+    """
+
+    def __init__(self, directory: Optional[Path]):
+        self.directory = directory
+        self._mapped = None
+        self._lock = threading.Lock()
+
+    def _slot(self, agent_id: str) -> int:
+        return (zlib.crc32(str(agent_id).encode()) % GENERATION_SLOTS) * GENERATION.size
+
+    def _table(self):
+        if self._mapped is None:
+            with self._lock:
+                if self._mapped is None:
+                    self.directory.mkdir(parents=True, exist_ok=True)
+                    size = GENERATION_SLOTS * GENERATION.size
+                    with open(self.directory / "generations", "a+b") as f:
+                        # Grow to full size once; the zero-filled tail means "generation 0"
+                        fcntl.flock(f, fcntl.LOCK_EX)
+                        try:
+                            if os.fstat(f.fileno()).st_size < size:
+                                f.truncate(size)
+                            self._mapped = mmap.mmap(f.fileno(), size)
+                        finally:
+                            # The mapping keeps a duplicate of the descriptor, so closing alone would not release the lock
+                            fcntl.flock(f, fcntl.LOCK_UN)
+        return self._mapped
+
+    def get(self, agent_id: str) -> int:
+        if self.directory is None:
+            return 0
+        return GENERATION.unpack_from(self._table(), self._slot(agent_id))[0]
+
+    def bump(self, agent_id: str) -> int:
+        if self.directory is None:
+            return 0
+        table = self._table()
+        slot = self._slot(agent_id)
+        with open(self.directory / "generations.lock", "a") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            generation = GENERATION.unpack_from(table, slot)[0] + 1
+            GENERATION.pack_into(table, slot, generation)
+        return generation
+
+    def bump_all(self):
+        """Advance every counter, for when invalidations may have been missed."""
+        if self.directory is None:
+            return
+        table = self._table()
+        with open(self.directory / "generations.lock", "a") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            GENERATION_TABLE.pack_into(table, 0, *(generation + 1 for generation in GENERATION_TABLE.unpack_from(table)))
+
+
+class StructureSnapshots:
+    """Graph structures shared by the workers of a host and kept across restarts.
+
+    Each agent's structure dict is stored as zstd-compressed orjson in its
+    own file and read back through mmap, so the first worker to load an
+    agent's structure saves every other worker (and every restarted one)
+    the Neo4j round trip, and the stored bytes sit once in the page cache
+    however many workers read them. Point the directory at tmpfs
+    (/dev/shm) to keep it in memory, or at a volume to survive container
+    restarts.
+
+    Every snapshot records the agent's shared generation from before its
+    structure was loaded. Invalidation bumps the generation, so snapshots
+    from earlier reads are neither served nor saved, even when a slow
+    build finishes in another worker after the invalidation. A snapshot
+    is also dropped once its structure version changes or it is older
+    than max_age_seconds.
+    """
+
+    def __init__(self, directory: Optional[str], max_age_seconds: float = 86400.0, compression_level: int = 3):
+        self.directory = Path(directory) if directory else None
+        self.max_age_seconds = max_age_seconds
+        self.compression_level = compression_level
+        self.generations = SharedGenerations(self.directory)
+
+    @property
+    def enabled(self) -> bool:
+        return self.directory is not None
+
+    def _name(self, agent_id: str) -> str:
+        agent_id = str(agent_id)
+        return agent_id if SAFE_NAME.match(agent_id) else hashlib.sha256(agent_id.encode()).hexdigest()[:32]
+
+    def path(self, agent_id: str) -> Path:
+        return self.directory / f"{self._name(agent_id)}.snap"
+
+    def generation(self, agent_id: str) -> int:
+        """Read before loading a structure and pass the value to save()."""
+        return self.generations.get(agent_id)
+
+    def _write_atomic(self, path: Path, data: bytes):
+        # Readers in other workers only ever see a complete file
+        self.directory.mkdir(parents=True, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, prefix=".tmp-")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+
+    def load(self, agent_id: str) -> Optional[dict]:
+        """Return the stored structure dict, or None if there is no valid snapshot."""
+        if not self.enabled:
+            return None
+        path = self.path(agent_id)
+        try:
+            with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                snapshot = orjson.loads(zstandard.ZstdDecompressor().decompress(mapped))
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            logger.warning(f"[Graph Snapshot Unreadable] agent_id={agent_id} → {str(e)}")
+            self.delete(agent_id)
+            return None
+
+        if (
+            snapshot.get("agent_id") != str(agent_id)
+            or snapshot.get("structure_version") != structure_version()
+            or snapshot.get("generation") != self.generation(agent_id)
+            or snapshot.get("saved_at", 0) + self.max_age_seconds < time.time()
+        ):
+            self.delete(agent_id)
+            return None
+        return snapshot["structure"]
+
+    def save(self, agent_id: str, structure: dict, generation: int):
+        """Store a structure loaded while the agent was at `generation`."""
+        if not self.enabled or generation != self.generation(agent_id):
+            return
+        snapshot = {
+            "agent_id": str(agent_id),
+            "structure_version": structure_version(),
+            "generation": generation,
+            "saved_at": time.time(),
+            "structure": structure,
+        }
+        compressor = zstandard.ZstdCompressor(level=self.compression_level, write_checksum=True)
+        try:
+            self._write_atomic(self.path(agent_id), compressor.compress(orjson.dumps(snapshot)))
+        except OSError as e:
+            logger.warning(f"[Graph Snapshot Write Failed] agent_id={agent_id} → {str(e)}")
+
+    def delete(self, agent_id: str):
+        if self.enabled:
+            self.path(agent_id).unlink(missing_ok=True)
+
+    def invalidate(self, agent_id: str):
+        """Drop an agent's snapshot and every build that read the old structure."""
+        if not self.enabled:
+            return
+        try:
+            self.generations.bump(agent_id)
+        finally:
+            self.delete(agent_id)
+
+    def invalidate_all(self):
+        """Drop every snapshot and every build that started before the call."""
+        if not self.enabled:
+            return
+        try:
+            self.generations.bump_all()
+        finally:
+            self.clear()
+
+    def clear(self):
+        if self.enabled and self.directory.exists():
+            for path in self.directory.glob("*.snap"):
+                path.unlink(missing_ok=True)
+
+
+# Shared by every worker of the app through the configured directory
+structure_snapshots = StructureSnapshots(
+    settings.graph_snapshot_dir,
+    max_age_seconds=settings.graph_snapshot_max_age_seconds,
+    compression_level=settings.graph_snapshot_compression_level,
+)
@@ -0,0 +1,135 @@
+import asyncio
+import uuid
+from abc import ABC, abstractmethod
+from functools import lru_cache
+from sqlalchemy import func, literal_column, select
+from config import settings
+import graph_builder
+import models
+
+
+class GraphSource(ABC):
+    """Where compiled graphs load their nodes/edges structure from.
+
+    Every source returns the dict built by graph_builder.build_graph_structure,
+    so compile_graph, the caches and /graph/structure do not depend on
+    which store answered. The sources returned by get_graph_source() also
+    offer sync load_graph_structure/load_topic_instructions for graphs
+    built and run outside the event loop.
+    """
+
+    @abstractmethod
+    async def get_graph_structure(self, agent_id: str) -> dict:
+        """Load the nodes/edges structure used to compile an agent's graph."""
+
+    @abstractmethod
+    async def get_topic_instructions(self, topic_id: str) -> list[dict]:
+        """Load one topic's instructions for graphs built from topic skeletons."""
+
+
+class Neo4jGraphSource(GraphSource):
+    """Reads the graph copy kept in Neo4j, on the shared async driver."""
+
+    def load_graph_structure(self, agent_id: str) -> dict:
+        return graph_builder.get_graph_structure(agent_id)
+
+    def load_topic_instructions(self, topic_id: str) -> list[dict]:
+        return graph_builder.get_topic_instructions(topic_id)
+
+    async def get_graph_structure(self, agent_id: str) -> dict:
+        return await graph_builder.aget_graph_structure(agent_id)
+
+    async def get_topic_instructions(self, topic_id: str) -> list[dict]:
+        return await graph_builder.aget_topic_instructions(topic_id)
+
+
+class PostgresGraphSource(GraphSource):
+    """Reads agents, topics and instructions straight from Postgres.
+
+    The structure is fetched in one statement: topics are LEFT JOINed to
+    their instructions and folded into a json_agg list per topic, and a
+    correlated subquery collects each topic's NEXT links from topic_next,
+    giving rows shaped like the Neo4j structure query. Queries run on the
+    sync session factory in a worker thread.
+    """
+
+    def __init__(self, session_factory):
+        self.session_factory = session_factory
+
+    @staticmethod
+    def next_topics_column():
+        # A subquery rather than a join, so links do not repeat the instruction rows
+        links = func.json_agg(func.json_build_object(
+            "to", models.TopicNext.next_topic_id,
+            "condition", models.TopicNext.condition,
+        ))
+        return (
+            select(func.coalesce(links, literal_column("'[]'::json")))
+            .where(models.TopicNext.topic_id == models.Topic.id)
+            .scalar_subquery()
+        )
+
+    @staticmethod
+    def structure_statement(agent_id: str, with_instructions: bool = True):
+        columns = [
+            models.Agent.id.label("agent_id"),
+            models.Agent.name.label("agent_name"),
+            models.Topic.id.label("topic_id"),
+            models.Topic.label.label("topic_label"),
+            models.Topic.scope.label("topic_scope"),
+            models.Topic.classification_description.label("topic_description"),
+            PostgresGraphSource.next_topics_column().label("next_topics"),
+        ]
+        statement = select(*columns).select_from(models.Agent).outerjoin(
+            models.Topic, models.Topic.agent_id == models.Agent.id
+        )
+        if with_instructions:
+            # Like Neo4j's collect() over an OPTIONAL MATCH, a topic without
+            # instructions yields a single {id: null, text: null} entry
+            instructions = func.json_agg(func.json_build_object(
+                "id", models.TopicInstruction.id,
+                "text", models.TopicInstruction.instruction,
+            ))
+            statement = (
+                statement.add_columns(instructions.label("instructions"))
+                .outerjoin(models.TopicInstruction, models.TopicInstruction.topic_id == models.Topic.id)
+                .group_by(models.Agent.id, models.Topic.id)
+            )
+        return statement.where(models.Agent.id == uuid.UUID(str(agent_id))).order_by(models.Topic.scope)
+
+    @staticmethod
+    def to_record(row) -> dict:
+        record = dict(row)
+        record["agent_id"] = str(record["agent_id"])
+        record["topic_id"] = str(record["topic_id"]) if record["topic_id"] is not None else None
+        record["next_topics"] = record.get("next_topics") or []
+        return record
+
+    def load_graph_structure(self, agent_id: str) -> dict:
+        statement = self.structure_statement(agent_id, not settings.graph_lazy_instructions)
+        with self.session_factory() as db:
+            rows = db.execute(statement).mappings().all()
+        return graph_builder.build_graph_structure(agent_id, [self.to_record(row) for row in rows])
+
+    def load_topic_instructions(self, topic_id: str) -> list[dict]:
+        with self.session_factory() as db:
+            rows = db.execute(
+                select(models.TopicInstruction.id, models.TopicInstruction.instruction)
+                .where(models.TopicInstruction.topic_id == uuid.UUID(str(topic_id)))
+            ).all()
+        return [{"id": str(row.id), "text": row.instruction} for row in rows]
+
+    async def get_graph_structure(self, agent_id: str) -> dict:
+        return await asyncio.to_thread(self.load_graph_structure, agent_id)
+
+    async def get_topic_instructions(self, topic_id: str) -> list[dict]:
+        return await asyncio.to_thread(self.load_topic_instructions, topic_id)
+
+
+@lru_cache()
+def get_graph_source() -> GraphSource:
+    """The source selected by settings.graph_source ("neo4j" or "postgres")."""
+    if settings.graph_source == "postgres":
+        from db_postgres import SessionLocal
+        return PostgresGraphSource(SessionLocal)
+    return Neo4jGraphSource()
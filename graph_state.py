@@ -0,0 +1,93 @@
+import operator
+from dataclasses import dataclass
+from typing import Annotated, TypedDict
+
+
+def keep_last(current, update):
+    """Reducer that keeps the most recent write to a channel."""
+    return update
+
+def merge_dicts(current: dict, update: dict) -> dict:
+    """Reducer that merges per-node dict writes into one dict."""
+    return {**current, **update}
+
+
+class AgentState(TypedDict, total=False):
+    """State carried between topic nodes during a graph run.
+
+    Only values produced by the run live here. Topic metadata (labels,
+    instructions, ...) stays on the node's NodeContext and is never copied
+    into the state. Input keys the state does not declare (user_id,
+    history, ...) are carried in `extra`; see to_state/from_state.
+    """
+    message: Annotated[str, keep_last]
+    route: Annotated[str, keep_last]
+    intent: Annotated[str, keep_last]
+    current_node: Annotated[str, keep_last]
+    visited: Annotated[list[str], operator.add]
+    outputs: Annotated[dict[str, str], merge_dicts]
+    extra: Annotated[dict, merge_dicts]
+
+
+def to_state(input_state: dict) -> dict:
+    """Move caller keys AgentState does not declare into the extra channel.
+
+    LangGraph drops undeclared keys from the input, so without this a
+    run would silently lose them.
+    """
+    if not input_state:
+        return input_state
+    declared = AgentState.__annotations__
+    extra = {key: value for key, value in input_state.items() if key not in declared}
+    if not extra:
+        return input_state
+    state = {key: value for key, value in input_state.items() if key in declared}
+    state["extra"] = {**state.get("extra", {}), **extra}
+    return state
+
+def from_state(state: dict) -> dict:
+    """Flatten the extra channel back so results carry the caller's keys as sent."""
+    if not state or "extra" not in state:
+        return state
+    result = {key: value for key, value in state.items() if key != "extra"}
+    return {**state["extra"], **result}
+
+
+@dataclass(frozen=True, slots=True)
+class NodeContext:
+    """Per-node metadata handed to node functions by reference."""
+    node_name: str
+    agent_id: str | None = None
+    agent_name: str | None = None
+    topic_id: str | None = None
+    topic_label: str | None = None
+    topic_scope: str | None = None
+    classification_description: str | None = None
+    instructions: tuple = ()
+
+    @classmethod
+    def from_node(cls, node) -> "NodeContext":
+        """Build the context for a graph_structure.GraphNode, sharing its interned strings."""
+        return cls(
+            node_name=node.name,
+            agent_id=node.agent_id,
+            agent_name=node.agent_name,
+            topic_id=node.topic_id,
+            topic_label=node.topic_label,
+            topic_scope=node.topic_scope,
+            classification_description=node.classification_description,
+            instructions=node.instructions or (),
+        )
+
+    @classmethod
+    def from_metadata(cls, node_name: str, metadata: dict) -> "NodeContext":
+        return cls(
+            node_name=node_name,
+            agent_id=metadata.get("agent_id"),
+            agent_name=metadata.get("agent_name"),
+            topic_id=metadata.get("topic_id"),
+            topic_label=metadata.get("topic_label"),
+            topic_scope=metadata.get("topic_scope"),
+            classification_description=metadata.get("classification_description"),
+            instructions=tuple(metadata.get("instructions") or ()),
+        )
@@ -0,0 +1,141 @@
+import sys
+from dataclasses import dataclass
+from typing import Optional
+
+
+def intern(value):
+    """Intern strings that repeat across nodes and agents; pass anything else through."""
+    return sys.intern(value) if isinstance(value, str) else value
+
+
+@dataclass(frozen=True, slots=True)
+class Instruction:
+    """One topic instruction. Item access is kept for node functions written against dicts."""
+    id: Optional[str]
+    text: Optional[str]
+
+    def __getitem__(self, key: str):
+        return getattr(self, key)
+
+    def get(self, key: str, default=None):
+        return getattr(self, key, default)
+
+
+@dataclass(frozen=True, slots=True)
+class GraphNode:
+    name: str
+    module: str
+    function: str
+    agent_id: Optional[str] = None
+    agent_name: Optional[str] = None
+    topic_id: Optional[str] = None
+    topic_label: Optional[str] = None
+    topic_scope: Optional[str] = None
+    classification_description: Optional[str] = None
+    # None when the structure was loaded without instructions (lazy mode)
+    instructions: Optional[tuple[Instruction, ...]] = ()
+    executor: Optional[str] = None
+
+
+@dataclass(frozen=True, slots=True)
+class GraphEdge:
+    source: Optional[str]
+    target: Optional[str]
+    condition: Optional[str] = None
+    # Comes from a NEXT relationship rather than the scope chain; such
+    # edges carry a "condition" key in the dict form, even when it is None
+    linked: bool = False
+
+
+@dataclass(frozen=True, slots=True)
+class GraphStructure:
+    """Compact form of the nodes/edges dict returned by build_graph_structure.
+
+    Nodes and edges are slotted tuples instead of nested dicts, and the
+    names, modules, functions, labels and conditions that repeat across
+    nodes and agents are interned so every cached graph shares one copy.
+    """
+    entry_node: str
+    entry_nodes: tuple[str, ...]
+    nodes: tuple[GraphNode, ...]
+    edges: tuple[GraphEdge, ...]
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "GraphStructure":
+        nodes = []
+        for node in data["nodes"]:
+            metadata = node.get("metadata") or {}
+            instructions = metadata.get("instructions", ())
+            if instructions is not None:
+                instructions = tuple(
+                    Instruction(id=instruction.get("id"), text=instruction.get("text"))
+                    for instruction in instructions
+                )
+            nodes.append(GraphNode(
+                name=intern(node["name"]),
+                module=intern(node["module"]),
+                function=intern(node["function"]),
+                agent_id=intern(metadata.get("agent_id")),
+                agent_name=intern(metadata.get("agent_name")),
+                topic_id=metadata.get("topic_id"),
+                topic_label=intern(metadata.get("topic_label")),
+                topic_scope=intern(metadata.get("topic_scope")),
+                classification_description=metadata.get("classification_description"),
+                instructions=instructions,
+                executor=intern(node.get("executor")),
+            ))
+
+        entry_node = intern(data["entry_node"])
+        return cls(
+            entry_node=entry_node,
+            entry_nodes=tuple(intern(name) for name in data.get("entry_nodes") or [entry_node]),
+            nodes=tuple(nodes),
+            edges=tuple(
+                GraphEdge(
+                    source=intern(edge.get("from")),
+                    target=intern(edge.get("to")),
+                    condition=intern(edge.get("condition")),
+                    linked="condition" in edge,
+                )
+                for edge in data["edges"]
+            ),
+        )
+
+    def to_dict(self) -> dict:
+        """Expand back into the dict shape served by /graph/structure."""
+        nodes = []
+        for node in self.nodes:
+            entry = {
+                "name": node.name,
+                "module": node.module,
+                "function": node.function,
+                "metadata": {
+                    "agent_id": node.agent_id,
+                    "agent_name": node.agent_name,
+                    "topic_id": node.topic_id,
+                    "topic_label": node.topic_label,
+                    "topic_scope": node.topic_scope,
+                    "classification_description": node.classification_description,
+                    "instructions": (
+                        None if node.instructions is None
+                        else [{"id": i.id, "text": i.text} for i in node.instructions]
+                    ),
+                },
+            }
+            if node.executor is not None:
+                entry["executor"] = node.executor
+            nodes.append(entry)
+
+        edges = []
+        for edge in self.edges:
+            entry = {"from": edge.source, "to": edge.target}
+            if edge.linked or edge.condition is not None:
+                entry["condition"] = edge.condition
+            edges.append(entry)
+
+        return {
+            "entry_node": self.entry_node,
+            "entry_nodes": list(self.entry_nodes),
+            "nodes": nodes,
+            "edges": edges,
+        }
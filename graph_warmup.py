@@ -0,0 +1,54 @@
+import asyncio
+import logging
+from config import settings
+from graph_cache import run_counts
+from graph_executor import aget_compiled_graph
+
+logger = logging.getLogger("graph_warmup")
+
+
+def warmup_agent_ids() -> list[str]:
+    """The configured agents followed by the most-run ones, without duplicates."""
+    agent_ids = list(settings.graph_warmup_agents) + run_counts.top(settings.graph_warmup_top_n)
+    return list(dict.fromkeys(str(agent_id) for agent_id in agent_ids))
+
+
+async def awarm_up(
+    agent_ids: list[str],
+    concurrency: int,
+    timeout: float,
+    load_structure=None,
+    load_instructions=None,
+) -> dict:
+    """Load and compile graphs into the cache before the app serves requests.
+
+    At most `concurrency` graphs are loaded at once so warm-up does not
+    flood the structure source. Agents that fail are logged and skipped;
+    whatever is still loading when `timeout` seconds have passed is
+    cancelled so a slow source cannot hold up startup.
+    """
+    counts = {"warmed": 0, "failed": 0, "cancelled": 0}
+    if not agent_ids:
+        return counts
+
+    semaphore = asyncio.Semaphore(max(concurrency, 1))
+
+    async def warm(agent_id: str):
+        async with semaphore:
+            try:
+                await aget_compiled_graph(agent_id, load_structure, load_instructions, record_run=False)
+            except Exception as e:
+                logger.warning(f"[Graph Warm-up Failed] agent_id={agent_id} → {str(e)}")
+                counts["failed"] += 1
+            else:
+                counts["warmed"] += 1
+
+    tasks = [asyncio.create_task(warm(agent_id)) for agent_id in agent_ids]
+    _, pending = await asyncio.wait(tasks, timeout=timeout if timeout > 0 else None)
+    for task in pending:
+        task.cancel()
+    await asyncio.gather(*pending, return_exceptions=True)
+    counts["cancelled"] = len(pending)
+
+    logger.info(f"[Graph Warm-up] agents={len(agent_ids)} {counts}")
+    return counts
@@ -1,6 +1,18 @@
+import logging
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 import models
+from db_neo4j import aclose_drivers, get_async_driver
 from db_postgres import engine
+from graph_cache import run_counts
+from graph_executor import node_processes
+from graph_invalidation import invalidation_listener
+from graph_jobs import graph_jobs
+from graph_outbox import outbox_dispatcher
+from graph_warmup import awarm_up, warmup_agent_ids
+from neo4j_schema import aapply_schema
+from node_registry import node_registry
+from config import settings
 from routers import agents, topics, topic_instructions, users
 from fastapi.middleware.cors import CORSMiddleware
 from routers.graph_router import router as graph_router
@@ -8,8 +20,48 @@ from routers.graph_router import router as graph_router
 # Ensure all tables are created in the database
 models.Base.metadata.create_all(bind=engine)
 
+logger = logging.getLogger(__name__)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Bring the Neo4j constraints and indexes up to the latest schema version
+    if settings.neo4j_apply_schema_on_startup:
+        try:
+            await aapply_schema(get_async_driver())
+        except Exception as e:
+            logger.error("Neo4j schema bootstrap failed: %s", e)
+    # Import and validate graph node functions before serving runs
+    node_registry.preload(settings.graph_node_modules)
+    # Start node worker processes up front when heavy nodes are configured
+    if settings.graph_process_nodes:
+        node_processes.warm_up()
+    # Compile the configured and most-run agents' graphs before serving
+    await awarm_up(
+        warmup_agent_ids(),
+        concurrency=settings.graph_warmup_concurrency,
+        timeout=settings.graph_warmup_timeout_seconds,
+    )
+    # Drain queued Postgres changes to Neo4j in the background
+    outbox_dispatcher.start()
+    # Drop graphs changed through other workers and nodes as soon as they commit
+    if settings.graph_invalidation_listen:
+        invalidation_listener.start()
+    yield
+    # Stop background graph job workers, the outbox dispatcher and the invalidation listener
+    await graph_jobs.stop()
+    await outbox_dispatcher.stop()
+    await invalidation_listener.stop()
+    # Persist this worker's run counts for the next warm-up
+    try:
+        run_counts.flush()
+    except Exception as e:
+        logger.error("Saving graph run counts failed: %s", e)
+    node_processes.shutdown()
+    # Close the Neo4j drivers used by graph runs and the sync writers
+    await aclose_drivers()
+
 # Initialize the FastAPI app
-app = FastAPI()
+app = FastAPI(lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -1,5 +1,6 @@
 import uuid
-from sqlalchemy import Column, String, Text, ForeignKey, TIMESTAMP, text
+from sqlalchemy import BigInteger, Column, Float, Integer, String, Text, ForeignKey, TIMESTAMP, text
+from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy.orm import relationship
 from sqlalchemy.types import UUID as PG_UUID
 from db_postgres import Base
@@ -70,4 +71,51 @@ class TopicInstruction(Base):
     id = Column(PG_UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     topic_id = Column(PG_UUID(as_uuid=True), ForeignKey("topics.id"), nullable=False)
     instruction = Column(Text, nullable=False)
-    topic = relationship("Topic", back_populates="topic_instructions")
\ No newline at end of file
+    topic = relationship("Topic", back_populates="topic_instructions")
+
+class TopicNext(Base):
+    """A NEXT link from one topic to another of the same agent.
+
+    Postgres holds the links so they reach Neo4j through the outbox like
+    every other change; condition is the intent that selects the branch
+    (None for the default one).
+    """
+    __tablename__ = "topic_next"
+    topic_id = Column(PG_UUID(as_uuid=True), ForeignKey("topics.id", ondelete="CASCADE"), primary_key=True)
+    next_topic_id = Column(PG_UUID(as_uuid=True), ForeignKey("topics.id", ondelete="CASCADE"), primary_key=True)
+    condition = Column(Text, nullable=True)
+
+class GraphJobRecord(Base):
+    """Status and result of a background graph job, readable by every worker.
+
+    Written by graph_jobs.PostgresJobStore; the job itself runs on the
+    worker that accepted it.
+    """
+    __tablename__ = "graph_jobs"
+    id = Column(String, primary_key=True)
+    agent_id = Column(String, nullable=False)
+    status = Column(String, nullable=False)
+    result = Column(JSONB, nullable=True)
+    error = Column(Text, nullable=True)
+    created_at = Column(Float, nullable=False)
+    started_at = Column(Float, nullable=True)
+    finished_at = Column(Float, nullable=True, index=True)
+
+class GraphSyncEvent(Base):
+    """Outbox row recording a Postgres change that still has to reach Neo4j.
+
+    Rows are added in the same transaction as the change they describe and
+    drained by graph_outbox.OutboxDispatcher.
+    """
+    __tablename__ = "graph_sync_outbox"
+    id = Column(BigInteger, primary_key=True, autoincrement=True)
+    entity_type = Column(String, nullable=False)  # agent | topic | instruction | next | next_links
+    entity_id = Column(String, nullable=False)
+    operation = Column(String, nullable=False, server_default="upsert")  # upsert | delete
+    agent_id = Column(String, nullable=True)  # Compiled graph to invalidate once synced
+    payload = Column(JSONB, nullable=False, server_default=text("'{}'::jsonb"))
+    attempts = Column(Integer, nullable=False, server_default=text("0"))
+    last_error = Column(Text, nullable=True)
+    created_at = Column(TIMESTAMP(timezone=True), nullable=False, server_default=text('now()'))
+    available_at = Column(TIMESTAMP(timezone=True), nullable=False, server_default=text('now()'), index=True)
+    processed_at = Column(TIMESTAMP(timezone=True), nullable=True, index=True)
@@ -1,15 +1,22 @@
-def handle_topic(state):
-    print(f"Agent ID: {state.get('agent_id')}")
-    print(f"Agent Name: {state.get('agent_name')}")
-    print(f"Node: {state['current_node']}")
-    print(f"Topic ID: {state.get('topic_id')}")
-    print(f"Topic: {state['topic_label']}")
+from graph_state import AgentState, NodeContext
+
+def handle_topic(state: AgentState, context: NodeContext) -> dict:
+    print(f"Agent ID: {context.agent_id}")
+    print(f"Agent Name: {context.agent_name}")
+    print(f"Node: {context.node_name}")
+    print(f"Topic ID: {context.topic_id}")
+    print(f"Topic: {context.topic_label}")
     print("Instructions:")
-    for i in state["instructions"]:
+    for i in context.instructions:
         print("-", i["text"])
 
-    state["message"] = f"Processed topic: {state['topic_label']}"
-    state["intent"] = "next_node"  # Placeholder for next intent
-    return state
+    message = f"Processed topic: {context.topic_label}"
+    return {
+        "current_node": context.node_name,
+        "message": message,
+        "intent": "next_node",  # Placeholder for next intent
+        "visited": [context.node_name],
+        "outputs": {context.node_name: message},
+    }
 
 
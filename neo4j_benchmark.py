@@ -0,0 +1,66 @@
+"""Benchmark Topic lookups by id as the graph grows, with and without the schema.
+
+Runs against the Neo4j instance configured in .env. It creates throwaway
+:BenchTopic nodes (a separate label, so real data is untouched) and drops
+them and the benchmark constraint at the end:
+
+    python neo4j_benchmark.py --sizes 1000 10000 100000 --lookups 200
+"""
+import argparse
+import random
+import statistics
+import time
+from db_neo4j import chunked, get_driver
+
+CREATE_QUERY = "UNWIND $rows AS row CREATE (:BenchTopic {id: row.id})"
+LOOKUP_QUERY = "MATCH (t:BenchTopic {id: $id}) RETURN t.id"
+CONSTRAINT_QUERY = "CREATE CONSTRAINT bench_topic_id_unique IF NOT EXISTS FOR (n:BenchTopic) REQUIRE n.id IS UNIQUE"
+DROP_CONSTRAINT_QUERY = "DROP CONSTRAINT bench_topic_id_unique IF EXISTS"
+CLEANUP_QUERY = "MATCH (t:BenchTopic) CALL { WITH t DETACH DELETE t } IN TRANSACTIONS OF 10000 ROWS"
+
+
+def grow_to(session, current: int, size: int):
+    rows = [{"id": f"bench-{i}"} for i in range(current, size)]
+    for chunk in chunked(rows, 10000):
+        session.run(CREATE_QUERY, rows=chunk).consume()
+
+
+def median_lookup_ms(session, size: int, lookups: int) -> float:
+    timings = []
+    for _ in range(lookups):
+        node_id = f"bench-{random.randrange(size)}"
+        started = time.perf_counter()
+        session.run(LOOKUP_QUERY, id=node_id).consume()
+        timings.append((time.perf_counter() - started) * 1000)
+    return statistics.median(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--lookups", type=int, default=200)
+    args = parser.parse_args()
+
+    print(f"{'nodes':>10} {'label scan (ms)':>16} {'constraint (ms)':>16}")
+    driver = get_driver()
+    try:
+        with driver.session() as session:
+            current = 0
+            for size in sorted(args.sizes):
+                grow_to(session, current, size)
+                current = size
+                session.run(DROP_CONSTRAINT_QUERY).consume()
+                scan_ms = median_lookup_ms(session, size, args.lookups)
+                session.run(CONSTRAINT_QUERY).consume()
+                session.run("CALL db.awaitIndexes()").consume()
+                indexed_ms = median_lookup_ms(session, size, args.lookups)
+                print(f"{size:>10} {scan_ms:>16.3f} {indexed_ms:>16.3f}")
+    finally:
+        with driver.session() as session:
+            session.run(DROP_CONSTRAINT_QUERY).consume()
+            session.run(CLEANUP_QUERY).consume()
+        driver.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+"""Versioned Neo4j schema: uniqueness constraints and indexes for the graph keys.
+
+Applied on startup (see neo4j_apply_schema_on_startup) or from the command line:
+
+    python neo4j_schema.py apply
+    python neo4j_schema.py status
+"""
+import argparse
+import logging
+
+logger = logging.getLogger("neo4j_schema")
+
+# (version, description, statements). Append new versions; never edit applied ones.
+MIGRATIONS = [
+    (1, "Uniqueness constraints on the id keys used by MERGE/MATCH", [
+        "CREATE CONSTRAINT user_id_unique IF NOT EXISTS FOR (n:User) REQUIRE n.id IS UNIQUE",
+        "CREATE CONSTRAINT agent_id_unique IF NOT EXISTS FOR (n:Agent) REQUIRE n.id IS UNIQUE",
+        "CREATE CONSTRAINT topic_id_unique IF NOT EXISTS FOR (n:Topic) REQUIRE n.id IS UNIQUE",
+        "CREATE CONSTRAINT topic_instruction_id_unique IF NOT EXISTS FOR (n:TopicInstruction) REQUIRE n.id IS UNIQUE",
+    ]),
+    (2, "Index on Topic.scope used to order graph structures", [
+        "CREATE INDEX topic_scope IF NOT EXISTS FOR (n:Topic) ON (n.scope)",
+    ]),
+]
+
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+GET_VERSION_QUERY = "MATCH (s:SchemaVersion {id: 'graph'}) RETURN s.version AS version"
+
+SET_VERSION_QUERY = """
+    MERGE (s:SchemaVersion {id: 'graph'})
+    SET s.version = $version,
+        s.description = $description,
+        s.applied_at = datetime()
+"""
+
+
+def pending_migrations(current_version: int) -> list:
+    return [migration for migration in MIGRATIONS if migration[0] > current_version]
+
+
+def get_schema_version(driver) -> int:
+    with driver.session() as session:
+        record = session.run(GET_VERSION_QUERY).single()
+        return record["version"] if record and record["version"] is not None else 0
+
+
+def apply_schema(driver) -> int:
+    """Apply pending schema versions with the sync driver and return the resulting version.
+
+    Every statement is idempotent (IF NOT EXISTS), so several workers
+    starting at once can all run this safely.
+    """
+    version = get_schema_version(driver)
+    with driver.session() as session:
+        for migration_version, description, statements in pending_migrations(version):
+            # Schema changes cannot share a transaction with data writes
+            for statement in statements:
+                session.run(statement).consume()
+            session.run(SET_VERSION_QUERY, version=migration_version, description=description).consume()
+            logger.info(f"[Neo4j Schema] applied version {migration_version}: {description}")
+            version = migration_version
+    return version
+
+
+async def aget_schema_version(driver) -> int:
+    async with driver.session() as session:
+        result = await session.run(GET_VERSION_QUERY)
+        record = await result.single()
+        return record["version"] if record and record["version"] is not None else 0
+
+
+async def aapply_schema(driver) -> int:
+    """Async variant of apply_schema for the api app's AsyncDriver."""
+    version = await aget_schema_version(driver)
+    async with driver.session() as session:
+        for migration_version, description, statements in pending_migrations(version):
+            for statement in statements:
+                result = await session.run(statement)
+                await result.consume()
+            result = await session.run(SET_VERSION_QUERY, version=migration_version, description=description)
+            await result.consume()
+            logger.info(f"[Neo4j Schema] applied version {migration_version}: {description}")
+            version = migration_version
+    return version
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Manage the Neo4j schema version.")
+    parser.add_argument("command", choices=["apply", "status"])
+    args = parser.parse_args()
+
+    from db_neo4j import get_driver
+    driver = get_driver()
+    try:
+        if args.command == "apply":
+            print(f"Neo4j schema at version {apply_schema(driver)} (latest {LATEST_VERSION})")
+        else:
+            version = get_schema_version(driver)
+            print(f"Neo4j schema at version {version} (latest {LATEST_VERSION})")
+            for migration_version, description, _ in pending_migrations(version):
+                print(f"  pending {migration_version}: {description}")
+    finally:
+        driver.close()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    main()
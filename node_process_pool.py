@@ -0,0 +1,84 @@
+import asyncio
+import dataclasses
+import inspect
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+import orjson
+from graph_state import NodeContext
+from node_registry import node_registry
+
+
+def _init_worker(module_names):
+    # Import node modules once per worker so calls only pay a dict lookup
+    node_registry.preload(module_names)
+
+def _warm_up():
+    return None
+
+def _run_node(module_name: str, function_name: str, state_bytes: bytes, context_bytes: bytes) -> bytes:
+    fn = node_registry.resolve(module_name, function_name)
+    context_data = orjson.loads(context_bytes)
+    context = NodeContext.from_metadata(context_data["node_name"], context_data)
+    result = fn(orjson.loads(state_bytes), context)
+    if inspect.iscoroutine(result):
+        # An async node function runs to completion on its own loop in the worker
+        result = asyncio.run(result)
+    return orjson.dumps(result)
+
+
+class NodeProcessPool:
+    """Runs CPU-heavy node functions in a pool of worker processes.
+
+    State and node context cross the process boundary as orjson bytes.
+    Async node functions are run on an event loop inside the worker.
+    Workers are spawned with the node modules preloaded and can be warmed
+    up front so the first heavy node does not pay for process start-up.
+    """
+
+    def __init__(self, workers: int, preload_modules):
+        self.workers = workers
+        self.preload_modules = list(preload_modules)
+        self._executor = None
+        self._lock = threading.Lock()
+
+    @property
+    def executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    self._executor = ProcessPoolExecutor(
+                        max_workers=self.workers,
+                        mp_context=multiprocessing.get_context("spawn"),
+                        initializer=_init_worker,
+                        initargs=(self.preload_modules,),
+                    )
+        return self._executor
+
+    def warm_up(self):
+        """Start every worker process now instead of on the first node call."""
+        for future in [self.executor.submit(_warm_up) for _ in range(self.workers)]:
+            future.result()
+
+    def shutdown(self):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=True, cancel_futures=True)
+                self._executor = None
+
+    def wrap(self, module_name: str, function_name: str, context: NodeContext):
+        """Return (sync, async) node callables that run the function in the pool."""
+        context_bytes = orjson.dumps(dataclasses.asdict(context))
+
+        def run(state):
+            future = self.executor.submit(_run_node, module_name, function_name, orjson.dumps(state), context_bytes)
+            return orjson.loads(future.result())
+
+        async def arun(state):
+            loop = asyncio.get_running_loop()
+            result = await loop.run_in_executor(
+                self.executor, _run_node, module_name, function_name, orjson.dumps(state), context_bytes
+            )
+            return orjson.loads(result)
+
+        return run, arun
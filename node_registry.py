@@ -0,0 +1,84 @@
+import inspect
+import threading
+from importlib import import_module
+
+
+class NodeRegistry:
+    """Registry of graph node callables keyed by (module, function).
+
+    Functions are imported and validated once, either up front through
+    preload() or on the first resolve() for a module/function pair; later
+    lookups are a dict hit. The registry also records which module and
+    function each compiled graph node is bound to, per agent; an agent's
+    bindings are dropped with unbind_agent() when its graph leaves the
+    cache, so they do not pile up for agents no longer served.
+    """
+
+    def __init__(self):
+        self._functions = {}
+        self._bindings = {}
+        self._lock = threading.Lock()
+
+    def register(self, module_name: str, function_name: str, fn=None):
+        if fn is None:
+            try:
+                module = import_module(module_name)
+            except ImportError as e:
+                raise ValueError(f"Node module '{module_name}' could not be imported: {str(e)}")
+            fn = getattr(module, function_name, None)
+        if not callable(fn):
+            raise ValueError(f"Node function '{module_name}.{function_name}' is not callable or does not exist.")
+        with self._lock:
+            self._functions[(module_name, function_name)] = fn
+        return fn
+
+    def preload(self, module_names):
+        """Import modules and register every public function they define."""
+        for module_name in module_names:
+            module = import_module(module_name)
+            for function_name, fn in inspect.getmembers(module, inspect.isfunction):
+                if fn.__module__ == module_name and not function_name.startswith("_"):
+                    self.register(module_name, function_name, fn)
+
+    def resolve(self, module_name: str, function_name: str):
+        fn = self._functions.get((module_name, function_name))
+        if fn is None:
+            fn = self.register(module_name, function_name)
+        return fn
+
+    def bind(self, node_name: str, module_name: str, function_name: str, agent_id: str = None):
+        """Resolve a node's function and remember the binding for the agent's graph."""
+        fn = self.resolve(module_name, function_name)
+        with self._lock:
+            self._bindings[(agent_id, node_name)] = (module_name, function_name)
+        return fn
+
+    def binding(self, node_name: str, agent_id: str = None):
+        return self._bindings.get((agent_id, node_name))
+
+    def unbind_agent(self, agent_id: str):
+        with self._lock:
+            for key in [key for key in self._bindings if key[0] == agent_id]:
+                del self._bindings[key]
+
+    def describe(self) -> dict:
+        nodes = {}
+        agents = {}
+        for (agent_id, node_name), (module_name, function_name) in list(self._bindings.items()):
+            bound = {"module": module_name, "function": function_name}
+            if agent_id is None:
+                nodes[node_name] = bound
+            else:
+                agents.setdefault(agent_id, {})[node_name] = bound
+        return {
+            "functions": [
+                {"module": module_name, "function": function_name}
+                for module_name, function_name in self._functions
+            ],
+            "nodes": nodes,
+            "agents": agents,
+        }
+
+
+# Node callables used by compiled graphs
+node_registry = NodeRegistry()
@@ -55,6 +55,20 @@ def update_agent(
 ):
     return crud.update_agent(db, agent_id, agent, current_user.id)
 
+@router.post("/agents/{agent_id}/sync", response_model=dict)
+def sync_agent_graph(
+    agent_id: str,
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(get_current_user)
+):
+    agent = crud.get_agent(db, agent_id)
+    if not agent:
+        raise HTTPException(status_code=404, detail="Agent not found")
+    if agent.user_id != current_user.id:
+        raise HTTPException(status_code=403, detail="Not authorized to sync this agent")
+    crud.sync_agent_graph(db, agent_id)
+    return {"message": "Agent graph sync queued"}
+
 @router.delete("/agents/{agent_id}", response_model=dict)
 def delete_agent(
     agent_id: str,
@@ -5,6 +5,8 @@ from db_postgres import get_db
 import models
 from dependencies import get_current_user
 from schemas import topic_schemas
+from graph_cache import compiled_graphs
+from graph_outbox import DELETE, enqueue_next, enqueue_topic
 
 router = APIRouter()
 
@@ -56,5 +58,59 @@ def delete_topic(
     if topic.agent.user_id != current_user.id:
         raise HTTPException(status_code=403, detail="Not authorized to delete this topic")
     db.delete(topic)
+    enqueue_topic(db, topic, operation=DELETE)
     db.commit()
+    compiled_graphs.invalidate(topic.agent_id)
     return {"message": "Topic deleted successfully"}
+
+def get_linked_topics(db: Session, topic_id: str, next_topic_id: str, current_user: models.User):
+    """Load both ends of a NEXT link, checking they belong to one agent owned by the user."""
+    topics = {
+        str(topic.id): topic
+        for topic in db.query(models.Topic).options(joinedload(models.Topic.agent))
+        .filter(models.Topic.id.in_([topic_id, next_topic_id])).all()
+    }
+    topic, next_topic = topics.get(str(topic_id)), topics.get(str(next_topic_id))
+    if not topic or not next_topic:
+        raise HTTPException(status_code=404, detail="Topic not found")
+    if topic.agent_id != next_topic.agent_id:
+        raise HTTPException(status_code=400, detail="Topics belong to different agents")
+    if topic.agent.user_id != current_user.id:
+        raise HTTPException(status_code=403, detail="Not authorized to link these topics")
+    return topic, next_topic
+
+@router.put("/topics/{topic_id}/next/{next_topic_id}", response_model=dict)
+def link_next_topic(
+    topic_id: str,
+    next_topic_id: str,
+    link: topic_schemas.TopicNextRequest,
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(get_current_user)
+):
+    topic, next_topic = get_linked_topics(db, topic_id, next_topic_id, current_user)
+    next_link = db.get(models.TopicNext, (topic.id, next_topic.id))
+    if next_link is None:
+        next_link = models.TopicNext(topic_id=topic.id, next_topic_id=next_topic.id)
+        db.add(next_link)
+    next_link.condition = link.condition
+    enqueue_next(db, next_link, topic.agent_id)
+    db.commit()
+    compiled_graphs.invalidate(topic.agent_id)
+    return {"message": "Topics linked successfully"}
+
+@router.delete("/topics/{topic_id}/next/{next_topic_id}", response_model=dict)
+def unlink_next_topic(
+    topic_id: str,
+    next_topic_id: str,
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(get_current_user)
+):
+    topic, next_topic = get_linked_topics(db, topic_id, next_topic_id, current_user)
+    next_link = db.get(models.TopicNext, (topic.id, next_topic.id))
+    if next_link is None:
+        raise HTTPException(status_code=404, detail="Topics are not linked")
+    db.delete(next_link)
+    enqueue_next(db, next_link, topic.agent_id, operation=DELETE)
+    db.commit()
+    compiled_graphs.invalidate(topic.agent_id)
+    return {"message": "Topics unlinked successfully"}
@@ -11,7 +11,8 @@ class NodeMetadata(BaseModel):
     topic_id: str
     topic_label: str
     topic_scope: str
-    instructions: List[InstructionSchema] = []
+    classification_description: Optional[str] = None
+    instructions: Optional[List[InstructionSchema]] = []  # None until loaded in lazy mode
 
 class GraphNodeSchema(BaseModel):
     name: str
@@ -29,5 +30,6 @@ class GraphEdgeSchema(BaseModel):
 
 class GraphStructureSchema(BaseModel):
     entry_node: str
+    entry_nodes: List[str] = []
     nodes: List[GraphNodeSchema]
     edges: List[GraphEdgeSchema]
@@ -45,6 +45,9 @@ class TopicResponse(TopicBase):
     class Config:
         from_attributes = True
 
+class TopicNextRequest(BaseModel):
+    condition: Optional[str] = None  # Intent that selects this branch; None makes it the default
+
 # New response model for multiple topics
 class TopicsResponse(BaseModel):
     topics: List[TopicResponse]  # Ensure API returns {"topics": [...]}
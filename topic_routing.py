@@ -0,0 +1,84 @@
+import re
+import zlib
+from typing import Optional
+import numpy as np
+from graph_structure import GraphStructure
+
+# Entry node added to graphs that route by classification description
+ROUTER_NODE = "route_topic"
+
+TOKEN_PATTERN = re.compile(r"\w+")
+
+
+def hashed_ngrams(text: str, n_features: int) -> np.ndarray:
+    """Hash the words and character 3-grams of a text into feature indices.
+
+    crc32 is used instead of hash() so indices are stable across processes.
+    """
+    indices = []
+    for word in TOKEN_PATTERN.findall(text.lower()):
+        indices.append(zlib.crc32(word.encode()))
+        padded = f" {word} "
+        indices.extend(zlib.crc32(padded[i:i + 3].encode()) for i in range(len(padded) - 2))
+    return np.asarray(indices, dtype=np.uint32) % n_features
+
+
+class TopicRoutingIndex:
+    """TF-IDF matrix of hashed n-gram vectors, one row per topic node.
+
+    Rows are L2-normalised, so scoring a message against every topic is a
+    single matrix-vector product yielding cosine similarities.
+    """
+
+    def __init__(self, node_names: list[str], texts: list[str], n_features: int = 4096):
+        self.node_names = list(node_names)
+        self.n_features = n_features
+
+        counts = np.zeros((len(texts), n_features), dtype=np.float32)
+        for row, text in enumerate(texts):
+            np.add.at(counts[row], hashed_ngrams(text or "", n_features), 1.0)
+
+        document_frequency = np.count_nonzero(counts, axis=0)
+        self.idf = (np.log((1 + len(texts)) / (1 + document_frequency)) + 1).astype(np.float32)
+        self.matrix = self._normalise(np.log1p(counts) * self.idf)
+
+    @classmethod
+    def from_graph_data(cls, graph_data: dict, n_features: int = 4096) -> Optional["TopicRoutingIndex"]:
+        return cls.from_structure(GraphStructure.from_dict(graph_data), n_features)
+
+    @classmethod
+    def from_structure(cls, structure: GraphStructure, n_features: int = 4096) -> Optional["TopicRoutingIndex"]:
+        """Build an index from the topics that have a classification description.
+
+        Returns None when fewer than two topics can be told apart, since
+        there is nothing to route between.
+        """
+        described = [(node.name, node.classification_description) for node in structure.nodes]
+        described = [(name, text) for name, text in described if text and text.strip()]
+        if len(described) < 2:
+            return None
+        names, texts = zip(*described)
+        return cls(list(names), list(texts), n_features)
+
+    @staticmethod
+    def _normalise(vectors: np.ndarray) -> np.ndarray:
+        norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+        return np.divide(vectors, norms, out=np.zeros_like(vectors), where=norms > 0)
+
+    def vectorize(self, text: str) -> np.ndarray:
+        counts = np.bincount(hashed_ngrams(text, self.n_features), minlength=self.n_features)
+        return self._normalise(np.log1p(counts.astype(np.float32)) * self.idf)
+
+    def scores(self, message: str) -> np.ndarray:
+        """Cosine similarity of the message to every topic, in node_names order."""
+        return self.matrix @ self.vectorize(message)
+
+    def best_match(self, message: str, min_score: float = 0.0) -> Optional[str]:
+        """Name of the best-scoring topic node, or None if nothing reaches min_score."""
+        if not message:
+            return None
+        scores = self.scores(message)
+        best = int(np.argmax(scores))
+        if scores[best] <= 0 or scores[best] < min_score:
+            return None
+        return self.node_names[best]